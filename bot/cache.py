@@ -0,0 +1,46 @@
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Простой LRU-кэш с ограничением по размеру и времени жизни записей.
+    Не потокобезопасен, рассчитан на использование внутри одного event loop.
+    """
+    def __init__(self, maxsize=1024, ttl=60):
+        """
+        :param maxsize: Максимальное количество записей (самые старые вытесняются).
+        :param ttl: Время жизни записи в секундах.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу или default, если записи нет или она устарела."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """Сохраняет значение, вытесняя самые старые записи при переполнении."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Удаляет запись по ключу (если есть)."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Очищает кэш полностью."""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -16,6 +16,91 @@ ADMIN_IDS = [int(x) for x in admin_ids_str.split(',')] if admin_ids_str else []
 # URL базы данных (PostgreSQL)
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Тип хранилища: 'postgres' или 'memory' (данные в памяти процесса, для тестов и бенчмарков)
+DB_BACKEND = os.getenv('DB_BACKEND', 'postgres')
+
+# Параметры пула соединений asyncpg
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '100'))
+# Время (сек), после которого простаивающее соединение закрывается (0 — никогда)
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = float(os.getenv('DB_MAX_INACTIVE_CONNECTION_LIFETIME', '300'))
+# Таймаут выполнения запроса по умолчанию (сек)
+DB_COMMAND_TIMEOUT = float(os.getenv('DB_COMMAND_TIMEOUT', '30'))
+
+# Кэш пользователей (время жизни записи в секундах и максимальный размер)
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+
+# Время жизни закэшированного количества релизов (для заголовка списка релизов)
+RELEASE_COUNT_TTL = int(os.getenv('RELEASE_COUNT_TTL', '300'))
+
+# Inline-поиск (@бот запрос): время жизни результатов в кэше бота и у клиентов Telegram (сек),
+# размер кэша, результатов каждого вида и минимальная длина запроса
+INLINE_CACHE_TTL = int(os.getenv('INLINE_CACHE_TTL', '30'))
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', '1024'))
+INLINE_RESULTS_PER_KIND = int(os.getenv('INLINE_RESULTS_PER_KIND', '10'))
+INLINE_MIN_QUERY_LENGTH = int(os.getenv('INLINE_MIN_QUERY_LENGTH', '2'))
+
+# Состояния диалогов FSM в БД (bot.services.fsm_storage)
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', str(24 * 3600)))    # брошенный диалог удаляется через столько секунд
+# Сколько читать сохраненное состояние из кэша (сек). 0 — всегда из БД: апдейты одного пользователя
+# могут попасть на разные экземпляры. Больше 0 — только при маршрутизации пользователя на один экземпляр
+FSM_CACHE_TTL = float(os.getenv('FSM_CACHE_TTL', '0'))
+FSM_CACHE_SIZE = int(os.getenv('FSM_CACHE_SIZE', '10000'))
+FSM_FLUSH_DELAY = float(os.getenv('FSM_FLUSH_DELAY', '0.5'))        # изменения за этот интервал пишутся одним запросом
+FSM_SWEEP_INTERVAL = int(os.getenv('FSM_SWEEP_INTERVAL', '600'))    # как часто удалять истекшие диалоги (сек)
+
+# Как часто (сек) резервные экземпляры пытаются стать лидером, а лидер проверяет свой лок.
+# Определяет время переключения плановых задач на другой экземпляр при падении лидера
+LEADER_RETRY_INTERVAL = float(os.getenv('LEADER_RETRY_INTERVAL', '5'))
+
+# Пропущенный запуск плановой задачи (бот был выключен) выполняется при старте,
+# если с момента запуска по расписанию прошло не больше JOB_MISFIRE_GRACE секунд
+JOB_MISFIRE_GRACE = int(os.getenv('JOB_MISFIRE_GRACE', str(6 * 3600)))
+# Через сколько секунд незавершенный запуск считается зависшим и не мешает следующему
+JOB_RUN_TIMEOUT = int(os.getenv('JOB_RUN_TIMEOUT', '3600'))
+
+# Лимиты исходящих сообщений (очередь отправки bot.services.sender)
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '30'))       # сообщений в секунду всего
+SEND_PER_CHAT_RATE = float(os.getenv('SEND_PER_CHAT_RATE', '1'))    # сообщений в секунду в один чат
+SEND_PER_CHAT_BURST = int(os.getenv('SEND_PER_CHAT_BURST', '3'))    # допустимая пачка подряд в один чат
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '5'))
+SEND_CONCURRENCY = int(os.getenv('SEND_CONCURRENCY', '20'))         # одновременных запросов к API
+# Сколько получателей одной рассылки (notify_many) обслуживается одновременно
+NOTIFY_FANOUT_CONCURRENCY = int(os.getenv('NOTIFY_FANOUT_CONCURRENCY', '10'))
+
+# Очередь уведомлений в БД (outbox, bot.services.outbox)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))         # записей за одну выборку
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))   # пауза, если очередь пуста (сек)
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '120'))   # через сколько захваченная запись вернется в очередь
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+# Сколько дней хранить завершенные записи (в течение этого срока повторы с тем же ключом отбрасываются)
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
+# Онбординг (job_onboarding): сколько артистов читается из БД и ставится в outbox за раз
+ONBOARDING_CHUNK_SIZE = int(os.getenv('ONBOARDING_CHUNK_SIZE', '500'))
+
+# Таймеры дедлайнов (bot.services.deadlines): напоминание "< 24ч" приходит накануне дедлайна
+# в DEADLINE_ALERT_HOUR, в памяти держатся задачи с дедлайном не дальше DEADLINE_HORIZON_DAYS дней
+DEADLINE_ALERT_HOUR = int(os.getenv('DEADLINE_ALERT_HOUR', '10'))
+DEADLINE_HORIZON_DAYS = int(os.getenv('DEADLINE_HORIZON_DAYS', '7'))
+
+# Риски релизов (job_pitching_alert): "тип_задачи:дней" через запятую — основатели получают
+# предупреждение за указанное число дней до релиза, если задача этого типа не закрыта
+RELEASE_RISK_RULES = os.getenv('RELEASE_RISK_RULES', 'pitching:3')
+
+# Недоступные получатели (заблокировали бота / чат не найден): пауза перед повторной попыткой
+# удваивается после каждой неудачи, начиная с UNREACHABLE_BACKOFF_BASE и не больше UNREACHABLE_BACKOFF_MAX (сек)
+UNREACHABLE_BACKOFF_BASE = int(os.getenv('UNREACHABLE_BACKOFF_BASE', '3600'))
+UNREACHABLE_BACKOFF_MAX = int(os.getenv('UNREACHABLE_BACKOFF_MAX', str(7 * 24 * 3600)))
+
+# Повтор напоминаний о задачах, которые уже были просрочены на прошлых проверках (сама проверка ежечасная,
+# о новых просрочках сообщается сразу): 'hourly' — при каждой проверке, 'daily' — раз в день, начиная с проверки в
+# OVERDUE_REMIND_HOUR, 'never' — только в момент просрочки
+OVERDUE_REPEAT = os.getenv('OVERDUE_REPEAT', 'daily').lower()
+OVERDUE_REMIND_HOUR = int(os.getenv('OVERDUE_REMIND_HOUR', '10'))
+
 # Токен Яндекс.Диска
 YANDEX_DISK_TOKEN = os.getenv('YANDEX_DISK_TOKEN')
 YANDEX_UPLOAD_FOLDER = "label_bot_files"
@@ -1,11 +1,153 @@
+import time
 import asyncpg
 import logging
-import datetime
-from bot.config import DATABASE_URL, ADMIN_IDS
+from contextlib import asynccontextmanager
+from bot.config import (
+    DATABASE_URL, DB_BACKEND, ADMIN_IDS, USER_CACHE_TTL, USER_CACHE_SIZE, RELEASE_COUNT_TTL,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE,
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME, DB_COMMAND_TIMEOUT,
+    UNREACHABLE_BACKOFF_BASE, UNREACHABLE_BACKOFF_MAX
+)
+from bot.cache import TTLCache
+from bot.db_base import BaseDatabase, format_user_link
+from bot.metrics import DbMetrics, timed
+from bot.migrations import migrate
+from bot.onboarding import ONBOARDING_COMPLETE, STEP_FLAGS, YT_NOTE
 
 logger = logging.getLogger(__name__)
 
-class Database:
+# Маркер отсутствия записи в кэше (None означает "пользователя нет в БД")
+_MISSING = object()
+
+# Колонки с именами создателя и исполнителя для запросов по задачам
+TASK_USERS_SELECT = """
+    SELECT t.*,
+           c.name AS creator_name, c.username AS creator_username,
+           a.name AS assignee_name, a.username AS assignee_username
+    FROM tasks t
+    LEFT JOIN users c ON c.telegram_id = t.created_by
+    LEFT JOIN users a ON a.telegram_id = t.assigned_to
+"""
+
+TASK_INSERT = """
+    INSERT INTO tasks (title, description, assigned_to, created_by, release_id, deadline, requires_file, parent_task_id, task_kind)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+    RETURNING id
+"""
+
+# Вставка нескольких задач одним запросом; колонки в порядке аргументов create_task
+TASK_INSERT_MANY = """
+    INSERT INTO tasks (title, description, assigned_to, created_by, release_id, deadline, requires_file, parent_task_id, task_kind)
+    SELECT * FROM unnest($1::text[], $2::text[], $3::bigint[], $4::bigint[], $5::int[], $6::date[], $7::int[], $8::int[], $9::text[])
+    RETURNING id
+"""
+
+# Дополнительные условия шагов онбординга ($1 — текущая дата): пока условие не выполнено,
+# следующего шага у артиста нет
+ONBOARDING_STEP_CONDITIONS = {
+    YT_NOTE: "first_release_date <= $1",
+}
+
+def onboarding_steps_select():
+    """
+    Запрос следующего шага онбординга артистов: первый непройденный бит маски по порядку STEP_FLAGS.
+    Биты и значение "все пройдено" берутся из bot.onboarding, чтобы запрос не расходился с кодом.
+    """
+    whens = []
+    for code, flag in STEP_FLAGS.items():
+        step = f"'{code}'"
+        condition = ONBOARDING_STEP_CONDITIONS.get(code)
+        if condition:
+            step = f"CASE WHEN {condition} THEN {step} END"
+        whens.append(f"WHEN onboarding_mask & {int(flag)} = 0 THEN {step}")
+    cases = "\n                   ".join(whens)
+    return f"""
+    SELECT id, name, manager_id, step FROM (
+        SELECT id, name, manager_id,
+               CASE
+                   {cases}
+               END AS step
+        FROM artists
+        WHERE onboarding_mask <> {int(ONBOARDING_COMPLETE)} AND manager_id IS NOT NULL
+    ) s
+    WHERE step IS NOT NULL
+    ORDER BY id
+"""
+
+ONBOARDING_STEPS_SELECT = onboarding_steps_select()
+
+# Постановка уведомлений в outbox; записи с существующим ключом идемпотентности пропускаются
+OUTBOX_INSERT_MANY = """
+    INSERT INTO outbox (idempotency_key, chat_id, text, reply_markup, priority)
+    SELECT * FROM unnest($1::text[], $2::bigint[], $3::text[], $4::jsonb[], $5::smallint[])
+    ON CONFLICT (idempotency_key) DO NOTHING
+    RETURNING id
+"""
+
+# Канал LISTEN/NOTIFY, в который публикуются ID созданных и измененных задач
+TASK_CHANGES_CHANNEL = "task_changes"
+
+async def insert_tasks(conn, rows):
+    """
+    Вставляет задачи одним запросом.
+    :param rows: Кортежи (title, desc, assigned, created, rel_id, deadline, req_file, parent_id, task_kind).
+    :return: Список ID новых задач.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    columns = [list(col) for col in zip(*rows)]
+    return [r['id'] for r in await conn.fetch(TASK_INSERT_MANY, *columns)]
+
+async def insert_outbox(conn, rows):
+    """
+    Ставит уведомления в outbox на переданном соединении (например, в транзакции с изменением,
+    о котором они сообщают).
+    :param rows: Кортежи (idempotency_key, chat_id, text, reply_markup_json, priority).
+    :return: Количество добавленных записей.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    columns = [list(col) for col in zip(*rows)]
+    return len(await conn.fetch(OUTBOX_INSERT_MANY, *columns))
+
+async def notify_task_changes(conn, ids):
+    """
+    Публикует ID задач в TASK_CHANGES_CHANNEL (внутри транзакции — при ее фиксации).
+    Длина payload в PostgreSQL ограничена, поэтому ID отправляются частями.
+    """
+    ids = [str(i) for i in ids]
+    for start in range(0, len(ids), 500):
+        await conn.execute("SELECT pg_notify($1, $2)", TASK_CHANGES_CHANNEL, ",".join(ids[start:start + 500]))
+
+def keyset_condition(col, id_col, cursor, backward, first_arg, descending=True):
+    """
+    Строит условие keyset-пагинации для сортировки "{col} DESC NULLS LAST, {id_col} DESC"
+    (или "{col} ASC NULLS LAST, {id_col} ASC" при descending=False).
+    :param cursor: Пара (значение колонки, id) граничной записи. Значение может быть None.
+    :param backward: True — записи перед курсором (для листания назад), False — после.
+    :param first_arg: Номер первого позиционного параметра ($N) для условия.
+    :return: (sql, args)
+    """
+    value, row_id = cursor
+    n = first_arg
+    # Сравнение "дальше по порядку сортировки" и "раньше по порядку сортировки"
+    after, before = ("<", ">") if descending else (">", "<")
+    if value is None:
+        # NULL-значения идут последними, внутри них порядок только по id
+        if backward:
+            return f"({col} IS NOT NULL OR {id_col} {before} ${n})", [row_id]
+        return f"({col} IS NULL AND {id_col} {after} ${n})", [row_id]
+    if backward:
+        return f"({col} {before} ${n} OR ({col} = ${n} AND {id_col} {before} ${n + 1}))", [value, row_id]
+    return f"({col} {after} ${n} OR ({col} = ${n} AND {id_col} {after} ${n + 1}) OR {col} IS NULL)", [value, row_id]
+
+def like_escape(text):
+    """Экранирует спецсимволы LIKE (%, _ и \\) в пользовательском тексте."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class Database(BaseDatabase):
     """
     Класс для асинхронной работы с базой данных PostgreSQL через asyncpg.
     """
@@ -16,13 +158,29 @@ class Database:
         """
         self.dsn = dsn
         self.pool = None
+        # Кэш записей users: telegram_id -> Record (или None, если пользователя нет)
+        self.user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        # Счетчик инвалидаций: защищает кэш от записи устаревших данных,
+        # если пользователь изменился, пока выполнялся SELECT
+        self._user_epoch = 0
+        # Кэш количества релизов: 'all' (для основателя) или user_id -> число
+        self.release_count_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=RELEASE_COUNT_TTL)
+        # Метрики пула и латентность методов
+        self.metrics = DbMetrics()
 
     async def connect(self):
         """
         Создает пул соединений с базой данных и инициализирует таблицы.
         """
         try:
-            self.pool = await asyncpg.create_pool(self.dsn)
+            self.pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                max_inactive_connection_lifetime=DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+                command_timeout=DB_COMMAND_TIMEOUT,
+            )
             logger.info("Успешное подключение к базе данных.")
             await self.init_db()
         except Exception as e:
@@ -34,79 +192,39 @@ class Database:
         Закрывает пул соединений.
         """
         if self.pool:
+            logger.info(f"Статистика пула БД: {self.pool_stats()}")
             await self.pool.close()
 
-    async def init_db(self):
+    @asynccontextmanager
+    async def acquire(self):
         """
-        Создает необходимые таблицы в базе данных, если они не существуют.
+        Берет соединение из пула, записывая время ожидания в метрики.
         """
+        started = time.perf_counter()
         async with self.pool.acquire() as conn:
-            # Таблица пользователей
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    telegram_id BIGINT PRIMARY KEY,
-                    name TEXT,
-                    username TEXT,
-                    role TEXT
-                )
-            """)
-            # Миграция: добавляем колонку username, если её нет
-            try:
-                await conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS username TEXT")
-            except Exception:
-                pass
+            self.metrics.acquire_wait.observe(time.perf_counter() - started)
+            yield conn
 
-            # Таблица артистов
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS artists (
-                    id SERIAL PRIMARY KEY,
-                    name TEXT,
-                    manager_id BIGINT,
-                    first_release_date TEXT,
-                    flag_contract INTEGER DEFAULT 0,
-                    flag_mm_profile INTEGER DEFAULT 0,
-                    flag_mm_verify INTEGER DEFAULT 0,
-                    flag_yt_note INTEGER DEFAULT 0,
-                    flag_yt_link INTEGER DEFAULT 0
-                )
-            """)
-            # Таблица релизов
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS releases (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT,
-                    artist_id INTEGER,
-                    type TEXT,
-                    release_date TEXT,
-                    created_by BIGINT
-                )
-            """)
-            # Таблица задач
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT,
-                    description TEXT,
-                    assigned_to BIGINT,
-                    created_by BIGINT,
-                    release_id INTEGER,
-                    parent_task_id INTEGER,
-                    deadline TEXT,
-                    status TEXT DEFAULT 'pending',
-                    requires_file INTEGER DEFAULT 0,
-                    file_url TEXT,
-                    comment TEXT
-                )
-            """)
-            # Таблица отчетов
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS reports (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT,
-                    report_date TEXT,
-                    text TEXT
-                )
-            """)
+    def pool_stats(self):
+        """
+        Возвращает текущее состояние пула и сводку по времени ожидания соединения.
+        """
+        if not self.pool:
+            return {}
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "acquire_wait": self.metrics.acquire_wait.snapshot(),
+        }
+
+    async def init_db(self):
+        """
+        Приводит схему БД к актуальной версии (см. bot.migrations) и добавляет администраторов.
+        """
+        async with self.acquire() as conn:
+            await migrate(conn)
             await self._seed_admins(conn)
 
     async def _seed_admins(self, conn):
@@ -121,221 +239,783 @@ class Database:
                     ON CONFLICT (telegram_id) DO UPDATE SET name = EXCLUDED.name, role = EXCLUDED.role
                 """, uid, "Founder", "founder", None)
 
+    @timed
     async def get_user(self, uid):
         """
-        Получает пользователя по Telegram ID.
+        Получает пользователя по Telegram ID (с кэшированием).
         """
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow("SELECT * FROM users WHERE telegram_id=$1", uid)
+        cached = self.user_cache.get(uid, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        epoch = self._user_epoch
+        async with self.acquire() as conn:
+            user = await conn.fetchrow("SELECT * FROM users WHERE telegram_id=$1", uid)
+        if epoch == self._user_epoch:
+            self.user_cache.set(uid, user)
+        return user
 
+    def invalidate_user(self, uid=None):
+        """
+        Сбрасывает кэш пользователя (или весь кэш, если uid не указан).
+        """
+        self._user_epoch += 1
+        if uid is None:
+            self.user_cache.clear()
+        else:
+            self.user_cache.pop(uid)
+
+    @timed
     async def add_user(self, uid, name, role, username=None):
         """
         Добавляет или обновляет пользователя.
         """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             await conn.execute("""
                 INSERT INTO users (telegram_id, name, role, username) VALUES ($1, $2, $3, $4)
                 ON CONFLICT (telegram_id) DO UPDATE SET name = EXCLUDED.name, role = EXCLUDED.role, username = EXCLUDED.username
             """, uid, name, role, username)
+        self.invalidate_user(uid)
 
+    @timed
     async def delete_user(self, uid):
         """
         Удаляет пользователя по ID.
         """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             await conn.execute("DELETE FROM users WHERE telegram_id=$1", uid)
+        self.invalidate_user(uid)
 
+    @timed
     async def get_all_users(self):
         """
         Возвращает список всех пользователей, отсортированных по роли.
         """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetch("SELECT * FROM users ORDER BY role")
 
+    @timed
     async def delete_release_cascade(self, release_id):
         """
         Каскадное удаление релиза и связанных задач.
         """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             await conn.execute("DELETE FROM tasks WHERE release_id=$1", release_id)
-            await conn.execute("DELETE FROM releases WHERE id=$1", release_id)
+            created_by = await conn.fetchval("DELETE FROM releases WHERE id=$1 RETURNING created_by", release_id)
+        self._invalidate_release_count(created_by)
 
+    @timed
     async def delete_task(self, task_id):
         """
         Удаляет задачу по ID.
         """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             await conn.execute("DELETE FROM tasks WHERE id=$1", task_id)
 
-    async def get_user_link(self, uid):
-        """
-        Генерирует HTML-ссылку на пользователя.
+    @timed
+    async def mark_user_unreachable(self, uid, reason):
         """
-        u = await self.get_user(uid)
-        if u:
-            if u.get('username'):
-                return f"<a href='tg://user?id={uid}'>{u['name']}</a> (@{u['username']})"
-            return f"<a href='tg://user?id={uid}'>{u['name']}</a>"
-        return f"ID:{uid}"
-
-    async def create_task(self, title, desc, assigned, created, rel_id, deadline, req_file=0, parent_id=None):
+        Отмечает, что пользователю не удалось доставить сообщение (бот заблокирован, чат не найден).
+        Следующая попытка разрешается через паузу, которая удваивается после каждой неудачи.
         """
-        Создает новую задачу.
-        """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             await conn.execute("""
-                INSERT INTO tasks (title, description, assigned_to, created_by, release_id, deadline, requires_file, parent_task_id)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            """, title, desc, assigned, created, rel_id, deadline, req_file, parent_id)
-
-    async def get_tasks_active_founder(self):
-        """
-        Возвращает активные задачи для основателя (все).
-        """
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM tasks WHERE status NOT IN ('done', 'rejected') ORDER BY deadline")
+                UPDATE users
+                SET unreachable_since = COALESCE(unreachable_since, now()),
+                    unreachable_attempts = unreachable_attempts + 1,
+                    unreachable_retry_at = now() + make_interval(secs => LEAST($3::float8 * 2 ^ unreachable_attempts, $4::float8)),
+                    unreachable_reason = $2
+                WHERE telegram_id = $1
+            """, uid, reason, UNREACHABLE_BACKOFF_BASE, UNREACHABLE_BACKOFF_MAX)
+        self.invalidate_user(uid)
+
+    @timed
+    async def clear_user_unreachable(self, uid):
+        """Снимает отметку недоступности (пользователь снова взаимодействует с ботом или доставка прошла)."""
+        async with self.acquire() as conn:
+            await conn.execute("""
+                UPDATE users
+                SET unreachable_since = NULL, unreachable_retry_at = NULL, unreachable_attempts = 0, unreachable_reason = NULL
+                WHERE telegram_id = $1 AND unreachable_since IS NOT NULL
+            """, uid)
+        self.invalidate_user(uid)
+
+    @timed
+    async def get_unreachable_users(self):
+        """Пользователи, отмеченные как недоступные (самые давние первыми)."""
+        async with self.acquire() as conn:
+            return await conn.fetch(
+                "SELECT * FROM users WHERE unreachable_since IS NOT NULL ORDER BY unreachable_since, telegram_id"
+            )
 
-    async def get_tasks_active_user(self, uid):
-        """
-        Возвращает активные задачи для конкретного пользователя.
+    @timed
+    async def create_task(self, title, desc, assigned, created, rel_id, deadline, req_file=0, parent_id=None, task_kind=None):
         """
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM tasks WHERE assigned_to=$1 AND status NOT IN ('done', 'rejected') ORDER BY deadline", uid)
-
+        Создает новую задачу.
+        :param deadline: Дедлайн (datetime.date).
+        :param task_kind: Тип стандартной задачи релиза (bot.task_kinds) или None.
+        :return: ID задачи.
+        """
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                tid = await conn.fetchval(TASK_INSERT, title, desc, assigned, created, rel_id, deadline, req_file, parent_id, task_kind)
+                await notify_task_changes(conn, [tid])
+        return tid
+
+    @timed
+    async def get_tasks_by_ids(self, ids):
+        """Задачи по списку ID (отсутствующие пропускаются)."""
+        async with self.acquire() as conn:
+            return await conn.fetch("SELECT * FROM tasks WHERE id = ANY($1::int[]) ORDER BY id", list(ids))
+
+    @timed
+    async def get_open_tasks_by_deadline(self, until, cursor=None, limit=500):
+        """
+        Открытые задачи (не выполнены, не отклонены и еще не просрочены) с дедлайном не позже until,
+        по возрастанию (deadline, id). Используется частичный индекс idx_tasks_open_deadline.
+        :param cursor: (deadline, id) последней загруженной задачи — продолжить после нее.
+        """
+        condition, args = "", [until, limit]
+        if cursor is not None:
+            condition, args = "AND (deadline, id) > ($3, $4)", [until, limit, *cursor]
+        async with self.acquire() as conn:
+            return await conn.fetch(f"""
+                SELECT id, deadline, status FROM tasks
+                WHERE status NOT IN ('done', 'rejected', 'overdue') AND deadline <= $1 {condition}
+                ORDER BY deadline, id
+                LIMIT $2
+            """, *args)
+
+    @timed
+    async def mark_tasks_overdue(self, ids, build_outbox=None):
+        """
+        Помечает просроченными задачи из списка, которые еще открыты.
+        :param build_outbox: Функция (changed) -> строки outbox (см. insert_outbox); уведомления
+                             ставятся в той же транзакции, что и смена статуса, и не теряются при сбое.
+        :return: Записи (id, assigned_to, title) задач, статус которых изменился.
+        """
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                changed = await conn.fetch("""
+                    UPDATE tasks SET status = 'overdue'
+                    WHERE id = ANY($1::int[]) AND status NOT IN ('done', 'rejected', 'overdue')
+                    RETURNING id, assigned_to, title
+                """, list(ids))
+                if build_outbox is not None:
+                    await insert_outbox(conn, build_outbox(changed))
+        return changed
+
+    async def subscribe_task_changes(self, callback):
+        """
+        Подписка на изменения задач через LISTEN на отдельном соединении.
+        callback(ids) получает список ID; callback(None) — соединение потеряно,
+        изменения могли быть пропущены.
+        :return: async-функция отмены подписки.
+        """
+        conn = await asyncpg.connect(self.dsn)
+
+        def on_notify(_conn, _pid, _channel, payload):
+            callback([int(i) for i in payload.split(",") if i])
+
+        def on_terminate(_conn):
+            logger.warning("Соединение LISTEN для изменений задач потеряно.")
+            callback(None)
+
+        await conn.add_listener(TASK_CHANGES_CHANNEL, on_notify)
+        conn.add_termination_listener(on_terminate)
+
+        async def unsubscribe():
+            conn.remove_termination_listener(on_terminate)
+            if not conn.is_closed():
+                await conn.close()
+        return unsubscribe
+
+    @timed
+    async def get_active_tasks_page(self, assigned_to=None, cursor=None, backward=False, limit=10):
+        """
+        Страница активных задач (не выполнены и не отклонены) с именами создателя и исполнителя,
+        keyset-пагинация по (deadline, id) по возрастанию.
+        :param assigned_to: Только задачи этого исполнителя или None — все задачи.
+        :param cursor: (deadline, id) граничной задачи текущей страницы или None для первой страницы.
+        :param backward: True — листать назад (задачи перед cursor), False — вперед.
+        :return: (rows, has_more) — как в get_releases_page.
+        """
+        where = ["t.status NOT IN ('done', 'rejected')"]
+        args = []
+        if assigned_to is not None:
+            args.append(assigned_to)
+            where.append(f"t.assigned_to = ${len(args)}")
+        if cursor:
+            cond, cond_args = keyset_condition("t.deadline", "t.id", cursor, backward, len(args) + 1, descending=False)
+            where.append(cond)
+            args.extend(cond_args)
+
+        query = TASK_USERS_SELECT + " WHERE " + " AND ".join(where)
+        if backward:
+            query += " ORDER BY t.deadline DESC NULLS FIRST, t.id DESC"
+        else:
+            query += " ORDER BY t.deadline ASC NULLS LAST, t.id ASC"
+        args.append(limit + 1)
+        query += f" LIMIT ${len(args)}"
+
+        async with self.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        return rows, has_more
+
+    @timed
+    async def get_task_with_users(self, tid):
+        """Задача по ID с именами создателя и исполнителя или None."""
+        async with self.acquire() as conn:
+            return await conn.fetchrow(TASK_USERS_SELECT + " WHERE t.id=$1", tid)
+
+    @timed
     async def get_task_by_id(self, tid):
         """
         Получает задачу по ID.
         """
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetchrow("SELECT * FROM tasks WHERE id=$1", tid)
 
+    @timed
     async def update_task_status(self, tid, status, file_url=None, comment=None):
         """
         Обновляет статус задачи, добавляет файл или комментарий.
         """
-        async with self.pool.acquire() as conn:
-            if file_url or comment:
-                await conn.execute("UPDATE tasks SET status=$1, file_url=$2, comment=$3 WHERE id=$4", status, file_url, comment, tid)
-            else:
-                await conn.execute("UPDATE tasks SET status=$1 WHERE id=$2", status, tid)
-
-    async def get_releases_paginated(self, user_role, user_id, page=0, limit=5):
-        """
-        Возвращает список релизов с пагинацией.
-        """
-        offset = page * limit
-        async with self.pool.acquire() as conn:
-            if user_role == 'founder':
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                if file_url or comment:
+                    await conn.execute("UPDATE tasks SET status=$1, file_url=$2, comment=$3 WHERE id=$4", status, file_url, comment, tid)
+                else:
+                    await conn.execute("UPDATE tasks SET status=$1 WHERE id=$2", status, tid)
+                await notify_task_changes(conn, [tid])
+
+    @timed
+    async def get_releases_page(self, user_role, user_id, cursor=None, backward=False, limit=5):
+        """
+        Возвращает страницу релизов (keyset-пагинация по (release_date, id), от новых к старым).
+        :param cursor: (release_date, id) граничного релиза текущей страницы или None для первой страницы.
+        :param backward: True — листать назад (релизы перед cursor), False — вперед.
+        :return: (rows, has_more) — строки в порядке отображения и признак наличия
+                 следующих записей в направлении листания.
+        """
+        where = []
+        args = []
+        if user_role == 'founder':
+            query = "SELECT r.*, u.name as creator_name FROM releases r LEFT JOIN users u ON r.created_by = u.telegram_id"
+        else:
+            query = "SELECT r.* FROM releases r"
+            args.append(user_id)
+            where.append(f"r.created_by = ${len(args)}")
+
+        if cursor:
+            cond, cond_args = keyset_condition("r.release_date", "r.id", cursor, backward, len(args) + 1)
+            where.append(cond)
+            args.extend(cond_args)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+
+        if backward:
+            query += " ORDER BY r.release_date ASC NULLS FIRST, r.id ASC"
+        else:
+            query += " ORDER BY r.release_date DESC NULLS LAST, r.id DESC"
+        args.append(limit + 1)
+        query += f" LIMIT ${len(args)}"
+
+        async with self.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        return rows, has_more
+
+    @timed
+    async def count_releases(self, user_role, user_id):
+        """
+        Возвращает количество релизов (всех для основателя или созданных пользователем).
+        Значение кэшируется и сбрасывается при создании/удалении релизов.
+        """
+        key = 'all' if user_role == 'founder' else user_id
+        total = self.release_count_cache.get(key)
+        if total is not None:
+            return total
+        async with self.acquire() as conn:
+            if key == 'all':
                 total = await conn.fetchval("SELECT COUNT(*) FROM releases")
-                
-                rows = await conn.fetch("""
-                    SELECT r.*, u.name as creator_name FROM releases r
-                    LEFT JOIN users u ON r.created_by = u.telegram_id
-                    ORDER BY r.release_date DESC LIMIT $1 OFFSET $2
-                """, limit, offset)
             else:
                 total = await conn.fetchval("SELECT COUNT(*) FROM releases WHERE created_by = $1", user_id)
-                
-                rows = await conn.fetch("""
-                    SELECT * FROM releases WHERE created_by = $1 
-                    ORDER BY release_date DESC LIMIT $2 OFFSET $3
-                """, user_id, limit, offset)
-            
-            return rows, total
+        self.release_count_cache.set(key, total)
+        return total
+
+    def _invalidate_release_count(self, created_by):
+        """Сбрасывает закэшированные количества релизов, затронутые изменением."""
+        self.release_count_cache.pop('all')
+        if created_by is not None:
+            self.release_count_cache.pop(created_by)
 
     # Методы для отчетов
+    @timed
     async def create_report(self, user_id, report_date, text):
-        """Создает отчет пользователя."""
-        async with self.pool.acquire() as conn:
+        """Создает отчет пользователя (report_date — datetime.date)."""
+        async with self.acquire() as conn:
             await conn.execute("INSERT INTO reports (user_id, report_date, text) VALUES ($1, $2, $3)", user_id, report_date, text)
 
+    @timed
     async def get_reports(self, user_id, limit=20):
         """Получает последние отчеты пользователя."""
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetch("SELECT * FROM reports WHERE user_id=$1 ORDER BY id DESC LIMIT $2", user_id, limit)
 
     # Методы для задач по расписанию
-    async def get_overdue_tasks(self, today_str):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM tasks WHERE deadline < $1 AND status != 'done'", today_str)
-
-    async def mark_task_overdue(self, task_id):
-        async with self.pool.acquire() as conn:
-            await conn.execute("UPDATE tasks SET status='overdue' WHERE id=$1", task_id)
+    @timed
+    async def sweep_overdue(self, today, build_outbox=None):
+        """
+        Переводит все задачи с истекшим дедлайном в статус 'overdue' одним UPDATE.
+        :param today: Текущая дата (datetime.date); просрочены задачи с deadline < today.
+        :param build_outbox: Функция (newly_overdue, still_overdue) -> строки outbox (см. insert_outbox);
+                             уведомления ставятся в той же транзакции, что и смена статуса.
+        :return: (newly_overdue, still_overdue) — строки (id, assigned_to, title) задач,
+                 ставших просроченными сейчас, и задач, которые уже были просрочены ранее.
+        """
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                still_overdue = await conn.fetch(
+                    "SELECT id, assigned_to, title FROM tasks WHERE status='overdue' ORDER BY id"
+                )
+                newly_overdue = await conn.fetch("""
+                    UPDATE tasks SET status='overdue'
+                    WHERE deadline < $1 AND status NOT IN ('done', 'rejected', 'overdue')
+                    RETURNING id, assigned_to, title
+                """, today)
+                if build_outbox is not None:
+                    await insert_outbox(conn, build_outbox(newly_overdue, still_overdue))
+        return newly_overdue, still_overdue
+
+    @timed
+    async def update_artist_flag(self, artist_id, flag, value=True):
+        """
+        Отмечает шаг онбординга пройденным (value=True) или снимает отметку.
+        :return: Новая маска или None, если артиста нет.
+        """
+        async with self.acquire() as conn:
+            if value:
+                query = "UPDATE artists SET onboarding_mask = onboarding_mask | $2 WHERE id=$1 RETURNING onboarding_mask"
+            else:
+                query = "UPDATE artists SET onboarding_mask = onboarding_mask & ~$2::smallint WHERE id=$1 RETURNING onboarding_mask"
+            return await conn.fetchval(query, artist_id, int(flag))
 
-    async def get_deadline_tasks(self, date_str):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM tasks WHERE deadline = $1 AND status != 'done'", date_str)
-    
-    async def get_unsigned_artists(self):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM artists WHERE flag_contract=0")
+    @timed
+    async def toggle_artist_flag(self, artist_id, flag):
+        """
+        Атомарно переключает шаг онбординга.
+        :return: Новая маска или None, если артиста нет.
+        """
+        async with self.acquire() as conn:
+            return await conn.fetchval(
+                "UPDATE artists SET onboarding_mask = onboarding_mask # $2 WHERE id=$1 RETURNING onboarding_mask",
+                artist_id, int(flag)
+            )
 
-    async def update_artist_flag(self, artist_id, column, value=1):
-        async with self.pool.acquire() as conn:
-            # Внимание: имя колонки передается динамически, нужно быть осторожным.
-            # Но здесь мы контролируем ввод из кода.
-            # asyncpg не поддерживает динамические имена колонок в параметрах, поэтому f-string.
-            await conn.execute(f"UPDATE artists SET {column}=$1 WHERE id=$2", value, artist_id)
-            
+    @timed
     async def get_artist_by_name(self, name):
-         async with self.pool.acquire() as conn:
+         async with self.acquire() as conn:
             return await conn.fetchrow("SELECT id FROM artists WHERE name=$1", name)
 
+    @timed
     async def get_artist_by_id(self, aid):
-         async with self.pool.acquire() as conn:
+         async with self.acquire() as conn:
             return await conn.fetchrow("SELECT * FROM artists WHERE id=$1", aid)
 
-    async def get_all_artists(self):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM artists ORDER BY name")
-
+    @timed
+    async def get_artists_page(self, query=None, cursor=None, backward=False, limit=10):
+        """
+        Страница артистов по (name, id) по возрастанию, keyset-пагинация.
+        :param query: Подстрока имени для поиска (без учета регистра) или None.
+        :param cursor: ID граничного артиста текущей страницы (имя берется из БД) или None для первой страницы.
+        :param backward: True — листать назад (артисты перед cursor), False — вперед.
+        :return: (rows, has_more) — как в get_releases_page; строки: id, name, onboarding_mask.
+        """
+        where = []
+        args = []
+        if query:
+            args.append(f"%{like_escape(query.lower())}%")
+            where.append(f"lower(name) LIKE ${len(args)}")
+        if cursor is not None:
+            args.append(cursor)
+            op = "<" if backward else ">"
+            where.append(f"(name, id) {op} (SELECT name, id FROM artists WHERE id = ${len(args)})")
+
+        sql = "SELECT id, name, onboarding_mask FROM artists"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY name DESC, id DESC" if backward else " ORDER BY name, id"
+        args.append(limit + 1)
+        sql += f" LIMIT ${len(args)}"
+
+        async with self.acquire() as conn:
+            rows = await conn.fetch(sql, *args)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        return rows, has_more
+
+    @timed
+    async def get_artists_summary(self, query=None):
+        """
+        Сводка онбординга по артистам (всем или найденным по query).
+        :return: Запись (total, complete) — всего артистов и прошедших онбординг полностью.
+        """
+        where, args = "", []
+        if query:
+            where, args = "WHERE lower(name) LIKE $1", [f"%{like_escape(query.lower())}%"]
+        async with self.acquire() as conn:
+            return await conn.fetchrow(f"""
+                SELECT count(*) AS total,
+                       count(*) FILTER (WHERE onboarding_mask = {int(ONBOARDING_COMPLETE)}) AS complete
+                FROM artists {where}
+            """, *args)
+
+    @timed
+    async def search(self, query, user_role, user_id, limit=10):
+        """
+        Поиск по названию релизов, артистов и активных задач (подстрока без учета регистра) одним запросом.
+        Доступ как в списках: релизы и артисты — основателю и A&R (A&R видит только свои релизы),
+        задачи — основателю все, остальным только назначенные им.
+        :param limit: Максимум результатов каждого вида.
+        :return: Строки (kind, id, title, details); kind — 'release', 'artist' или 'task'.
+        """
+        args = [f"%{like_escape(query.lower())}%", limit]
+        parts = []
+        if user_role in ('founder', 'anr'):
+            owner = ""
+            if user_role != 'founder':
+                args.append(user_id)
+                owner = f"AND r.created_by = ${len(args)}"
+            parts.append(f"""
+                (SELECT 'release' AS kind, r.id, r.title,
+                        concat_ws(' · ', a.name, r.type, r.release_date::text) AS details
+                 FROM releases r LEFT JOIN artists a ON a.id = r.artist_id
+                 WHERE lower(r.title) LIKE $1 {owner}
+                 ORDER BY r.release_date DESC NULLS LAST, r.id DESC LIMIT $2)
+            """)
+            parts.append("""
+                (SELECT 'artist' AS kind, id, name AS title, NULL AS details
+                 FROM artists WHERE lower(name) LIKE $1
+                 ORDER BY name, id LIMIT $2)
+            """)
+        assignee = ""
+        if user_role != 'founder':
+            args.append(user_id)
+            assignee = f"AND t.assigned_to = ${len(args)}"
+        parts.append(f"""
+            (SELECT 'task' AS kind, t.id, t.title, concat_ws(' · ', t.status, t.deadline::text) AS details
+             FROM tasks t
+             WHERE lower(t.title) LIKE $1 AND t.status NOT IN ('done', 'rejected') {assignee}
+             ORDER BY t.deadline, t.id LIMIT $2)
+        """)
+        async with self.acquire() as conn:
+            return await conn.fetch(" UNION ALL ".join(parts), *args)
+
+    @timed
     async def create_artist(self, name, manager_id, first_release_date):
-        async with self.pool.acquire() as conn:
+        """Создает артиста (first_release_date — datetime.date или None)."""
+        async with self.acquire() as conn:
             return await conn.fetchval(
                 "INSERT INTO artists (name, manager_id, first_release_date) VALUES ($1, $2, $3) RETURNING id",
                 name, manager_id, first_release_date
             )
             
+    @timed
     async def create_release(self, title, artist_id, r_type, release_date, created_by):
-        async with self.pool.acquire() as conn:
-            return await conn.fetchval(
+        """Создает релиз (release_date — datetime.date)."""
+        async with self.acquire() as conn:
+            rel_id = await conn.fetchval(
                 "INSERT INTO releases (title, artist_id, type, release_date, created_by) VALUES ($1, $2, $3, $4, $5) RETURNING id",
                 title, artist_id, r_type, release_date, created_by
             )
+        self._invalidate_release_count(created_by)
+        return rel_id
             
-    async def get_artists_by_flag(self, flag_column, flag_value=0):
-        """Получает артистов по значению определенного флага."""
-        async with self.pool.acquire() as conn:
-            # Используем f-string для имени колонки, так как asyncpg не позволяет это в параметрах
-            return await conn.fetch(f"SELECT * FROM artists WHERE {flag_column}=$1", flag_value)
-
-    async def get_upcoming_releases(self, days_ahead):
-        """Получает релизы, которые выйдут через указанное количество дней."""
-        target_date = (datetime.date.today() + datetime.timedelta(days=days_ahead)).strftime("%Y-%m-%d")
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM releases WHERE release_date=$1", target_date)
-            
-    async def get_release_pitching_task(self, release_id):
-        """Ищет задачу на питчинг для релиза."""
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow("SELECT * FROM tasks WHERE release_id=$1 AND title LIKE '📝 Питчинг%'", release_id)
-
+    @timed
+    async def create_release_with_tasks(self, artist_name, title, r_type, release_date, created_by, tasks):
+        """
+        Атомарно создает релиз вместе с артистом (если его еще нет) и задачами релиза.
+        :param tasks: Последовательность кортежей (title, desc, assigned, deadline, req_file, task_kind);
+                      создатель и ID релиза подставляются автоматически.
+        :return: ID созданного релиза.
+        """
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                artist_id = await conn.fetchval("SELECT id FROM artists WHERE name=$1", artist_name)
+                if artist_id is None:
+                    artist_id = await conn.fetchval(
+                        "INSERT INTO artists (name, manager_id, first_release_date) VALUES ($1, $2, $3) RETURNING id",
+                        artist_name, created_by, release_date
+                    )
+                rel_id = await conn.fetchval(
+                    "INSERT INTO releases (title, artist_id, type, release_date, created_by) VALUES ($1, $2, $3, $4, $5) RETURNING id",
+                    title, artist_id, r_type, release_date, created_by
+                )
+                ids = await insert_tasks(conn, [
+                    (t_title, t_desc, assigned, created_by, rel_id, deadline, req_file, None, kind)
+                    for t_title, t_desc, assigned, deadline, req_file, kind in tasks
+                ])
+                await notify_task_changes(conn, ids)
+        self._invalidate_release_count(created_by)
+        return rel_id
+
+    async def iter_onboarding_steps(self, today, chunk_size=500):
+        """
+        Следующий шаг онбординга каждого артиста (см. bot.onboarding), вычисленный в SQL.
+        Строки читаются серверным курсором и отдаются списками по chunk_size,
+        поэтому весь список артистов не загружается в память.
+        Шаг YouTube Нотки предлагается только после даты первого релиза.
+        :return: Асинхронный итератор списков записей (id, name, manager_id, step).
+        """
+        async with self.acquire() as conn:
+            # Курсор существует только внутри транзакции
+            async with conn.transaction():
+                chunk = []
+                async for row in conn.cursor(ONBOARDING_STEPS_SELECT, today, prefetch=chunk_size):
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+
+    @timed
+    async def get_releases_at_risk(self, today, rules):
+        """
+        Незакрытые задачи релизов, по которым пора предупредить (один запрос для всех типов задач).
+        :param rules: Словарь {task_kind: days} — релиз выходит через days дней, а задача типа task_kind не закрыта.
+        :return: Записи (release_id, release_title, release_date, artist_name, days_left,
+                 task_id, task_kind, assigned_to, deadline), по релизам.
+        """
+        if not rules:
+            return []
+        kinds, days = zip(*rules.items())
+        async with self.acquire() as conn:
+            return await conn.fetch("""
+                SELECT r.id AS release_id, r.title AS release_title, r.release_date, a.name AS artist_name,
+                       rule.days AS days_left, t.id AS task_id, t.task_kind, t.assigned_to, t.deadline
+                FROM unnest($2::text[], $3::int[]) AS rule(kind, days)
+                JOIN releases r ON r.release_date = $1::date + rule.days
+                JOIN tasks t ON t.release_id = r.id AND t.task_kind = rule.kind AND t.status NOT IN ('done', 'rejected')
+                LEFT JOIN artists a ON a.id = r.artist_id
+                ORDER BY r.release_date, r.id, t.id
+            """, today, list(kinds), list(days))
+
+    @timed
     async def get_designer(self):
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
              return await conn.fetchrow("SELECT telegram_id FROM users WHERE role='designer'")
 
+    @timed
     async def get_history_founder(self, limit=20):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM tasks WHERE status='done' ORDER BY deadline DESC LIMIT $1", limit)
+        """История выполненных задач (все) с именами создателя и исполнителя."""
+        async with self.acquire() as conn:
+            return await conn.fetch(TASK_USERS_SELECT + " WHERE t.status='done' ORDER BY t.deadline DESC LIMIT $1", limit)
             
+    @timed
     async def get_history_user(self, uid, limit=20):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch("SELECT * FROM tasks WHERE status='done' AND assigned_to=$1 ORDER BY deadline DESC LIMIT $2", uid, limit)
+        """История выполненных задач пользователя с именами создателя и исполнителя."""
+        async with self.acquire() as conn:
+            return await conn.fetch(TASK_USERS_SELECT + " WHERE t.status='done' AND t.assigned_to=$1 ORDER BY t.deadline DESC LIMIT $2", uid, limit)
 
+    @timed
     async def get_last_releases(self, limit=10):
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetch("SELECT * FROM releases ORDER BY release_date DESC LIMIT $1", limit)
 
+    # --- Очередь уведомлений (outbox) ---
+    @timed
+    async def outbox_enqueue(self, rows):
+        """
+        Добавляет уведомления в outbox одним запросом.
+        Записи с уже существующим ключом идемпотентности пропускаются.
+        :param rows: Кортежи (idempotency_key, chat_id, text, reply_markup_json, priority).
+        :return: Количество добавленных записей.
+        """
+        if not rows:
+            return 0
+        async with self.acquire() as conn:
+            return await insert_outbox(conn, rows)
+
+    @timed
+    async def outbox_claim(self, limit, lease_seconds):
+        """
+        Забирает пачку уведомлений, готовых к отправке, и помечает их как 'sending' на lease_seconds.
+        Записи, захват которых истек (воркер упал), забираются повторно.
+        FOR UPDATE SKIP LOCKED позволяет нескольким воркерам не мешать друг другу.
+        """
+        async with self.acquire() as conn:
+            return await conn.fetch("""
+                UPDATE outbox o
+                SET status = 'sending', attempts = o.attempts + 1,
+                    next_attempt_at = now() + make_interval(secs => $2)
+                FROM (
+                    SELECT id FROM outbox
+                    WHERE status IN ('pending', 'sending') AND next_attempt_at <= now()
+                    ORDER BY priority, next_attempt_at, id
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                ) due
+                WHERE o.id = due.id
+                RETURNING o.id, o.chat_id, o.text, o.reply_markup, o.priority, o.attempts
+            """, limit, float(lease_seconds))
+
+    @timed
+    async def outbox_mark_delivered(self, ids):
+        """Помечает уведомления доставленными."""
+        if not ids:
+            return
+        async with self.acquire() as conn:
+            await conn.execute(
+                "UPDATE outbox SET status='delivered', delivered_at=now(), last_error=NULL WHERE id = ANY($1::bigint[])",
+                list(ids)
+            )
+
+    @timed
+    async def outbox_mark_failed(self, rows):
+        """
+        Фиксирует неудачную попытку отправки.
+        :param rows: Кортежи (id, retry_in_seconds, error); retry_in_seconds=None — больше не пытаться.
+        """
+        if not rows:
+            return
+        async with self.acquire() as conn:
+            await conn.executemany("""
+                UPDATE outbox
+                SET status = CASE WHEN $2::float8 IS NULL THEN 'failed' ELSE 'pending' END,
+                    next_attempt_at = now() + make_interval(secs => COALESCE($2::float8, 0)),
+                    last_error = $3
+                WHERE id = $1
+            """, rows)
+
+    @timed
+    async def outbox_purge(self, older_than_days):
+        """Удаляет доставленные и окончательно неудачные уведомления старше older_than_days дней."""
+        async with self.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM outbox WHERE status IN ('delivered', 'failed') AND created_at < now() - make_interval(days => $1)",
+                older_than_days
+            )
+        return int(result.split()[-1])
+
+    # --- Состояния FSM ---
+    @timed
+    async def fsm_load(self, key):
+        """Состояние и данные диалога (state, data — JSON-строка) или None, если записи нет или она истекла."""
+        async with self.acquire() as conn:
+            return await conn.fetchrow("SELECT state, data FROM fsm_state WHERE key=$1 AND expires_at > now()", key)
+
+    @timed
+    async def fsm_save(self, rows, ttl):
+        """
+        Сохраняет состояния диалогов одним запросом; срок жизни каждой записи продлевается на ttl секунд.
+        :param rows: Кортежи (key, state, data_json).
+        """
+        if not rows:
+            return
+        keys, states, datas = zip(*rows)
+        async with self.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO fsm_state (key, state, data, updated_at, expires_at)
+                SELECT k, s, d, now(), now() + make_interval(secs => $4)
+                FROM unnest($1::text[], $2::text[], $3::jsonb[]) AS t(k, s, d)
+                ON CONFLICT (key) DO UPDATE
+                SET state = EXCLUDED.state, data = EXCLUDED.data,
+                    updated_at = EXCLUDED.updated_at, expires_at = EXCLUDED.expires_at
+            """, keys, states, datas, float(ttl))
+
+    @timed
+    async def fsm_delete(self, keys):
+        """Удаляет состояния диалогов (диалог завершен: нет ни состояния, ни данных)."""
+        if not keys:
+            return
+        async with self.acquire() as conn:
+            await conn.execute("DELETE FROM fsm_state WHERE key = ANY($1::text[])", list(keys))
+
+    @timed
+    async def fsm_purge_expired(self):
+        """Удаляет истекшие состояния диалогов. :return: Количество удаленных записей."""
+        async with self.acquire() as conn:
+            result = await conn.execute("DELETE FROM fsm_state WHERE expires_at <= now()")
+        return int(result.split()[-1])
+
+    # --- Плановые задачи ---
+    @timed
+    async def job_register(self, job_id, schedule):
+        """Сохраняет плановую задачу и ее расписание."""
+        async with self.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO job_state (job_id, schedule) VALUES ($1, $2)
+                ON CONFLICT (job_id) DO UPDATE SET schedule = EXCLUDED.schedule
+            """, job_id, schedule)
+
+    @timed
+    async def get_job_states(self):
+        """Состояние всех плановых задач."""
+        async with self.acquire() as conn:
+            return await conn.fetch("SELECT * FROM job_state ORDER BY job_id")
+
+    @timed
+    async def job_try_start(self, job_id, stale_after):
+        """
+        Отмечает начало запуска, если задача сейчас не выполняется
+        (незавершенный запуск старше stale_after секунд считается зависшим).
+        :return: ID запуска в job_runs или None, если предыдущий запуск еще идет.
+        """
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                started = await conn.fetchval("""
+                    UPDATE job_state SET running_since = now()
+                    WHERE job_id = $1 AND (running_since IS NULL OR running_since < now() - make_interval(secs => $2))
+                    RETURNING job_id
+                """, job_id, float(stale_after))
+                if started is None:
+                    await conn.execute(
+                        "INSERT INTO job_runs (job_id, finished_at, duration, status) VALUES ($1, now(), 0, 'skipped')", job_id
+                    )
+                    return None
+                return await conn.fetchval("INSERT INTO job_runs (job_id, status) VALUES ($1, 'running') RETURNING id", job_id)
+
+    @timed
+    async def job_finish(self, run_id, status, error=None):
+        """Фиксирует результат запуска ('ok' или 'error') и его длительность."""
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                run = await conn.fetchrow("""
+                    UPDATE job_runs
+                    SET finished_at = now(), duration = EXTRACT(EPOCH FROM now() - started_at), status = $2, error = $3
+                    WHERE id = $1
+                    RETURNING job_id, started_at, duration
+                """, run_id, status, error)
+                await conn.execute("""
+                    UPDATE job_state
+                    SET running_since = NULL, last_run_at = $2, last_status = $3, last_duration = $4
+                    WHERE job_id = $1
+                """, run['job_id'], run['started_at'], status, run['duration'])
+
+def create_database(backend=DB_BACKEND, dsn=DATABASE_URL):
+    """
+    Создает хранилище выбранного типа.
+    :param backend: 'postgres' (по умолчанию) или 'memory' — хранилище в памяти для тестов и бенчмарков.
+    """
+    if backend == 'postgres':
+        return Database(dsn)
+    if backend == 'memory':
+        from bot.db_memory import MemoryDatabase
+        return MemoryDatabase()
+    raise ValueError(f"Неизвестный тип хранилища: {backend}")
+
 # Создаем глобальный экземпляр БД
-db = Database(DATABASE_URL)
+db = create_database()
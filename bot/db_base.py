@@ -0,0 +1,275 @@
+import datetime
+import html
+from abc import ABC, abstractmethod
+
+def format_user_link(uid, name=None, username=None):
+    """
+    Формирует HTML-ссылку на пользователя по уже известным имени и username (экранируются).
+    Если имя неизвестно (пользователя нет в БД), возвращает "ID:<uid>".
+    """
+    if name is None:
+        return f"ID:{uid}"
+    name = html.escape(name)
+    if username:
+        return f"<a href='tg://user?id={uid}'>{name}</a> (@{html.escape(username)})"
+    return f"<a href='tg://user?id={uid}'>{name}</a>"
+
+class BaseDatabase(ABC):
+    """
+    Интерфейс хранилища данных бота.
+    Реализации: Database (PostgreSQL, bot.database) и MemoryDatabase (в памяти, bot.db_memory).
+    Методы возвращают записи, поддерживающие доступ по ключу (r['col'] и r.get('col')),
+    даты передаются и возвращаются как datetime.date.
+    """
+
+    # --- Жизненный цикл ---
+    @abstractmethod
+    async def connect(self):
+        """Подготавливает хранилище к работе."""
+
+    @abstractmethod
+    async def close(self):
+        """Освобождает ресурсы хранилища."""
+
+    def pool_stats(self):
+        """Состояние пула соединений (пустой словарь, если пула нет)."""
+        return {}
+
+    # --- Пользователи ---
+    @abstractmethod
+    async def get_user(self, uid):
+        """Пользователь по Telegram ID или None."""
+
+    @abstractmethod
+    async def add_user(self, uid, name, role, username=None):
+        """Добавляет или обновляет пользователя."""
+
+    @abstractmethod
+    async def delete_user(self, uid):
+        """Удаляет пользователя."""
+
+    @abstractmethod
+    async def get_all_users(self):
+        """Все пользователи, отсортированные по роли."""
+
+    @abstractmethod
+    async def get_designer(self):
+        """Запись (telegram_id) любого дизайнера или None."""
+
+    @abstractmethod
+    async def mark_user_unreachable(self, uid, reason):
+        """Отмечает неудачную доставку пользователю и откладывает следующую попытку."""
+
+    @abstractmethod
+    async def clear_user_unreachable(self, uid):
+        """Снимает отметку недоступности пользователя."""
+
+    @abstractmethod
+    async def get_unreachable_users(self):
+        """Пользователи, отмеченные как недоступные."""
+
+    @staticmethod
+    def is_user_unreachable(user, now=None):
+        """Нужно ли пропустить отправку пользователю (отмечен недоступным и пауза еще не истекла)."""
+        if not user or not user.get('unreachable_retry_at'):
+            return False
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        return user['unreachable_retry_at'] > now
+
+    async def get_user_link(self, uid):
+        """
+        Генерирует HTML-ссылку на пользователя.
+        """
+        u = await self.get_user(uid)
+        if u:
+            return format_user_link(uid, u['name'], u.get('username'))
+        return f"ID:{uid}"
+
+    # --- Задачи ---
+    @abstractmethod
+    async def create_task(self, title, desc, assigned, created, rel_id, deadline, req_file=0, parent_id=None, task_kind=None):
+        """Создает задачу, возвращает ее ID."""
+
+    @abstractmethod
+    async def get_tasks_by_ids(self, ids):
+        """Задачи по списку ID."""
+
+    @abstractmethod
+    async def get_open_tasks_by_deadline(self, until, cursor=None, limit=500):
+        """Открытые задачи с дедлайном не позже until по возрастанию (deadline, id), после cursor."""
+
+    @abstractmethod
+    async def mark_tasks_overdue(self, ids, build_outbox=None):
+        """
+        Помечает открытые задачи из списка просроченными; возвращает измененные (id, assigned_to, title).
+        Строки outbox из build_outbox(changed) ставятся атомарно со сменой статуса.
+        """
+
+    @abstractmethod
+    async def subscribe_task_changes(self, callback):
+        """Подписка на создание и изменение задач: callback(ids) или callback(None); возвращает async-функцию отписки."""
+
+    @abstractmethod
+    async def get_active_tasks_page(self, assigned_to=None, cursor=None, backward=False, limit=10):
+        """Страница активных задач (всех или исполнителя) по (deadline, id); возвращает (rows, has_more)."""
+
+    @abstractmethod
+    async def get_task_with_users(self, tid):
+        """Задача по ID с именами создателя и исполнителя или None."""
+
+    @abstractmethod
+    async def get_task_by_id(self, tid):
+        """Задача по ID или None."""
+
+    @abstractmethod
+    async def update_task_status(self, tid, status, file_url=None, comment=None):
+        """Обновляет статус задачи (и файл/комментарий, если переданы)."""
+
+    @abstractmethod
+    async def delete_task(self, task_id):
+        """Удаляет задачу."""
+
+    @abstractmethod
+    async def sweep_overdue(self, today, build_outbox=None):
+        """
+        Помечает просроченные задачи, возвращает (newly_overdue, still_overdue).
+        Строки outbox из build_outbox(newly_overdue, still_overdue) ставятся атомарно со сменой статуса.
+        """
+
+    @abstractmethod
+    async def get_releases_at_risk(self, today, rules):
+        """Незакрытые задачи релизов по правилам {task_kind: days до релиза}."""
+
+    @abstractmethod
+    async def get_history_founder(self, limit=20):
+        """Последние выполненные задачи (все)."""
+
+    @abstractmethod
+    async def get_history_user(self, uid, limit=20):
+        """Последние выполненные задачи пользователя."""
+
+    # --- Релизы ---
+    @abstractmethod
+    async def create_release(self, title, artist_id, r_type, release_date, created_by):
+        """Создает релиз, возвращает его ID."""
+
+    @abstractmethod
+    async def create_release_with_tasks(self, artist_name, title, r_type, release_date, created_by, tasks):
+        """Атомарно создает артиста (при необходимости), релиз и его задачи; возвращает ID релиза."""
+
+    @abstractmethod
+    async def delete_release_cascade(self, release_id):
+        """Удаляет релиз вместе с его задачами."""
+
+    @abstractmethod
+    async def get_releases_page(self, user_role, user_id, cursor=None, backward=False, limit=5):
+        """Страница релизов (keyset по (release_date, id)): (rows, has_more)."""
+
+    @abstractmethod
+    async def count_releases(self, user_role, user_id):
+        """Количество релизов, видимых пользователю."""
+
+    @abstractmethod
+    async def get_last_releases(self, limit=10):
+        """Последние релизы по дате выхода."""
+
+    # --- Артисты ---
+    @abstractmethod
+    async def create_artist(self, name, manager_id, first_release_date):
+        """Создает артиста, возвращает его ID."""
+
+    @abstractmethod
+    async def get_artist_by_name(self, name):
+        """Запись (id) артиста по имени или None."""
+
+    @abstractmethod
+    async def get_artist_by_id(self, aid):
+        """Артист по ID или None."""
+
+    @abstractmethod
+    async def get_artists_page(self, query=None, cursor=None, backward=False, limit=10):
+        """Страница артистов по (name, id) с поиском по подстроке имени; возвращает (rows, has_more)."""
+
+    @abstractmethod
+    async def get_artists_summary(self, query=None):
+        """Сводка онбординга (total, complete) по всем или найденным артистам."""
+
+    @abstractmethod
+    async def search(self, query, user_role, user_id, limit=10):
+        """Поиск релизов, артистов и задач по названию с учетом роли; строки (kind, id, title, details)."""
+
+    @abstractmethod
+    def iter_onboarding_steps(self, today, chunk_size=500):
+        """Асинхронный итератор списков (id, name, manager_id, step) — следующий шаг онбординга артистов."""
+
+    @abstractmethod
+    async def update_artist_flag(self, artist_id, flag, value=True):
+        """Отмечает шаг онбординга пройденным или снимает отметку; возвращает новую маску или None."""
+
+    @abstractmethod
+    async def toggle_artist_flag(self, artist_id, flag):
+        """Переключает шаг онбординга; возвращает новую маску или None."""
+
+    # --- Отчеты ---
+    @abstractmethod
+    async def create_report(self, user_id, report_date, text):
+        """Создает отчет пользователя."""
+
+    @abstractmethod
+    async def get_reports(self, user_id, limit=20):
+        """Последние отчеты пользователя."""
+
+    # --- Очередь уведомлений (outbox) ---
+    @abstractmethod
+    async def outbox_enqueue(self, rows):
+        """Добавляет уведомления (key, chat_id, text, reply_markup_json, priority), пропуская известные ключи; возвращает число добавленных."""
+
+    @abstractmethod
+    async def outbox_claim(self, limit, lease_seconds):
+        """Забирает пачку готовых к отправке уведомлений на lease_seconds секунд."""
+
+    @abstractmethod
+    async def outbox_mark_delivered(self, ids):
+        """Помечает уведомления доставленными."""
+
+    @abstractmethod
+    async def outbox_mark_failed(self, rows):
+        """Фиксирует неудачные попытки: (id, retry_in_seconds или None, error)."""
+
+    @abstractmethod
+    async def outbox_purge(self, older_than_days):
+        """Удаляет старые завершенные уведомления; возвращает их количество."""
+
+    # --- Состояния FSM ---
+    @abstractmethod
+    async def fsm_load(self, key):
+        """Состояние и данные диалога (state, data — JSON-строка) или None, если нет или истекло."""
+
+    @abstractmethod
+    async def fsm_save(self, rows, ttl):
+        """Сохраняет кортежи (key, state, data_json), продлевая срок жизни на ttl секунд."""
+
+    @abstractmethod
+    async def fsm_delete(self, keys):
+        """Удаляет состояния диалогов по ключам."""
+
+    @abstractmethod
+    async def fsm_purge_expired(self):
+        """Удаляет истекшие состояния диалогов; возвращает их количество."""
+
+    # --- Плановые задачи ---
+    @abstractmethod
+    async def job_register(self, job_id, schedule):
+        """Сохраняет плановую задачу и ее расписание."""
+
+    @abstractmethod
+    async def get_job_states(self):
+        """Состояние всех плановых задач (последний запуск, результат, длительность)."""
+
+    @abstractmethod
+    async def job_try_start(self, job_id, stale_after):
+        """Отмечает начало запуска; None, если предыдущий запуск еще идет."""
+
+    @abstractmethod
+    async def job_finish(self, run_id, status, error=None):
+        """Фиксирует результат и длительность запуска."""
@@ -0,0 +1,559 @@
+import datetime
+import logging
+import time
+from collections import defaultdict
+
+from bot.config import ADMIN_IDS, UNREACHABLE_BACKOFF_BASE, UNREACHABLE_BACKOFF_MAX
+from bot.db_base import BaseDatabase
+from bot.onboarding import STEP_FLAGS, YT_NOTE, ONBOARDING_COMPLETE
+
+logger = logging.getLogger(__name__)
+
+# Ключ сортировки по возрастанию в духе PostgreSQL: NULL идут последними
+def _asc(value):
+    return (value is None, value if value is not None else 0)
+
+class _Desc:
+    """Обертка для сортировки по убыванию значений, не являющихся числами (даты, строки)."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+# Ключ сортировки по убыванию: NULL идут первыми (как DESC в PostgreSQL по умолчанию)
+def _desc(value):
+    return (value is not None, _Desc(value) if value is not None else 0)
+
+# Ключ сортировки по убыванию с NULL в конце (DESC NULLS LAST)
+def _desc_nulls_last(value):
+    return (value is None, _Desc(value) if value is not None else 0)
+
+class MemoryDatabase(BaseDatabase):
+    """
+    Хранилище в памяти процесса с тем же набором методов и семантикой, что и Database.
+    Используется для тестов и нагрузочных прогонов без PostgreSQL; данные не сохраняются между запусками.
+    """
+    def __init__(self):
+        self.users = {}
+        self.artists = {}
+        self.releases = {}
+        self.tasks = {}
+        self.reports = {}
+        self.outbox = {}
+        self.job_state = {}
+        self.job_runs = {}
+        self.fsm_state = {}
+        # Подписчики на изменения задач (subscribe_task_changes)
+        self._task_listeners = []
+        # Последние выданные ID по таблицам (аналог SERIAL)
+        self._seq = defaultdict(int)
+
+    def _next_id(self, table):
+        self._seq[table] += 1
+        return self._seq[table]
+
+    def _with_task_users(self, t):
+        """Добавляет к задаче имена создателя и исполнителя (как TASK_USERS_SELECT)."""
+        creator = self.users.get(t['created_by'])
+        assignee = self.users.get(t['assigned_to'])
+        row = dict(t)
+        row['creator_name'] = creator['name'] if creator else None
+        row['creator_username'] = creator['username'] if creator else None
+        row['assignee_name'] = assignee['name'] if assignee else None
+        row['assignee_username'] = assignee['username'] if assignee else None
+        return row
+
+    # --- Жизненный цикл ---
+    async def connect(self):
+        for uid in ADMIN_IDS:
+            if uid not in self.users:
+                self.users[uid] = self._new_user(uid, "Founder", "founder", None)
+        logger.info("Используется хранилище в памяти (DB_BACKEND=memory).")
+
+    async def close(self):
+        pass
+
+    # --- Пользователи ---
+    async def get_user(self, uid):
+        u = self.users.get(uid)
+        return dict(u) if u else None
+
+    def _new_user(self, uid, name, role, username):
+        return {
+            'telegram_id': uid, 'name': name, 'username': username, 'role': role,
+            'unreachable_since': None, 'unreachable_retry_at': None, 'unreachable_attempts': 0, 'unreachable_reason': None,
+        }
+
+    async def add_user(self, uid, name, role, username=None):
+        u = self.users.get(uid)
+        if u:
+            u.update(name=name, role=role, username=username)
+        else:
+            self.users[uid] = self._new_user(uid, name, role, username)
+
+    async def delete_user(self, uid):
+        self.users.pop(uid, None)
+
+    async def get_all_users(self):
+        return [dict(u) for u in sorted(self.users.values(), key=lambda u: _asc(u['role']))]
+
+    async def mark_user_unreachable(self, uid, reason):
+        u = self.users.get(uid)
+        if not u:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        delay = min(UNREACHABLE_BACKOFF_BASE * 2 ** u['unreachable_attempts'], UNREACHABLE_BACKOFF_MAX)
+        u['unreachable_since'] = u['unreachable_since'] or now
+        u['unreachable_attempts'] += 1
+        u['unreachable_retry_at'] = now + datetime.timedelta(seconds=delay)
+        u['unreachable_reason'] = reason
+
+    async def clear_user_unreachable(self, uid):
+        u = self.users.get(uid)
+        if u:
+            u.update(unreachable_since=None, unreachable_retry_at=None, unreachable_attempts=0, unreachable_reason=None)
+
+    async def get_unreachable_users(self):
+        rows = [u for u in self.users.values() if u['unreachable_since'] is not None]
+        rows.sort(key=lambda u: (u['unreachable_since'], u['telegram_id']))
+        return [dict(u) for u in rows]
+
+    async def get_designer(self):
+        for u in self.users.values():
+            if u['role'] == 'designer':
+                return {'telegram_id': u['telegram_id']}
+        return None
+
+    # --- Задачи ---
+    async def create_task(self, title, desc, assigned, created, rel_id, deadline, req_file=0, parent_id=None, task_kind=None):
+        tid = self._next_id('tasks')
+        self.tasks[tid] = {
+            'id': tid, 'title': title, 'description': desc, 'assigned_to': assigned, 'created_by': created,
+            'release_id': rel_id, 'parent_task_id': parent_id, 'deadline': deadline, 'status': 'pending',
+            'requires_file': req_file, 'file_url': None, 'comment': None, 'task_kind': task_kind,
+        }
+        self._emit_task_changes([tid])
+        return tid
+
+    def _emit_task_changes(self, ids):
+        for callback in list(self._task_listeners):
+            callback(list(ids))
+
+    async def subscribe_task_changes(self, callback):
+        self._task_listeners.append(callback)
+
+        async def unsubscribe():
+            if callback in self._task_listeners:
+                self._task_listeners.remove(callback)
+        return unsubscribe
+
+    async def get_tasks_by_ids(self, ids):
+        return [dict(self.tasks[i]) for i in sorted(set(ids)) if i in self.tasks]
+
+    async def get_open_tasks_by_deadline(self, until, cursor=None, limit=500):
+        rows = [
+            t for t in self.tasks.values()
+            if t['status'] not in ('done', 'rejected', 'overdue') and t['deadline'] is not None and t['deadline'] <= until
+            and (cursor is None or (t['deadline'], t['id']) > tuple(cursor))
+        ]
+        rows.sort(key=lambda t: (t['deadline'], t['id']))
+        return [{'id': t['id'], 'deadline': t['deadline'], 'status': t['status']} for t in rows[:limit]]
+
+    async def mark_tasks_overdue(self, ids, build_outbox=None):
+        tasks = [t for t in map(self.tasks.get, ids) if t and t['status'] not in ('done', 'rejected', 'overdue')]
+        changed = [{'id': t['id'], 'assigned_to': t['assigned_to'], 'title': t['title']} for t in tasks]
+        # Строки outbox строятся до изменений (ошибка ничего не меняет), дальше без await — атомарно
+        rows = build_outbox(changed) if build_outbox is not None else []
+        for t in tasks:
+            t['status'] = 'overdue'
+        self._outbox_insert(rows)
+        return changed
+
+    async def get_active_tasks_page(self, assigned_to=None, cursor=None, backward=False, limit=10):
+        def order_key(deadline, tid):
+            return (_asc(deadline), tid)
+
+        rows = [
+            t for t in self.tasks.values()
+            if t['status'] not in ('done', 'rejected') and (assigned_to is None or t['assigned_to'] == assigned_to)
+        ]
+        rows.sort(key=lambda t: order_key(t['deadline'], t['id']))
+
+        if cursor is None:
+            page = rows
+        else:
+            ck = order_key(*cursor)
+            if backward:
+                page = [t for t in rows if order_key(t['deadline'], t['id']) < ck]
+            else:
+                page = [t for t in rows if ck < order_key(t['deadline'], t['id'])]
+
+        has_more = len(page) > limit
+        page = page[-limit:] if backward else page[:limit]
+        return [self._with_task_users(t) for t in page], has_more
+
+    async def get_task_with_users(self, tid):
+        t = self.tasks.get(tid)
+        return self._with_task_users(t) if t else None
+
+    async def get_task_by_id(self, tid):
+        t = self.tasks.get(tid)
+        return dict(t) if t else None
+
+    async def update_task_status(self, tid, status, file_url=None, comment=None):
+        t = self.tasks.get(tid)
+        if not t:
+            return
+        t['status'] = status
+        if file_url or comment:
+            t['file_url'] = file_url
+            t['comment'] = comment
+        self._emit_task_changes([tid])
+
+    async def delete_task(self, task_id):
+        self.tasks.pop(task_id, None)
+
+    async def sweep_overdue(self, today, build_outbox=None):
+        still_overdue = [
+            {'id': t['id'], 'assigned_to': t['assigned_to'], 'title': t['title']}
+            for t in sorted(self.tasks.values(), key=lambda t: t['id']) if t['status'] == 'overdue'
+        ]
+        tasks = [
+            t for t in self.tasks.values()
+            if t['deadline'] is not None and t['deadline'] < today and t['status'] not in ('done', 'rejected', 'overdue')
+        ]
+        newly_overdue = [{'id': t['id'], 'assigned_to': t['assigned_to'], 'title': t['title']} for t in tasks]
+        # Как в mark_tasks_overdue: строки outbox до изменений, смена статуса и вставка без await
+        rows = build_outbox(newly_overdue, still_overdue) if build_outbox is not None else []
+        for t in tasks:
+            t['status'] = 'overdue'
+        self._outbox_insert(rows)
+        return newly_overdue, still_overdue
+
+    async def get_releases_at_risk(self, today, rules):
+        rows = []
+        for kind, days in rules.items():
+            target = today + datetime.timedelta(days=days)
+            for r in self.releases.values():
+                if r['release_date'] != target:
+                    continue
+                artist = self.artists.get(r['artist_id'])
+                for t in self.tasks.values():
+                    if t['release_id'] == r['id'] and t['task_kind'] == kind and t['status'] not in ('done', 'rejected'):
+                        rows.append({
+                            'release_id': r['id'], 'release_title': r['title'], 'release_date': r['release_date'],
+                            'artist_name': artist['name'] if artist else None, 'days_left': days,
+                            'task_id': t['id'], 'task_kind': kind, 'assigned_to': t['assigned_to'], 'deadline': t['deadline'],
+                        })
+        rows.sort(key=lambda row: (row['release_date'], row['release_id'], row['task_id']))
+        return rows
+
+    async def get_history_founder(self, limit=20):
+        rows = [t for t in self.tasks.values() if t['status'] == 'done']
+        rows.sort(key=lambda t: _desc(t['deadline']))
+        return [self._with_task_users(t) for t in rows[:limit]]
+
+    async def get_history_user(self, uid, limit=20):
+        rows = [t for t in self.tasks.values() if t['status'] == 'done' and t['assigned_to'] == uid]
+        rows.sort(key=lambda t: _desc(t['deadline']))
+        return [self._with_task_users(t) for t in rows[:limit]]
+
+    # --- Релизы ---
+    async def create_release(self, title, artist_id, r_type, release_date, created_by):
+        rid = self._next_id('releases')
+        self.releases[rid] = {
+            'id': rid, 'title': title, 'artist_id': artist_id, 'type': r_type,
+            'release_date': release_date, 'created_by': created_by,
+        }
+        return rid
+
+    async def create_release_with_tasks(self, artist_name, title, r_type, release_date, created_by, tasks):
+        artist = await self.get_artist_by_name(artist_name)
+        artist_id = artist['id'] if artist else await self.create_artist(artist_name, created_by, release_date)
+        rel_id = await self.create_release(title, artist_id, r_type, release_date, created_by)
+        for t_title, t_desc, assigned, deadline, req_file, kind in tasks:
+            await self.create_task(t_title, t_desc, assigned, created_by, rel_id, deadline, req_file, task_kind=kind)
+        return rel_id
+
+    async def delete_release_cascade(self, release_id):
+        for tid in [t['id'] for t in self.tasks.values() if t['release_id'] == release_id]:
+            del self.tasks[tid]
+        self.releases.pop(release_id, None)
+
+    async def get_releases_page(self, user_role, user_id, cursor=None, backward=False, limit=5):
+        def order_key(r_date, rid):
+            return (_desc_nulls_last(r_date), -rid)
+
+        rows = [r for r in self.releases.values() if user_role == 'founder' or r['created_by'] == user_id]
+        rows.sort(key=lambda r: order_key(r['release_date'], r['id']))
+
+        if cursor is None:
+            page = rows
+        else:
+            ck = order_key(*cursor)
+            if backward:
+                page = [r for r in rows if order_key(r['release_date'], r['id']) < ck]
+            else:
+                page = [r for r in rows if ck < order_key(r['release_date'], r['id'])]
+
+        has_more = len(page) > limit
+        page = page[-limit:] if backward else page[:limit]
+
+        result = []
+        for r in page:
+            row = dict(r)
+            if user_role == 'founder':
+                creator = self.users.get(r['created_by'])
+                row['creator_name'] = creator['name'] if creator else None
+            result.append(row)
+        return result, has_more
+
+    async def count_releases(self, user_role, user_id):
+        if user_role == 'founder':
+            return len(self.releases)
+        return sum(1 for r in self.releases.values() if r['created_by'] == user_id)
+
+    async def get_last_releases(self, limit=10):
+        rows = sorted(self.releases.values(), key=lambda r: _desc(r['release_date']))
+        return [dict(r) for r in rows[:limit]]
+
+    # --- Артисты ---
+    async def create_artist(self, name, manager_id, first_release_date):
+        aid = self._next_id('artists')
+        self.artists[aid] = {
+            'id': aid, 'name': name, 'manager_id': manager_id, 'first_release_date': first_release_date,
+            'onboarding_mask': 0,
+        }
+        return aid
+
+    async def get_artist_by_name(self, name):
+        for a in self.artists.values():
+            if a['name'] == name:
+                return {'id': a['id']}
+        return None
+
+    async def get_artist_by_id(self, aid):
+        a = self.artists.get(aid)
+        return dict(a) if a else None
+
+    def _search_artists(self, query):
+        rows = [a for a in self.artists.values() if not query or query.lower() in (a['name'] or "").lower()]
+        rows.sort(key=lambda a: (_asc(a['name']), a['id']))
+        return rows
+
+    async def get_artists_page(self, query=None, cursor=None, backward=False, limit=10):
+        rows = self._search_artists(query)
+        if cursor is not None:
+            edge = self.artists.get(cursor)
+            if edge is None:
+                return [], False
+            ck = (_asc(edge['name']), edge['id'])
+            if backward:
+                rows = [a for a in rows if (_asc(a['name']), a['id']) < ck]
+            else:
+                rows = [a for a in rows if ck < (_asc(a['name']), a['id'])]
+
+        has_more = len(rows) > limit
+        page = rows[-limit:] if backward else rows[:limit]
+        return [{'id': a['id'], 'name': a['name'], 'onboarding_mask': a['onboarding_mask']} for a in page], has_more
+
+    async def get_artists_summary(self, query=None):
+        rows = self._search_artists(query)
+        return {'total': len(rows), 'complete': sum(1 for a in rows if a['onboarding_mask'] == ONBOARDING_COMPLETE)}
+
+    async def search(self, query, user_role, user_id, limit=10):
+        q = query.lower()
+
+        def found(title):
+            return title is not None and q in title.lower()
+
+        rows = []
+        if user_role in ('founder', 'anr'):
+            releases = [
+                r for r in self.releases.values()
+                if found(r['title']) and (user_role == 'founder' or r['created_by'] == user_id)
+            ]
+            releases.sort(key=lambda r: (_desc_nulls_last(r['release_date']), -r['id']))
+            for r in releases[:limit]:
+                artist = self.artists.get(r['artist_id'])
+                details = [artist['name'] if artist else None, r['type'], str(r['release_date']) if r['release_date'] else None]
+                rows.append({'kind': 'release', 'id': r['id'], 'title': r['title'],
+                             'details': ' · '.join(d for d in details if d)})
+            for a in self._search_artists(query)[:limit]:
+                rows.append({'kind': 'artist', 'id': a['id'], 'title': a['name'], 'details': None})
+        tasks = [
+            t for t in self.tasks.values()
+            if found(t['title']) and t['status'] not in ('done', 'rejected')
+            and (user_role == 'founder' or t['assigned_to'] == user_id)
+        ]
+        tasks.sort(key=lambda t: (_asc(t['deadline']), t['id']))
+        for t in tasks[:limit]:
+            details = [t['status'], str(t['deadline']) if t['deadline'] else None]
+            rows.append({'kind': 'task', 'id': t['id'], 'title': t['title'], 'details': ' · '.join(d for d in details if d)})
+        return rows
+
+    async def iter_onboarding_steps(self, today, chunk_size=500):
+        chunk = []
+        for aid in sorted(self.artists):
+            a = self.artists[aid]
+            if a['manager_id'] is None:
+                continue
+            step = next((code for code, flag in STEP_FLAGS.items() if not a['onboarding_mask'] & flag), None)
+            if step == YT_NOTE and (a['first_release_date'] is None or a['first_release_date'] > today):
+                continue
+            if step is not None:
+                chunk.append({'id': aid, 'name': a['name'], 'manager_id': a['manager_id'], 'step': step})
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def update_artist_flag(self, artist_id, flag, value=True):
+        a = self.artists.get(artist_id)
+        if a is None:
+            return None
+        flag = int(flag)
+        a['onboarding_mask'] = a['onboarding_mask'] | flag if value else a['onboarding_mask'] & ~flag
+        return a['onboarding_mask']
+
+    async def toggle_artist_flag(self, artist_id, flag):
+        a = self.artists.get(artist_id)
+        if a is None:
+            return None
+        a['onboarding_mask'] ^= int(flag)
+        return a['onboarding_mask']
+
+    # --- Отчеты ---
+    async def create_report(self, user_id, report_date, text):
+        rid = self._next_id('reports')
+        self.reports[rid] = {'id': rid, 'user_id': user_id, 'report_date': report_date, 'text': text}
+
+    async def get_reports(self, user_id, limit=20):
+        rows = sorted((r for r in self.reports.values() if r['user_id'] == user_id), key=lambda r: -r['id'])
+        return [dict(r) for r in rows[:limit]]
+
+    # --- Очередь уведомлений (outbox) ---
+    async def outbox_enqueue(self, rows):
+        return self._outbox_insert(rows)
+
+    def _outbox_insert(self, rows):
+        known = {o['idempotency_key'] for o in self.outbox.values()}
+        inserted = 0
+        now = time.time()
+        for key, chat_id, text, reply_markup, priority in rows:
+            if key in known:
+                continue
+            known.add(key)
+            oid = self._next_id('outbox')
+            self.outbox[oid] = {
+                'id': oid, 'idempotency_key': key, 'chat_id': chat_id, 'text': text, 'reply_markup': reply_markup,
+                'priority': priority, 'status': 'pending', 'attempts': 0, 'next_attempt_at': now,
+                'last_error': None, 'created_at': now, 'delivered_at': None,
+            }
+            inserted += 1
+        return inserted
+
+    async def outbox_claim(self, limit, lease_seconds):
+        now = time.time()
+        due = [o for o in self.outbox.values() if o['status'] in ('pending', 'sending') and o['next_attempt_at'] <= now]
+        due.sort(key=lambda o: (o['priority'], o['next_attempt_at'], o['id']))
+        claimed = []
+        for o in due[:limit]:
+            o['status'] = 'sending'
+            o['attempts'] += 1
+            o['next_attempt_at'] = now + lease_seconds
+            claimed.append({k: o[k] for k in ('id', 'chat_id', 'text', 'reply_markup', 'priority', 'attempts')})
+        return claimed
+
+    async def outbox_mark_delivered(self, ids):
+        now = time.time()
+        for oid in ids:
+            o = self.outbox.get(oid)
+            if o:
+                o.update(status='delivered', delivered_at=now, last_error=None)
+
+    async def outbox_mark_failed(self, rows):
+        now = time.time()
+        for oid, retry_in, error in rows:
+            o = self.outbox.get(oid)
+            if o:
+                o.update(
+                    status='failed' if retry_in is None else 'pending',
+                    next_attempt_at=now + (retry_in or 0), last_error=error
+                )
+
+    async def outbox_purge(self, older_than_days):
+        cutoff = time.time() - older_than_days * 86400
+        old = [oid for oid, o in self.outbox.items() if o['status'] in ('delivered', 'failed') and o['created_at'] < cutoff]
+        for oid in old:
+            del self.outbox[oid]
+        return len(old)
+
+    # --- Состояния FSM ---
+    async def fsm_load(self, key):
+        row = self.fsm_state.get(key)
+        if row is None or row['expires_at'] <= time.time():
+            return None
+        return {'state': row['state'], 'data': row['data']}
+
+    async def fsm_save(self, rows, ttl):
+        now = time.time()
+        for key, state, data in rows:
+            self.fsm_state[key] = {'state': state, 'data': data, 'updated_at': now, 'expires_at': now + ttl}
+
+    async def fsm_delete(self, keys):
+        for key in keys:
+            self.fsm_state.pop(key, None)
+
+    async def fsm_purge_expired(self):
+        now = time.time()
+        expired = [key for key, row in self.fsm_state.items() if row['expires_at'] <= now]
+        for key in expired:
+            del self.fsm_state[key]
+        return len(expired)
+
+    # --- Плановые задачи ---
+    async def job_register(self, job_id, schedule):
+        state = self.job_state.setdefault(job_id, {
+            'job_id': job_id, 'schedule': schedule, 'last_run_at': None, 'last_status': None,
+            'last_duration': None, 'running_since': None,
+        })
+        state['schedule'] = schedule
+
+    async def get_job_states(self):
+        return [dict(self.job_state[k]) for k in sorted(self.job_state)]
+
+    async def job_try_start(self, job_id, stale_after):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        state = self.job_state.get(job_id)
+        run_id = self._next_id('job_runs')
+        running = state is None or (
+            state['running_since'] is not None and state['running_since'] >= now - datetime.timedelta(seconds=stale_after)
+        )
+        if running:
+            self.job_runs[run_id] = {
+                'id': run_id, 'job_id': job_id, 'started_at': now, 'finished_at': now,
+                'duration': 0.0, 'status': 'skipped', 'error': None,
+            }
+            return None
+        state['running_since'] = now
+        self.job_runs[run_id] = {
+            'id': run_id, 'job_id': job_id, 'started_at': now, 'finished_at': None,
+            'duration': None, 'status': 'running', 'error': None,
+        }
+        return run_id
+
+    async def job_finish(self, run_id, status, error=None):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        run = self.job_runs[run_id]
+        run.update(finished_at=now, duration=(now - run['started_at']).total_seconds(), status=status, error=error)
+        self.job_state[run['job_id']].update(
+            running_since=None, last_run_at=run['started_at'], last_status=status, last_duration=run['duration']
+        )
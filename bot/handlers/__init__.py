@@ -6,6 +6,7 @@ from .releases import router as releases_router
 from .tasks import router as tasks_router
 from .reports import router as reports_router
 from .artists import router as artists_router
+from .search import router as search_router
 
 router = Router()
 
@@ -15,3 +16,4 @@ router.include_router(releases_router)
 router.include_router(tasks_router)
 router.include_router(reports_router)
 router.include_router(artists_router)
+router.include_router(search_router)
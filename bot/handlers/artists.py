@@ -1,43 +1,111 @@
-import datetime
 from aiogram import Router, F, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from bot.config import ADMIN_IDS
-from bot.utils import notify_user
+from bot.utils import notify_many_background, parse_date, escape_html
 from bot.database import db
-from bot.states import CreateArtist
+from bot.states import CreateArtist, ArtistSearch
+from bot.onboarding import STEP_FLAGS, FLAG_LABELS, status_icons
 from bot.keyboards.builders import get_cancel_kb, get_main_kb
 
 router = Router()
 
+# --- ARTISTS LIST (PAGINATION & SEARCH) ---
+ARTISTS_PAGE_SIZE = 10
+
 @router.message(F.text == "🎤 Артисты")
-async def list_artists(m: types.Message):
-    """Список всех артистов."""
-    user = await db.get_user(m.from_user.id)
+async def list_artists(m: types.Message, state: FSMContext, user):
+    """Список артистов (первая страница, без поиска)."""
     if user['role'] not in ['founder', 'anr']: return
 
-    artists = await db.get_all_artists()
-    
-    text = "🎤 <b>Список артистов:</b>\n\n"
+    await state.update_data(artist_query=None)
+    await show_artists_page(m)
+
+async def show_artists_page(message_or_call, query=None, cursor=None, backward=False):
+    """
+    Отображение страницы артистов со значками пройденных шагов онбординга.
+    :param query: Строка поиска по имени или None.
+    :param cursor: ID граничного артиста предыдущей страницы или None для первой.
+    :param backward: True, если пользователь листает назад.
+    """
+    artists, has_more = await db.get_artists_page(query, cursor, backward, limit=ARTISTS_PAGE_SIZE)
+    if not artists and cursor is not None:
+        # Артиста на границе страницы могли удалить — начинаем сначала
+        cursor, backward = None, False
+        artists, has_more = await db.get_artists_page(query, limit=ARTISTS_PAGE_SIZE)
+    summary = await db.get_artists_summary(query)
+
+    text = "🎤 <b>Список артистов:</b>\n"
+    if query:
+        text += f"🔎 Поиск: «{escape_html(query)}»\n"
+    text += f"Всего: {summary['total']} · онбординг пройден: {summary['complete']}\n"
+    if not artists:
+        text += "\n📭 Никого не найдено."
+
     kb = InlineKeyboardBuilder()
-    
     for a in artists:
-        # Статус онбординга (галочки)
-        status = ""
-        if a['flag_contract']: status += "📝"
-        if a['flag_mm_profile']: status += "🎵"
-        if a['flag_mm_verify']: status += "✅"
-        if a['flag_yt_link']: status += "📺"
-        if a['flag_yt_note']: status += "🎼"
-        
-        kb.button(text=f"{a['name']} {status}", callback_data=f"view_art_{a['id']}")
-    
-    kb.button(text="➕ Добавить артиста", callback_data="add_artist")
+        kb.button(text=f"{a['name']} {status_icons(a['onboarding_mask'])}", callback_data=f"view_art_{a['id']}")
     kb.adjust(1)
-    
-    await m.answer(text, reply_markup=kb.as_markup(), parse_mode="HTML")
+
+    # Кнопки пагинации: курсоры — первый и последний артисты текущей страницы
+    has_prev = has_more if backward else cursor is not None
+    has_next = cursor is not None if backward else has_more
+    nav = []
+    if artists and has_prev:
+        nav.append(types.InlineKeyboardButton(text="⬅️ Назад", callback_data=f"artpage_p_{artists[0]['id']}"))
+    if artists and has_next:
+        nav.append(types.InlineKeyboardButton(text="Вперед ➡️", callback_data=f"artpage_n_{artists[-1]['id']}"))
+    if nav:
+        kb.row(*nav)
+    kb.row(types.InlineKeyboardButton(text="🔎 Поиск", callback_data="artsearch"),
+           types.InlineKeyboardButton(text="➕ Добавить артиста", callback_data="add_artist"))
+    if query:
+        kb.row(types.InlineKeyboardButton(text="❌ Сбросить поиск", callback_data="artsearch_clear"))
+
+    if isinstance(message_or_call, types.CallbackQuery):
+        try:
+            await message_or_call.message.edit_text(text, reply_markup=kb.as_markup(), parse_mode="HTML")
+        except TelegramBadRequest:
+            await message_or_call.answer()  # Страница не изменилась
+    else:
+        await message_or_call.answer(text, reply_markup=kb.as_markup(), parse_mode="HTML")
+
+@router.callback_query(F.data.startswith("artpage_"))
+async def artists_page_callback(c: CallbackQuery, state: FSMContext):
+    """Пагинация артистов: artpage_<n|p|s>_<id>; s — страница, начинающаяся с артиста (возврат из карточки)."""
+    _, direction, aid = c.data.split("_")
+    query = (await state.get_data()).get('artist_query')
+    if direction == "s":
+        # Страница "с этого артиста" — это страница вперед от предыдущего
+        rows, _ = await db.get_artists_page(query, int(aid), backward=True, limit=1)
+        cursor, backward = (rows[0]['id'] if rows else None), False
+    else:
+        cursor, backward = int(aid), direction == "p"
+    await show_artists_page(c, query, cursor, backward)
+
+@router.callback_query(F.data == "artsearch")
+async def artist_search_start(c: CallbackQuery, state: FSMContext):
+    await c.message.answer("🔎 <b>Введите часть имени артиста:</b>", reply_markup=get_cancel_kb(), parse_mode="HTML")
+    await state.set_state(ArtistSearch.query)
+    await c.answer()
+
+@router.message(ArtistSearch.query)
+async def artist_search_run(m: types.Message, state: FSMContext, user):
+    query = (m.text or "").strip()
+    if not query: return await m.answer("🔎 Введите текст для поиска.")
+    # Строка поиска остается в данных FSM для пагинации
+    await state.set_state(None)
+    await state.update_data(artist_query=query)
+    await m.answer("🔎 Ищем...", reply_markup=get_main_kb(user['role']))
+    await show_artists_page(m, query)
+
+@router.callback_query(F.data == "artsearch_clear")
+async def artist_search_clear(c: CallbackQuery, state: FSMContext):
+    await state.update_data(artist_query=None)
+    await show_artists_page(c)
 
 @router.callback_query(F.data == "add_artist")
 async def add_artist_start(c: CallbackQuery, state: FSMContext):
@@ -69,21 +137,16 @@ async def add_artist_date(c: CallbackQuery, state: FSMContext):
     await c.answer()
 
 @router.message(CreateArtist.date)
-async def add_artist_finish(m: types.Message, state: FSMContext):
-    date_str = m.text
-    if date_str.lower() == "нет":
-        date_str = None
+async def add_artist_finish(m: types.Message, state: FSMContext, user):
+    if m.text.lower() == "нет":
+        first_release = None
     else:
-        try:
-            date_str = date_str.replace(".", "-").replace("/", "-")
-            datetime.datetime.strptime(date_str, "%Y-%m-%d")
-        except:
+        first_release = parse_date(m.text)
+        if not first_release:
             return await m.answer("⛔️ Неверный формат даты. Используйте YYYY-MM-DD или 'Нет'.")
             
     data = await state.get_data()
-    await db.create_artist(data['name'], data['manager'], date_str)
-    
-    user = await db.get_user(m.from_user.id)
+    await db.create_artist(data['name'], data['manager'], first_release)
     
     # Уведомление фаундерам
     creator_link = await db.get_user_link(m.from_user.id)
@@ -94,12 +157,11 @@ async def add_artist_finish(m: types.Message, state: FSMContext):
         f"🔔 <b>Новый артист!</b>\n\n"
         f"🎤 Имя: {data['name']}\n"
         f"💼 Менеджер: {mgr_name}\n"
-        f"📅 Первый релиз: {date_str or 'Не задан'}\n"
+        f"📅 Первый релиз: {first_release or 'Не задан'}\n"
         f"👤 Добавил: {creator_link}"
     )
     
-    for admin_id in ADMIN_IDS:
-        await notify_user(m.bot, admin_id, notify_text)
+    notify_many_background(m.bot, ADMIN_IDS, notify_text)
 
     await m.answer(f"✅ Артист <b>{data['name']}</b> добавлен!", reply_markup=get_main_kb(user['role']), parse_mode="HTML")
     await state.clear()
@@ -117,20 +179,12 @@ async def render_artist_view(c: CallbackQuery, aid: int):
     text += f"📅 Первый релиз: {artist['first_release_date'] or 'Не задан'}\n\n"
     text += "<b>Статус онбординга:</b>\n"
     
-    flags = [
-        ('flag_contract', '📝 Контракт'),
-        ('flag_mm_profile', '🎵 MM Профиль'),
-        ('flag_mm_verify', '✅ MM Верификация'),
-        ('flag_yt_link', '📺 YouTube Линк'),
-        ('flag_yt_note', '🎼 YouTube Нота')
-    ]
-    
     kb = InlineKeyboardBuilder()
-    for f_col, f_name in flags:
-        status = "✅" if artist[f_col] else "❌"
-        kb.button(text=f"{status} {f_name}", callback_data=f"tog_{f_col}_{aid}")
+    for code, flag in STEP_FLAGS.items():
+        status = "✅" if artist['onboarding_mask'] & flag else "❌"
+        kb.button(text=f"{status} {FLAG_LABELS[flag]}", callback_data=f"tog_{code}_{aid}")
         
-    kb.button(text="🔙 К списку", callback_data="back_artists")
+    kb.button(text="🔙 К списку", callback_data=f"artpage_s_{aid}")
     kb.adjust(1)
     
     try:
@@ -145,26 +199,20 @@ async def view_artist(c: CallbackQuery):
 
 @router.callback_query(F.data.startswith("tog_"))
 async def toggle_artist_flag(c: CallbackQuery):
-    parts = c.data.split("_")
-    aid = int(parts[-1])
-    col = "_".join(parts[1:-1])
-    
+    _, code, aid = c.data.split("_", 2)
+    flag = STEP_FLAGS.get(code)
+    if flag is None:
+        # Кнопка из старой карточки (до перехода на маску онбординга)
+        return await c.answer("Кнопка устарела, откройте карточку артиста заново")
+    aid = int(aid)
+
+    mask = await db.toggle_artist_flag(aid, flag)
+    if mask is None: return await c.answer("Артист не найден")
     artist = await db.get_artist_by_id(aid)
-    if not artist: return await c.answer("Артист не найден")
 
-    new_val = 0 if artist[col] else 1
-    
-    await db.update_artist_flag(aid, col, new_val)
-    
     # Уведомление фаундерам
-    flags_map = {
-        'flag_contract': '📝 Контракт',
-        'flag_mm_profile': '🎵 MM Профиль',
-        'flag_mm_verify': '✅ MM Верификация',
-        'flag_yt_link': '📺 YouTube Линк',
-        'flag_yt_note': '🎼 YouTube Нота'
-    }
-    flag_name = flags_map.get(col, col)
+    flag_name = FLAG_LABELS[flag]
+    new_val = mask & flag
     status_text = "✅ Включен" if new_val else "❌ Выключен"
     user_link = await db.get_user_link(c.from_user.id)
     
@@ -176,25 +224,12 @@ async def toggle_artist_flag(c: CallbackQuery):
         f"👤 Изменил: {user_link}"
     )
     
-    for admin_id in ADMIN_IDS:
-        await notify_user(c.bot, admin_id, notify_text)
+    notify_many_background(c.bot, ADMIN_IDS, notify_text)
     
     # Обновляем view
     await render_artist_view(c, aid)
 
 @router.callback_query(F.data == "back_artists")
-async def back_to_list(c: CallbackQuery):
-    artists = await db.get_all_artists()
-    text = "🎤 <b>Список артистов:</b>\n\n"
-    kb = InlineKeyboardBuilder()
-    for a in artists:
-        status = ""
-        if a['flag_contract']: status += "📝"
-        if a['flag_mm_profile']: status += "🎵"
-        if a['flag_mm_verify']: status += "✅"
-        if a['flag_yt_link']: status += "📺"
-        if a['flag_yt_note']: status += "🎼"
-        kb.button(text=f"{a['name']} {status}", callback_data=f"view_art_{a['id']}")
-    kb.button(text="➕ Добавить артиста", callback_data="add_artist")
-    kb.adjust(1)
-    await c.message.edit_text(text, reply_markup=kb.as_markup(), parse_mode="HTML")
+async def back_to_list(c: CallbackQuery, state: FSMContext):
+    """Кнопка "К списку" из карточек, открытых до появления пагинации."""
+    await show_artists_page(c, (await state.get_data()).get('artist_query'))
@@ -8,10 +8,9 @@ from bot.config import ROLES_DISPLAY
 router = Router()
 
 @router.message(F.text == "🔙 Отмена")
-async def cancel_handler(m: types.Message, state: FSMContext):
+async def cancel_handler(m: types.Message, state: FSMContext, user=None):
     """Обработчик отмены действия."""
     await state.clear()
-    user = await db.get_user(m.from_user.id)
     if user:
         await m.answer("🔙 <b>Действие отменено.</b>\nВозвращаюсь в главное меню.", reply_markup=get_main_kb(user['role']), parse_mode="HTML")
     else:
@@ -36,3 +35,48 @@ async def cmd_start(m: types.Message):
         reply_markup=get_main_kb(user['role']), 
         parse_mode="HTML"
     )
+
+@router.message(Command("dbstats"))
+async def cmd_dbstats(m: types.Message, user):
+    """Статистика пула соединений и латентности запросов (для основателей)."""
+    if user['role'] != 'founder': return
+
+    stats = db.pool_stats()
+    if not stats:
+        return await m.answer("📭 Нет данных о пуле.")
+
+    def ms(value): return f"{value * 1000:.1f}"
+
+    wait = stats['acquire_wait']
+    text = (
+        f"📊 <b>Пул БД</b>\n"
+        f"🔌 Соединений: <code>{stats['size']}</code> (свободно <code>{stats['idle']}</code>, "
+        f"лимит <code>{stats['min_size']}–{stats['max_size']}</code>)\n"
+        f"⏳ Ожидание соединения, мс: p50 <code>{ms(wait['p50'])}</code> | p95 <code>{ms(wait['p95'])}</code> | "
+        f"max <code>{ms(wait['max'])}</code> (n={wait['count']})\n\n"
+        f"<b>Методы по суммарному времени:</b>\n"
+    )
+    for name, q, errors in db.metrics.top_queries():
+        err = f", ошибок {errors}" if errors else ""
+        text += f"• <code>{name}</code>: n={q['count']}, avg {ms(q['avg'])} | p95 {ms(q['p95'])} мс{err}\n"
+    await m.answer(text, parse_mode="HTML")
+
+@router.message(Command("jobs"))
+async def cmd_jobs(m: types.Message, user):
+    """Состояние плановых задач: последний запуск, результат и длительность (для основателей)."""
+    if user['role'] != 'founder': return
+
+    states = await db.get_job_states()
+    if not states:
+        return await m.answer("📭 Плановые задачи еще не запускались.")
+
+    icons = {'ok': "✅", 'error': "❌"}
+    text = "⏱ <b>Плановые задачи</b>\n\n"
+    for s in states:
+        if s['last_run_at']:
+            last = f"{s['last_run_at'].astimezone():%Y-%m-%d %H:%M}, {s['last_duration']:.1f} с"
+        else:
+            last = "не запускалась"
+        running = " ▶️ выполняется" if s['running_since'] else ""
+        text += f"{icons.get(s['last_status'], '▫️')} <code>{s['job_id']}</code>: {last}{running}\n"
+    await m.answer(text, parse_mode="HTML")
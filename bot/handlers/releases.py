@@ -5,17 +5,20 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from bot.config import ADMIN_IDS
-from bot.utils import notify_user
+from bot.utils import notify_many_background, parse_date
+from bot.task_kinds import COVER, DISTRIBUTION, PITCHING, SNIPPET, TRACKLIST, METADATA, PROMO, TASK_KIND_LABELS
 from bot.database import db
 from bot.states import CreateRelease
 from bot.keyboards.builders import get_cancel_kb, get_main_kb
 
 router = Router()
 
-async def generate_release_tasks(rel_id, title, r_date, manager_id, artist_name, need_cover, r_type):
-    """Генерация стандартных задач для релиза."""
-    designer = await db.get_designer()
-    
+def build_release_tasks(title, r_date, manager_id, artist_name, need_cover, r_type, designer=None):
+    """
+    Формирует стандартные задачи для релиза.
+    :param designer: Запись дизайнера (или None — тогда задачи дизайнера получает менеджер).
+    :return: Список кортежей (title, desc, assigned, deadline, req_file, task_kind) для Database.create_release_with_tasks.
+    """
     if designer:
         designer_id = designer['telegram_id']
         designer_note = ""
@@ -26,33 +29,28 @@ async def generate_release_tasks(rel_id, title, r_date, manager_id, artist_name,
     tasks = []
     
     # --- ОБЩИЕ ЗАДАЧИ ---
-    if need_cover: tasks.append(("🎨 Обложка", f"Сделать обложку: {artist_name} - {title}{designer_note}", designer_id, 14, 1))
-    tasks.append(("📤 Дистрибуция", f"Загрузить трек: {artist_name} - {title}", manager_id, 10, 0))
-    tasks.append(("📝 Питчинг", f"Форма питчинга: {artist_name} - {title}", manager_id, 7, 0))
-    tasks.append(("📱 Сниппет", f"Видео-сниппет: {artist_name} - {title}{designer_note}", designer_id, 3, 1))
+    if need_cover: tasks.append((COVER, f"Сделать обложку: {artist_name} - {title}{designer_note}", designer_id, 14, 1))
+    tasks.append((DISTRIBUTION, f"Загрузить трек: {artist_name} - {title}", manager_id, 10, 0))
+    tasks.append((PITCHING, f"Форма питчинга: {artist_name} - {title}", manager_id, 7, 0))
+    tasks.append((SNIPPET, f"Видео-сниппет: {artist_name} - {title}{designer_note}", designer_id, 3, 1))
     
     # --- СПЕЦИФИЧНЫЕ ЗАДАЧИ ДЛЯ АЛЬБОМА ---
     if r_type == "Альбом":
-        tasks.append(("📋 Треклист", f"Утвердить финальный треклист: {artist_name} - {title}", manager_id, 30, 0))
-        tasks.append(("📀 Мета-данные", f"Проверить мета-данные всех треков: {artist_name} - {title}", manager_id, 20, 0))
-        tasks.append(("📢 Промо-план", f"Составить план продвижения альбома: {artist_name} - {title}", manager_id, 15, 0))
+        tasks.append((TRACKLIST, f"Утвердить финальный треклист: {artist_name} - {title}", manager_id, 30, 0))
+        tasks.append((METADATA, f"Проверить мета-данные всех треков: {artist_name} - {title}", manager_id, 20, 0))
+        tasks.append((PROMO, f"Составить план продвижения альбома: {artist_name} - {title}", manager_id, 15, 0))
     
-    r_dt = datetime.datetime.strptime(r_date, "%Y-%m-%d")
-    for t_name, t_desc, assignee, days, req in tasks:
+    today = datetime.date.today()
+    rows = []
+    for kind, t_desc, assignee, days, req in tasks:
         # Если дней больше чем осталось до релиза, ставим дедлайн на сегодня
-        days_delta = datetime.timedelta(days=days)
-        target_date = r_dt - days_delta
-        if target_date < datetime.datetime.now():
-            dl = datetime.datetime.now().strftime("%Y-%m-%d")
-        else:
-            dl = target_date.strftime("%Y-%m-%d")
-            
-        await db.create_task(f"{t_name} | {artist_name}", t_desc, assignee, manager_id, rel_id, dl, req)
+        dl = max(r_date - datetime.timedelta(days=days), today)
+        rows.append((f"{TASK_KIND_LABELS[kind]} | {artist_name}", t_desc, assignee, dl, req, kind))
+    return rows
 
 @router.message(F.text == "💿 Создать релиз")
-async def create_release_start(m: types.Message, state: FSMContext):
+async def create_release_start(m: types.Message, state: FSMContext, user):
     """Начало создания релиза."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] not in ['founder', 'anr']: return
     await m.answer("🎤 <b>Введите имя артиста:</b>", reply_markup=get_cancel_kb(), parse_mode="HTML")
     await state.set_state(CreateRelease.artist_str)
@@ -89,29 +87,18 @@ async def create_release_date(m: types.Message, state: FSMContext):
     await state.set_state(CreateRelease.date)
 
 @router.message(CreateRelease.date)
-async def create_release_finish(m: types.Message, state: FSMContext):
+async def create_release_finish(m: types.Message, state: FSMContext, user):
     """Завершение создания релиза."""
-    try:
-        clean_date = m.text.replace(".", "-").replace("/", "-")
-        datetime.datetime.strptime(clean_date, "%Y-%m-%d")
-    except: return await m.answer("⛔️ Формат: YYYY-MM-DD")
+    release_date = parse_date(m.text)
+    if not release_date: return await m.answer("⛔️ Формат: YYYY-MM-DD")
 
     data = await state.get_data()
     manager_id = m.from_user.id
     
-    # Проверяем или создаем артиста
-    artist = await db.get_artist_by_name(data['artist'])
-    if not artist:
-        artist_id = await db.create_artist(data['artist'], manager_id, clean_date)
-    else: 
-        artist_id = artist['id']
-        
-    # Создаем релиз
-    rel_id = await db.create_release(data['title'], artist_id, data['type'], clean_date, manager_id)
-    
-    await generate_release_tasks(rel_id, data['title'], clean_date, manager_id, data['artist'], data['need_cover'], data['type'])
-    
-    user = await db.get_user(manager_id)
+    # Артист (если его нет), релиз и задачи создаются одной транзакцией
+    designer = await db.get_designer()
+    tasks = build_release_tasks(data['title'], release_date, manager_id, data['artist'], data['need_cover'], data['type'], designer)
+    await db.create_release_with_tasks(data['artist'], data['title'], data['type'], release_date, manager_id, tasks)
     
     # Уведомление фаундерам
     creator_link = await db.get_user_link(manager_id)
@@ -119,24 +106,49 @@ async def create_release_finish(m: types.Message, state: FSMContext):
         f"🔔 <b>Новый релиз!</b>\n\n"
         f"🎶 {data['artist']} — {data['title']}\n"
         f"📼 Тип: {data['type']}\n"
-        f"📅 Дата: {clean_date}\n"
+        f"📅 Дата: {release_date}\n"
         f"👤 Создал: {creator_link}"
     )
     
-    for admin_id in ADMIN_IDS:
-        await notify_user(m.bot, admin_id, notify_text)
+    notify_many_background(m.bot, ADMIN_IDS, notify_text)
 
     await m.answer(f"🚀 <b>Релиз создан!</b>\n🎶 {data['artist']} — {data['title']}", reply_markup=get_main_kb(user['role']), parse_mode="HTML")
     await state.clear()
 
 # --- RELEASES LIST (PAGINATION) ---
+RELEASES_PAGE_SIZE = 5
+
+def encode_release_cursor(direction, r):
+    """
+    Кодирует курсор пагинации в callback_data: relpage_<n|p>_<YYYYMMDD|->_<id>.
+    """
+    date_part = r['release_date'].strftime("%Y%m%d") if r['release_date'] else "-"
+    return f"relpage_{direction}_{date_part}_{r['id']}"
+
+def decode_release_cursor(data):
+    """
+    Разбирает callback_data пагинации релизов.
+    :return: (cursor, backward); cursor = None означает первую страницу.
+    """
+    parts = data.split("_")
+    # Старый формат relpage_<номер страницы> — просто открываем первую страницу
+    if len(parts) != 4:
+        return None, False
+    _, direction, date_part, rid = parts
+    r_date = None if date_part == "-" else datetime.datetime.strptime(date_part, "%Y%m%d").date()
+    return (r_date, int(rid)), direction == "p"
+
 @router.message(F.text.in_({"💿 Релизы", "💿 Все релизы", "💿 Мои релизы"}))
-async def list_releases_handler(m: types.Message):
+async def list_releases_handler(m: types.Message, user):
     """Показать первую страницу релизов."""
-    await show_releases_page(m, 0)
-
-async def show_releases_page(message_or_call, page):
-    """Отображение страницы релизов."""
+    await show_releases_page(m, user)
+
+async def show_releases_page(message_or_call, user, cursor=None, backward=False):
+    """
+    Отображение страницы релизов.
+    :param cursor: (release_date, id) граничного релиза предыдущей страницы или None для первой.
+    :param backward: True, если пользователь листает назад.
+    """
     # Определяем ID пользователя и метод ответа
     if isinstance(message_or_call, types.Message):
         uid = message_or_call.from_user.id
@@ -145,10 +157,13 @@ async def show_releases_page(message_or_call, page):
         uid = message_or_call.from_user.id
         reply_func = message_or_call.message.edit_text
 
-    user = await db.get_user(uid)
     if user['role'] not in ['founder', 'anr']: return
 
-    rels, total_count = await db.get_releases_paginated(user['role'], uid, page=page, limit=5)
+    rels, has_more = await db.get_releases_page(user['role'], uid, cursor, backward, limit=RELEASES_PAGE_SIZE)
+    if not rels and cursor:
+        # Релизы на границе страницы могли удалить — начинаем сначала
+        cursor, backward = None, False
+        rels, has_more = await db.get_releases_page(user['role'], uid, limit=RELEASES_PAGE_SIZE)
     
     header = "💿 <b>Все релизы:</b>" if user['role'] == 'founder' else "💿 <b>Ваши релизы:</b>"
     
@@ -156,18 +171,22 @@ async def show_releases_page(message_or_call, page):
         text = f"{header}\n📭 Список пуст."
         kb = None
     else:
+        total_count = await db.count_releases(user['role'], uid)
         text = f"{header} (Всего: {total_count})\n\n"
         for r in rels:
             c_info = f"👤 От: {r['creator_name']}\n" if user['role'] == 'founder' and 'creator_name' in r else ""
             text += f"🎶 <b>{r['title']}</b> ({r['type']})\n📅 {r['release_date']}\n{c_info}🆔 ID: <code>{r['id']}</code>\n➖➖➖➖➖➖\n"
         
-        # Кнопки пагинации
+        # Кнопки пагинации: курсоры — первая и последняя записи текущей страницы
+        has_prev = has_more if backward else cursor is not None
+        has_next = cursor is not None if backward else has_more
+
         kb_build = InlineKeyboardBuilder()
-        if page > 0:
-            kb_build.button(text="⬅️ Назад", callback_data=f"relpage_{page-1}")
+        if has_prev:
+            kb_build.button(text="⬅️ Назад", callback_data=encode_release_cursor("p", rels[0]))
         
-        if (page + 1) * 5 < total_count:
-            kb_build.button(text="Вперед ➡️", callback_data=f"relpage_{page+1}")
+        if has_next:
+            kb_build.button(text="Вперед ➡️", callback_data=encode_release_cursor("n", rels[-1]))
         
         kb = kb_build.as_markup()
 
@@ -177,15 +196,14 @@ async def show_releases_page(message_or_call, page):
         await reply_func(text, reply_markup=kb, parse_mode="HTML")
 
 @router.callback_query(F.data.startswith("relpage_"))
-async def releases_page_callback(c: CallbackQuery):
+async def releases_page_callback(c: CallbackQuery, user):
     """Обработчик пагинации релизов."""
-    page = int(c.data.split("_")[1])
-    await show_releases_page(c, page)
+    cursor, backward = decode_release_cursor(c.data)
+    await show_releases_page(c, user, cursor, backward)
 
 @router.message(F.text == "🗑 Удалить релиз")
-async def delete_rel_start(m: types.Message):
+async def delete_rel_start(m: types.Message, user):
     """Начало удаления релиза."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] != 'founder': return
     
     rels = await db.get_last_releases(limit=10)
@@ -5,6 +5,7 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from bot.database import db
+from bot.utils import answer_long, escape_html
 from bot.states import SMMReportState
 from bot.keyboards.builders import get_main_kb, get_cancel_kb
 
@@ -12,9 +13,8 @@ router = Router()
 
 # --- СОЗДАНИЕ ОТЧЕТА ---
 @router.message(F.text == "📊 Отправить отчет")
-async def report_start(m: types.Message, state: FSMContext):
+async def report_start(m: types.Message, state: FSMContext, user):
     """Начало создания ежедневного отчета."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] != 'smm':
         return await m.answer("⛔️ Только для SMM специалистов.")
     
@@ -22,38 +22,30 @@ async def report_start(m: types.Message, state: FSMContext):
     await state.set_state(SMMReportState.text)
 
 @router.message(SMMReportState.text)
-async def report_submit(m: types.Message, state: FSMContext):
+async def report_submit(m: types.Message, state: FSMContext, user):
     """Сохранение отчета."""
     if m.text == "🔙 Отмена":
         await state.clear()
-        user = await db.get_user(m.from_user.id)
         return await m.answer("❌ Отменено.", reply_markup=get_main_kb(user['role']))
 
-    today = datetime.date.today().strftime("%Y-%m-%d")
+    today = datetime.date.today()
     await db.create_report(m.from_user.id, today, m.text)
     
-    user = await db.get_user(m.from_user.id)
     await m.answer("✅ <b>Отчет принят!</b>", reply_markup=get_main_kb(user['role']), parse_mode="HTML")
     await state.clear()
 
 # --- ПРОСМОТР ОТЧЕТОВ ---
 @router.message(F.text == "🗂 Мои отчеты")
-async def report_history(m: types.Message):
+async def report_history(m: types.Message, user):
     """Просмотр последних отчетов."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] != 'smm': return
 
     reports = await db.get_reports(m.from_user.id)
     if not reports:
         return await m.answer("📭 У вас пока нет отчетов.")
 
-    text = "🗂 <b>Ваши последние отчеты:</b>\n\n"
-    for r in reports:
-        text += f"📅 <b>{r['report_date']}</b>\n{r['text']}\n━━━━━━━━━━━━━━━━\n"
-    
-    # Если текст слишком длинный, телеграм его обрежет, но пока оставим так.
-    # В идеале нужна пагинация, если отчетов много.
-    if len(text) > 4000:
-        text = text[:4000] + "\n... (слишком много данных)"
-        
-    await m.answer(text, parse_mode="HTML")
+    lines = (
+        f"📅 <b>{r['report_date']}</b>\n{escape_html(r['text'])}\n━━━━━━━━━━━━━━━━"
+        for r in reports
+    )
+    await answer_long(m, "🗂 <b>Ваши последние отчеты:</b>\n", lines)
@@ -0,0 +1,48 @@
+from aiogram import Router, types
+from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
+
+from bot.cache import TTLCache
+from bot.config import INLINE_CACHE_TTL, INLINE_CACHE_SIZE, INLINE_RESULTS_PER_KIND, INLINE_MIN_QUERY_LENGTH
+from bot.database import db
+from bot.utils import escape_html
+
+router = Router()
+
+# Результаты поиска: (uid, запрос) -> строки db.search. Результаты зависят от роли и задач
+# пользователя, поэтому кэш (и cache_time у Telegram) личный
+search_cache = TTLCache(maxsize=INLINE_CACHE_SIZE, ttl=INLINE_CACHE_TTL)
+
+# Вид результата -> (значок, подпись)
+KIND_LABELS = {
+    'release': ("💿", "Релиз"),
+    'artist': ("🎤", "Артист"),
+    'task': ("📌", "Задача"),
+}
+
+def build_result(row):
+    icon, label = KIND_LABELS[row['kind']]
+    details = row['details'] or ""
+    text = f"{icon} <b>{escape_html(row['title'])}</b>\n{label}"
+    if details:
+        text += f" · {escape_html(details)}"
+    return InlineQueryResultArticle(
+        id=f"{row['kind']}:{row['id']}",
+        title=f"{icon} {row['title']}",
+        description=f"{label} · {details}" if details else label,
+        input_message_content=InputTextMessageContent(message_text=text, parse_mode="HTML"),
+    )
+
+@router.inline_query()
+async def inline_search(q: types.InlineQuery, user):
+    """Поиск релизов, артистов и задач по названию: @бот <запрос>."""
+    query = q.query.strip()
+    if len(query) < INLINE_MIN_QUERY_LENGTH:
+        return await q.answer([], cache_time=INLINE_CACHE_TTL, is_personal=True)
+
+    key = (q.from_user.id, query.lower())
+    rows = search_cache.get(key)
+    if rows is None:
+        rows = await db.search(query, user['role'], q.from_user.id, limit=INLINE_RESULTS_PER_KIND)
+        search_cache.set(key, rows)
+
+    await q.answer([build_result(r) for r in rows], cache_time=INLINE_CACHE_TTL, is_personal=True)
@@ -1,16 +1,19 @@
 import datetime
 import io
 from aiogram import Router, F, types, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from bot.database import db
+from bot.database import db, format_user_link
 from bot.states import CreateTask, FinishTask
 from bot.keyboards.builders import get_cancel_kb, get_main_kb
 from bot.config import ROLES_DISPLAY, ADMIN_IDS, YANDEX_DISK_TOKEN, YANDEX_UPLOAD_FOLDER
-from bot.utils import notify_user
+from bot.utils import notify_user, notify_many_background, parse_date, answer_long, escape_html
 from bot.services.yandex_disk import AsyncYandexDisk
+from bot.services.outbox import outbox, OutboxMessage
+from bot.services.sender import PRIORITY_INTERACTIVE
 
 router = Router()
 ydisk = AsyncYandexDisk(YANDEX_DISK_TOKEN, YANDEX_UPLOAD_FOLDER)
@@ -53,62 +56,161 @@ async def manual_task_deadline(c: CallbackQuery, state: FSMContext):
 @router.message(CreateTask.deadline)
 async def manual_task_req(m: types.Message, state: FSMContext):
     """Вопрос о необходимости файла."""
-    try:
-        cl = m.text.replace(".", "-").replace("/", "-")
-        datetime.datetime.strptime(cl, "%Y-%m-%d")
-        await state.update_data(deadline=cl)
-    except: return await m.answer("⛔️ Формат: YYYY-MM-DD")
+    deadline = parse_date(m.text)
+    if not deadline: return await m.answer("⛔️ Формат: YYYY-MM-DD")
+    # В состоянии храним ISO-строку, чтобы данные FSM оставались сериализуемыми
+    await state.update_data(deadline=deadline.isoformat())
     
     kb = ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="Да"), KeyboardButton(text="Нет")], [KeyboardButton(text="🔙 Отмена")]], resize_keyboard=True)
     await m.answer("📎 <b>Нужен файл при сдаче?</b>", reply_markup=kb, parse_mode="HTML")
     await state.set_state(CreateTask.req_file)
 
 @router.message(CreateTask.req_file)
-async def manual_task_fin(m: types.Message, state: FSMContext, bot: Bot):
+async def manual_task_fin(m: types.Message, state: FSMContext, bot: Bot, user):
     """Завершение создания задачи."""
     req = 1 if m.text == "Да" else 0
     d = await state.get_data()
-    await db.create_task(d['title'], d['desc'], d['assignee'], m.from_user.id, None, d['deadline'], req)
+    deadline = datetime.date.fromisoformat(d['deadline'])
+    tid = await db.create_task(d['title'], d['desc'], d['assignee'], m.from_user.id, None, deadline, req)
     
     creator_link = await db.get_user_link(m.from_user.id)
     msg = f"🔔 <b>НОВАЯ ЗАДАЧА</b>\n📌 {d['title']}\n📄 {d['desc']}\n🗓 {d['deadline']}\n👤 От: {creator_link}"
-    await notify_user(bot, d['assignee'], msg)
+    # Через outbox: уведомление о назначении не потеряется при сбое отправки или перезапуске
+    await outbox.enqueue(OutboxMessage(f"task_assigned:{tid}", d['assignee'], msg, priority=PRIORITY_INTERACTIVE))
     
-    user = await db.get_user(m.from_user.id)
     await m.answer("✅ Задача назначена!", reply_markup=get_main_kb(user['role']))
     await state.clear()
 
-# --- VIEWING ---
+# --- VIEWING (TASK BOARD) ---
+TASKS_PAGE_SIZE = 10
+
+# Области доски: все активные задачи (только основатель) или задачи пользователя
+SCOPE_ALL = "a"
+SCOPE_MY = "m"
+
+def encode_task_key(t):
+    """Ключ задачи в порядке доски для callback_data: <YYYYMMDD|->_<id>."""
+    date_part = t['deadline'].strftime("%Y%m%d") if t['deadline'] else "-"
+    return f"{date_part}_{t['id']}"
+
+def decode_task_cursor(data):
+    """
+    Разбирает callback_data доски задач: tpage_<a|m>_<n|p|s>_<YYYYMMDD|->_<id> или tpage_<a|m> (первая страница).
+    Направление s — страница, начинающаяся с указанной задачи (возврат из карточки).
+    :return: (scope, cursor, backward)
+    """
+    parts = data.split("_")
+    if len(parts) != 5:
+        return parts[1], None, False
+    _, scope, direction, date_part, tid = parts
+    deadline = None if date_part == "-" else datetime.datetime.strptime(date_part, "%Y%m%d").date()
+    tid = int(tid)
+    if direction == "s":
+        # (deadline, id - 1) — граница прямо перед задачей: id целые, порядок по (deadline, id)
+        return scope, (deadline, tid - 1), False
+    return scope, (deadline, tid), direction == "p"
+
+def board_scope(user, requested):
+    """Область доски с учетом роли: все задачи доступны только основателю."""
+    return SCOPE_ALL if requested == SCOPE_ALL and user['role'] == 'founder' else SCOPE_MY
+
 @router.message(F.text.in_({"📋 Активные задачи", "📋 Мои задачи"}))
-async def view_tasks(m: types.Message):
-    """Просмотр активных задач."""
-    uid = m.from_user.id
-    user = await db.get_user(uid)
-    
-    if user['role'] == 'founder' and "Активные" in m.text:
-        tasks = await db.get_tasks_active_founder()
-        header = "📋 <b>Все активные задачи:</b>"
+async def view_tasks(m: types.Message, user):
+    """Доска активных задач: одно сообщение со страницей задач."""
+    scope = SCOPE_ALL if "Активные" in m.text else SCOPE_MY
+    await show_tasks_page(m, user, board_scope(user, scope))
+
+async def show_tasks_page(message_or_call, user, scope, cursor=None, backward=False):
+    """
+    Отображение страницы доски задач.
+    :param cursor: (deadline, id) граничной задачи предыдущей страницы или None для первой.
+    :param backward: True, если пользователь листает назад.
+    """
+    uid = message_or_call.from_user.id
+    assigned_to = None if scope == SCOPE_ALL else uid
+
+    tasks, has_more = await db.get_active_tasks_page(assigned_to, cursor, backward, limit=TASKS_PAGE_SIZE)
+    if not tasks and cursor:
+        # Задачи на границе страницы могли закрыть — начинаем сначала
+        cursor, backward = None, False
+        tasks, has_more = await db.get_active_tasks_page(assigned_to, limit=TASKS_PAGE_SIZE)
+
+    if not tasks:
+        text, kb = "🎉 Задач нет!", None
     else:
-        tasks = await db.get_tasks_active_user(uid)
-        header = "📋 <b>Ваши задачи:</b>"
-        
-    if not tasks: return await m.answer("🎉 Задач нет!")
-    
-    await m.answer(header, parse_mode="HTML")
-    
-    for t in tasks:
-        icon = "🔥" if t['status'] == 'overdue' else "⏳"
-        creator = await db.get_user_link(t['created_by'])
-        txt = f"{icon} <b>{t['title']}</b>\n━━━━━━━━━━━━━━━━\n📄 {t['description']}\n\n🗓 <code>{t['deadline']}</code>\n👤 От: {creator}"
-        
-        kb = InlineKeyboardBuilder()
-        if t['assigned_to'] == uid:
-            kb.button(text="✅ Выполнить", callback_data=f"fin_{t['id']}")
-            kb.button(text="⛔️ Отказаться", callback_data=f"rej_{t['id']}")
-        if user['role'] == 'founder':
-            kb.button(text="🗑 Удалить", callback_data=f"admdel_{t['id']}")
-        kb.adjust(2)    
-        await m.answer(txt, reply_markup=kb.as_markup(), parse_mode="HTML")
+        header = "📋 <b>Все активные задачи:</b>" if scope == SCOPE_ALL else "📋 <b>Ваши задачи:</b>"
+        lines = []
+        kb_build = InlineKeyboardBuilder()
+        for t in tasks:
+            icon = "🔥" if t['status'] == 'overdue' else "⏳"
+            line = f"{icon} <b>{escape_html(t['title'])}</b>\n      🗓 <code>{t['deadline']}</code>"
+            if scope == SCOPE_ALL:
+                line += f" 👤 {escape_html(t['assignee_name'] or t['assigned_to'])}"
+            lines.append(line)
+            kb_build.button(text=f"{icon} {t['title']}", callback_data=f"tview_{t['id']}_{scope}_{encode_task_key(tasks[0])}")
+        text = f"{header}\n\n" + "\n".join(lines)
+
+        # Кнопки пагинации: курсоры — первая и последняя задачи текущей страницы
+        has_prev = has_more if backward else cursor is not None
+        has_next = cursor is not None if backward else has_more
+        nav = []
+        if has_prev:
+            nav.append(types.InlineKeyboardButton(text="⬅️ Назад", callback_data=f"tpage_{scope}_p_{encode_task_key(tasks[0])}"))
+        if has_next:
+            nav.append(types.InlineKeyboardButton(text="Вперед ➡️", callback_data=f"tpage_{scope}_n_{encode_task_key(tasks[-1])}"))
+        kb_build.adjust(1)
+        if nav:
+            kb_build.row(*nav)
+        kb = kb_build.as_markup()
+
+    if isinstance(message_or_call, types.CallbackQuery):
+        try:
+            await message_or_call.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+        except TelegramBadRequest:
+            await message_or_call.answer()  # Страница не изменилась
+    else:
+        await message_or_call.answer(text, reply_markup=kb, parse_mode="HTML")
+
+@router.callback_query(F.data.startswith("tpage_"))
+async def tasks_page_callback(c: CallbackQuery, user):
+    """Обработчик пагинации доски задач."""
+    scope, cursor, backward = decode_task_cursor(c.data)
+    await show_tasks_page(c, user, board_scope(user, scope), cursor, backward)
+
+@router.callback_query(F.data.startswith("tview_"))
+async def task_detail(c: CallbackQuery, user):
+    """Карточка задачи с действиями; "К списку" возвращает на ту же страницу доски."""
+    parts = c.data.split("_")
+    tid = int(parts[1])
+    if len(parts) == 5:
+        scope = board_scope(user, parts[2])
+        back = f"tpage_{scope}_s_{parts[3]}_{parts[4]}"
+    else:
+        # Возврат из подтверждения действия: положение на доске неизвестно
+        scope = board_scope(user, SCOPE_ALL)
+        back = f"tpage_{scope}"
+
+    t = await db.get_task_with_users(tid)
+    uid = c.from_user.id
+    if not t or t['status'] in ('done', 'rejected') or (user['role'] != 'founder' and t['assigned_to'] != uid):
+        await c.answer("Задача уже закрыта.")
+        return await show_tasks_page(c, user, scope)
+
+    icon = "🔥" if t['status'] == 'overdue' else "⏳"
+    creator = format_user_link(t['created_by'], t['creator_name'], t['creator_username'])
+    txt = f"{icon} <b>{escape_html(t['title'])}</b>\n━━━━━━━━━━━━━━━━\n📄 {escape_html(t['description'])}\n\n🗓 <code>{t['deadline']}</code>\n👤 От: {creator}"
+    if t['assigned_to'] != uid:
+        txt += f"\n🎯 Исполнитель: {format_user_link(t['assigned_to'], t['assignee_name'], t['assignee_username'])}"
+
+    kb = InlineKeyboardBuilder()
+    if t['assigned_to'] == uid:
+        kb.button(text="✅ Выполнить", callback_data=f"fin_{t['id']}")
+        kb.button(text="⛔️ Отказаться", callback_data=f"rej_{t['id']}")
+    if user['role'] == 'founder':
+        kb.button(text="🗑 Удалить", callback_data=f"admdel_{t['id']}")
+    kb.button(text="🔙 К списку", callback_data=back)
+    kb.adjust(2)
+    await c.message.edit_text(txt, reply_markup=kb.as_markup(), parse_mode="HTML")
 
 @router.callback_query(F.data.startswith("admdel_"))
 async def admin_del_task_ask(c: CallbackQuery):
@@ -116,7 +218,7 @@ async def admin_del_task_ask(c: CallbackQuery):
     tid = c.data.split("_")[1]
     kb = InlineKeyboardBuilder()
     kb.button(text="Да, удалить", callback_data=f"confdel_{tid}")
-    kb.button(text="Отмена", callback_data="ignore_cb")
+    kb.button(text="Отмена", callback_data=f"tview_{tid}")
     await c.message.edit_text("⚠️ <b>Удалить задачу?</b>", reply_markup=kb.as_markup(), parse_mode="HTML")
 
 @router.callback_query(F.data.startswith("confdel_"))
@@ -136,7 +238,7 @@ async def reject_ask(c: CallbackQuery):
     tid = c.data.split("_")[1]
     kb = InlineKeyboardBuilder()
     kb.button(text="Да, отказаться", callback_data=f"confrej_{tid}")
-    kb.button(text="Вернуться", callback_data="ignore_cb")
+    kb.button(text="Вернуться", callback_data=f"tview_{tid}")
     await c.message.edit_text("⚠️ <b>Отказаться?</b>\nАдминистраторы получат уведомление.", reply_markup=kb.as_markup(), parse_mode="HTML")
 
 @router.callback_query(F.data.startswith("confrej_"))
@@ -148,7 +250,7 @@ async def reject_confirm(c: CallbackQuery, bot: Bot):
         await db.update_task_status(tid, 'rejected')
         rejector = await db.get_user_link(c.from_user.id)
         alert = f"⛔️ <b>ОТКАЗ:</b> {task['title']}\n👤 {rejector}"
-        for admin_id in ADMIN_IDS: await notify_user(bot, admin_id, alert)
+        notify_many_background(bot, ADMIN_IDS, alert)
         await c.message.edit_text("❌ Отказано.")
     else: await c.answer("Ошибка")
 
@@ -157,10 +259,9 @@ async def ignore_cb(c: CallbackQuery): await c.message.delete()
 
 # --- HISTORY ---
 @router.message(F.text.in_({"📜 История всех задач", "📜 История"}))
-async def history(m: types.Message):
+async def history(m: types.Message, user):
     """Просмотр истории выполненных задач."""
     uid = m.from_user.id
-    user = await db.get_user(uid)
     role = user['role']
     
     if role == 'founder':
@@ -171,14 +272,14 @@ async def history(m: types.Message):
         header = "📜 <b>Ваша история:</b>"
         
     if not tasks: return await m.answer("📭 Пусто.")
-    txt = f"{header}\n\n"
+    lines = []
     for t in tasks:
-        user_link = await db.get_user_link(t['assigned_to'])
-        txt += f"✅ <b>{t['title']}</b>\n👤 {user_link}\n🗓 {t['deadline']}\n"
+        user_link = format_user_link(t['assigned_to'], t['assignee_name'], t['assignee_username'])
+        line = f"✅ <b>{escape_html(t['title'])}</b>\n👤 {user_link}\n🗓 {t['deadline']}\n"
         if t['file_url']: 
-            txt += "📎 Файл (TG)\n" if "tg:" in t['file_url'] else f"💾 <a href='{t['file_url']}'>Файл (Диск)</a>\n"
-        txt += "━━━━━━━━━━━━━━━━\n"
-    await m.answer(txt, parse_mode="HTML", disable_web_page_preview=True)
+            line += "📎 Файл (TG)\n" if "tg:" in t['file_url'] else f"💾 <a href='{escape_html(t['file_url'])}'>Файл (Диск)</a>\n"
+        lines.append(line + "━━━━━━━━━━━━━━━━")
+    await answer_long(m, f"{header}\n", lines, disable_web_page_preview=True)
 
 # --- FINISH & UPLOAD ---
 @router.callback_query(F.data.startswith("fin_"))
@@ -197,11 +298,10 @@ async def fin_start(c: CallbackQuery, state: FSMContext):
         await state.set_state(FinishTask.comment)
 
 @router.message(FinishTask.file)
-async def fin_file(m: types.Message, state: FSMContext, bot: Bot):
+async def fin_file(m: types.Message, state: FSMContext, bot: Bot, user):
     """Загрузка файла при завершении задачи."""
     if m.text == "🔙 Отмена": 
         await state.clear()
-        user = await db.get_user(m.from_user.id)
         await m.answer("❌ Отменено.", reply_markup=get_main_kb(user['role']))
         return
 
@@ -247,11 +347,10 @@ async def fin_file(m: types.Message, state: FSMContext, bot: Bot):
     await state.set_state(FinishTask.comment)
 
 @router.message(FinishTask.comment)
-async def fin_commit(m: types.Message, state: FSMContext, bot: Bot):
+async def fin_commit(m: types.Message, state: FSMContext, bot: Bot, user):
     """Финализация задачи с комментарием."""
     if m.text == "🔙 Отмена":
         await state.clear()
-        user = await db.get_user(m.from_user.id)
         await m.answer("❌ Отменено.", reply_markup=get_main_kb(user['role']))
         return
         
@@ -276,6 +375,5 @@ async def fin_commit(m: types.Message, state: FSMContext, bot: Bot):
             await notify_user(bot, d['creator'], txt)
     except: pass
 
-    user = await db.get_user(m.from_user.id)
     await m.answer("👍 <b>Задача выполнена!</b>", reply_markup=get_main_kb(user['role']), parse_mode="HTML")
     await state.clear()
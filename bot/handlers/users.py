@@ -7,28 +7,26 @@ from bot.database import db
 from bot.states import AddUser
 from bot.keyboards.builders import get_cancel_kb, get_main_kb
 from bot.config import ROLES_MAP, ROLES_DISPLAY
-from bot.utils import notify_user
+from bot.utils import notify_user, answer_long, escape_html
 
 router = Router()
 
 @router.message(F.text == "👥 Пользователи")
-async def list_users(m: types.Message):
+async def list_users(m: types.Message, user):
     """Выводит список всех пользователей."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] != 'founder': return
     
     users = await db.get_all_users()
-    text = "👥 <b>Команда лейбла:</b>\n\n"
+    lines = []
     for u in users:
         role_nice = ROLES_DISPLAY.get(u['role'], u['role'])
-        un = f"(@{u['username']})" if u.get('username') else ""
-        text += f"🔹 <b>{u['name']}</b> {un}\n└ Роль: <code>{role_nice}</code> | <a href='tg://user?id={u['telegram_id']}'>Профиль</a>\n\n"
-    await m.answer(text, parse_mode="HTML")
+        un = f"(@{escape_html(u['username'])})" if u.get('username') else ""
+        lines.append(f"🔹 <b>{escape_html(u['name'])}</b> {un}\n└ Роль: <code>{role_nice}</code> | <a href='tg://user?id={u['telegram_id']}'>Профиль</a>\n")
+    await answer_long(m, "👥 <b>Команда лейбла:</b>\n", lines)
 
 @router.message(F.text == "➕ Добавить юзера")
-async def add_user_step1(m: types.Message, state: FSMContext):
+async def add_user_step1(m: types.Message, state: FSMContext, user):
     """Начало добавления пользователя: ввод ID."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] != 'founder': return
     await m.answer("🆔 <b>Введите Telegram ID сотрудника:</b>\n(Числовой ID, например: 123456789)", reply_markup=get_cancel_kb(), parse_mode="HTML")
     await state.set_state(AddUser.tg_id)
@@ -70,9 +68,8 @@ async def add_user_finish(m: types.Message, state: FSMContext, bot: Bot):
     await state.clear()
 
 @router.message(F.text == "🗑 Удалить юзера")
-async def delete_user_start(m: types.Message):
+async def delete_user_start(m: types.Message, user):
     """Начало удаления пользователя."""
-    user = await db.get_user(m.from_user.id)
     if user['role'] != 'founder': return
     
     users = await db.get_all_users()
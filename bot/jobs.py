@@ -1,100 +1,169 @@
 import datetime
-from aiogram.utils.keyboard import InlineKeyboardBuilder
+import hashlib
+from collections import defaultdict
 from aiogram import F, Bot, Router
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
-from bot.database import db
-from bot.utils import notify_user
-from bot.config import ADMIN_IDS
+from bot.database import db, format_user_link
+from bot.utils import escape_html, split_message
+from bot.services.outbox import outbox, OutboxMessage, outbox_rows
+from bot.services.deadlines import REMINDER, OVERDUE
+from bot.config import ADMIN_IDS, OVERDUE_REPEAT, OVERDUE_REMIND_HOUR, RELEASE_RISK_RULES, ONBOARDING_CHUNK_SIZE
+from bot.task_kinds import TASK_KIND_LABELS, parse_risk_rules
+from bot.onboarding import STEP_FLAGS, STEP_PROMPTS
 
 router = Router()
 
-async def job_check_overdue(bot: Bot):
-    """Проверка просроченных задач (Ежечасно)."""
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    tasks = await db.get_overdue_tasks(today)
+# Правила рисков релизов {task_kind: дней до релиза}
+RISK_RULES = parse_risk_rules(RELEASE_RISK_RULES)
+
+def group_by_assignee(tasks):
+    """Группирует задачи по исполнителю, сохраняя порядок."""
+    grouped = defaultdict(list)
     for t in tasks:
-        if t['status'] != 'overdue':
-            await db.mark_task_overdue(t['id'])
-        await notify_user(bot, t['assigned_to'], f"⚠️ <b>ПРОСРОЧЕНО!</b>\n📌 {t['title']}")
+        grouped[t['assigned_to']].append(t)
+    return grouped
+
+def task_digests(tasks, header, key_prefix, keyed_by_tasks=True):
+    """
+    Сводки для outbox: каждому исполнителю одна сводка по его задачам
+    (несколько сообщений, только если список не помещается в лимит Telegram).
+    Ключ сводки включает хэш ID задач: тот же набор задач с тем же префиксом не отправится повторно.
+    :param key_prefix: Префикс ключа идемпотентности (например, "overdue:2024-05-01-10").
+    :param keyed_by_tasks: False — ключ без хэша: с этим префиксом исполнитель получит одну сводку,
+                           даже если набор задач изменится.
+    :return: Список OutboxMessage.
+    """
+    messages = []
+    for uid, user_tasks in group_by_assignee(tasks).items():
+        key = f"{key_prefix}:{uid}"
+        if keyed_by_tasks:
+            key += ":" + hashlib.sha1(",".join(str(t['id']) for t in user_tasks).encode()).hexdigest()[:16]
+        texts = split_message(f"{header} ({len(user_tasks)})", [f"📌 {escape_html(t['title'])}" for t in user_tasks])
+        messages.extend(OutboxMessage(f"{key}:{i}", uid, text) for i, text in enumerate(texts))
+    return messages
+
+async def enqueue_task_digests(tasks, header, key_prefix):
+    """Ставит в outbox сводки по задачам (см. task_digests)."""
+    await outbox.enqueue_many(task_digests(tasks, header, key_prefix))
+
+def overdue_repeat_period(fire_time):
+    """
+    Период повторных напоминаний о ранее просроченных задачах (OVERDUE_REPEAT), к которому относится
+    проверка, или None, если в эту проверку не напоминать. Напоминание ставится один раз за период
+    (период — в ключе идемпотентности), поэтому при 'daily' его отправит первая проверка начиная с
+    OVERDUE_REMIND_HOUR, в том числе догоняющая после простоя.
+    :param fire_time: Время запуска проверки по расписанию.
+    """
+    if OVERDUE_REPEAT == 'hourly':
+        return f"{fire_time:%Y-%m-%d-%H}"
+    if OVERDUE_REPEAT == 'daily' and fire_time.hour >= OVERDUE_REMIND_HOUR:
+        return f"{fire_time:%Y-%m-%d}"
+    return None
+
+async def job_check_overdue(bot: Bot, fire_time=None):
+    """
+    Ежечасная сверка просроченных задач: о новых просрочках сообщается всегда, о ранее
+    просроченных — по OVERDUE_REPEAT. В момент просрочки уведомляют таймеры дедлайнов;
+    проверка страхует от их простоя (например, когда нет лидера).
+    :param fire_time: Время запуска по расписанию (у догоняющего запуска — время пропущенного).
+    """
+    fire_time = fire_time or datetime.datetime.now()
+    period = overdue_repeat_period(fire_time)
+
+    def build_outbox(newly_overdue, still_overdue):
+        messages = task_digests(newly_overdue, "⚠️ <b>ПРОСРОЧЕНО!</b>", f"overdue:{fire_time:%Y-%m-%d-%H}")
+        if period:
+            messages += task_digests(
+                still_overdue, "⏳ <b>Все еще просрочено</b>", f"overdue_repeat:{period}", keyed_by_tasks=False
+            )
+        return outbox_rows(messages)
 
-async def job_deadline_alerts(bot: Bot):
-    """Уведомления о дедлайнах (Утро/Вечер)."""
-    tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-    tasks = await db.get_deadline_tasks(tomorrow)
-    for t in tasks: 
-        await notify_user(bot, t['assigned_to'], f"⏰ <b>Дедлайн < 24ч!</b>\n📌 {t['title']}")
+    # Уведомления ставятся в outbox в одной транзакции со сменой статуса: при сбое не теряются
+    await db.sweep_overdue(datetime.date.today(), build_outbox)
+    outbox.wake()
+
+async def on_deadline_timers(kind, task_ids):
+    """Срабатывание таймеров дедлайнов (bot.services.deadlines)."""
+    today = datetime.date.today()
+    if kind == REMINDER:
+        tasks = [t for t in await db.get_tasks_by_ids(task_ids) if t['status'] not in ('done', 'rejected')]
+        await enqueue_task_digests(tasks, "⏰ <b>Дедлайн < 24ч!</b>", f"deadline:{today}")
+    elif kind == OVERDUE:
+        await db.mark_tasks_overdue(
+            task_ids, lambda tasks: outbox_rows(task_digests(tasks, "⚠️ <b>ПРОСРОЧЕНО!</b>", f"overdue:{today}"))
+        )
+        outbox.wake()
 
 async def job_pitching_alert(bot: Bot):
-    """Срочный алерт по питчингу (За 3 дня до релиза)."""
-    # Ищем релизы, которые выходят через 3 дня
-    releases = await db.get_upcoming_releases(days_ahead=3)
-    for r in releases:
-        task = await db.get_release_pitching_task(r['id'])
-        if task and task['status'] != 'done':
-            # Уведомляем всех основателей
-            msg = f"🚨 <b>СРОЧНО! ПИТЧИНГ!</b>\nРелиз: {r['title']}\nДо релиза 3 дня, задача не закрыта!"
-            for admin_id in ADMIN_IDS:
-                await notify_user(bot, admin_id, msg)
+    """
+    Срочный алерт по рискам релизов (Ежедневно): релиз выходит через N дней, а задача
+    нужного типа не закрыта (RELEASE_RISK_RULES, по умолчанию — питчинг за 3 дня).
+    """
+    today = datetime.date.today()
+    rows = await db.get_releases_at_risk(today, RISK_RULES)
+
+    releases = defaultdict(list)
+    for row in rows:
+        releases[row['release_id']].append(row)
+
+    messages = []
+    for rel_id, tasks in releases.items():
+        r = tasks[0]
+        open_tasks = "\n".join(TASK_KIND_LABELS[t['task_kind']] for t in tasks)
+        # Уведомляем всех основателей
+        msg = (
+            f"🚨 <b>СРОЧНО!</b>\nРелиз: {escape_html(r['artist_name'])} — {escape_html(r['release_title'])}\n"
+            f"До релиза {r['days_left']} дн., не закрыто:\n{open_tasks}"
+        )
+        messages.extend(OutboxMessage(f"release_risk:{rel_id}:{today}:{admin_id}", admin_id, msg) for admin_id in ADMIN_IDS)
+    await outbox.enqueue_many(messages)
+
+def onboarding_markup(step, artist_id):
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Да", callback_data=f"onb_{step}_{artist_id}"),
+        InlineKeyboardButton(text="Позже", callback_data="ign"),
+    ]])
 
 async def job_onboarding(bot: Bot):
-    """Автоматизированный онбординг (Ежедневно)."""
-    
-    # 1. Контракт (Ежедневно)
-    artists_contract = await db.get_artists_by_flag('flag_contract', 0)
-    for a in artists_contract:
-        kb = InlineKeyboardBuilder().button(text="✅ Да", callback_data=f"onb_cont_{a['id']}").button(text="Позже", callback_data="ign")
-        await notify_user(bot, a['manager_id'], f"📝 Контракт с <b>{a['name']}</b> подписан?", kb.as_markup())
-
-    # 2. Musixmatch Profile (Еженедельно - тут упростим до ежедневной проверки, но можно добавить логику дня недели)
-    # Проверяем только если контракт подписан (flag_contract=1) и профиля нет (flag_mm_profile=0)
-    # Сложный запрос, сделаем фильтрацию в python или расширим get_artists_by_flag
-    # Лучше сделать SQL запрос в DB, но пока используем то что есть, фильтруем в коде
-    
-    # Получаем всех, у кого контракт подписан
-    signed_artists = await db.get_artists_by_flag('flag_contract', 1)
-    
-    for a in signed_artists:
-        kb = InlineKeyboardBuilder().button(text="✅ Да", callback_data=f"onb_mmp_{a['id']}").button(text="Позже", callback_data="ign")
-        
-        if a['flag_mm_profile'] == 0:
-             await notify_user(bot, a['manager_id'], f"🎵 Профиль <b>Musixmatch</b> для {a['name']} создан?", kb.as_markup())
-        
-        elif a['flag_mm_verify'] == 0:
-            kb = InlineKeyboardBuilder().button(text="✅ Да", callback_data=f"onb_mmv_{a['id']}").button(text="Позже", callback_data="ign")
-            await notify_user(bot, a['manager_id'], f"✅ Профиль <b>Musixmatch</b> для {a['name']} верифицирован?", kb.as_markup())
-            
-        elif a['flag_yt_link'] == 0:
-            kb = InlineKeyboardBuilder().button(text="✅ Да", callback_data=f"onb_ytl_{a['id']}").button(text="Позже", callback_data="ign")
-            await notify_user(bot, a['manager_id'], f"📺 Заявка на привязку канала <b>YouTube</b> для {a['name']} подана?", kb.as_markup())
-            
-        elif a['flag_yt_note'] == 0:
-             # Проверяем дату первого релиза
-             if a['first_release_date']:
-                 try:
-                     r_date = datetime.datetime.strptime(a['first_release_date'], "%Y-%m-%d").date()
-                     if datetime.date.today() >= r_date:
-                        kb = InlineKeyboardBuilder().button(text="✅ Да", callback_data=f"onb_ytn_{a['id']}").button(text="Позже", callback_data="ign")
-                        await notify_user(bot, a['manager_id'], f"🎼 Заявка на <b>YouTube Нотку</b> для {a['name']} подана?", kb.as_markup())
-                 except: pass
+    """Автоматизированный онбординг (Ежедневно): менеджеру приходит вопрос о следующем шаге каждого артиста."""
+    today = datetime.date.today()
+    # Шаги вычисляются в БД и читаются частями, каждая часть сразу уходит в outbox
+    async for chunk in db.iter_onboarding_steps(today, ONBOARDING_CHUNK_SIZE):
+        await outbox.enqueue_many(
+            OutboxMessage(
+                f"onboarding:{a['step']}:{a['id']}:{today}", a['manager_id'],
+                STEP_PROMPTS[a['step']].format(name=escape_html(a['name'])), onboarding_markup(a['step'], a['id'])
+            )
+            for a in chunk
+        )
+
+async def job_unreachable_summary(bot: Bot):
+    """Сводка для основателей: сотрудники, которым бот не может доставить сообщения (Ежедневно)."""
+    users = await db.get_unreachable_users()
+    if not users:
+        return
+    lines = [
+        f"• {format_user_link(u['telegram_id'], u['name'], u['username'])} — с {u['unreachable_since']:%Y-%m-%d}, "
+        f"попыток: {u['unreachable_attempts']}"
+        for u in users
+    ]
+    texts = split_message(f"📵 <b>Недоступны для уведомлений</b> ({len(users)})\nБот заблокирован или чат не найден:", lines)
+    today = datetime.date.today()
+    await outbox.enqueue_many(
+        OutboxMessage(f"unreachable:{today}:{admin_id}:{i}", admin_id, text)
+        for admin_id in ADMIN_IDS for i, text in enumerate(texts)
+    )
 
 # --- CALLBACKS ---
 @router.callback_query(F.data.startswith("onb_"))
 async def onb_act(c: CallbackQuery):
     action = c.data.split("_")[1]
     artist_id = int(c.data.split("_")[2])
-    
-    col_map = {
-        'cont': 'flag_contract',
-        'mmp': 'flag_mm_profile',
-        'mmv': 'flag_mm_verify',
-        'ytl': 'flag_yt_link',
-        'ytn': 'flag_yt_note'
-    }
-    
-    col = col_map.get(action)
-    if col:
-        await db.update_artist_flag(artist_id, col)
+
+    flag = STEP_FLAGS.get(action)
+    if flag:
+        await db.update_artist_flag(artist_id, flag)
         await c.message.edit_text("✅ Статус обновлен! Двигаемся дальше.")
     else:
         await c.answer("Ошибка")
@@ -1,15 +1,20 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from bot.config import API_TOKEN, setup_logging
 from bot.database import db
 from bot.handlers import router as main_router
-from bot.middlewares.auth import AuthMiddleware, AuthCallbackMiddleware
-from bot.jobs import job_check_overdue, job_deadline_alerts, job_onboarding, job_pitching_alert, router as jobs_router
+from bot.middlewares.auth import AuthMiddleware, AuthCallbackMiddleware, AuthInlineMiddleware
+from bot.services.sender import sender
+from bot.services.outbox import outbox
+from bot.services.leader import LeaderElector, create_leader_lock
+from bot.services.scheduler import JobRunner
+from bot.services.deadlines import DeadlineTimers
+from bot.services.fsm_storage import DbStorage
+from bot.utils import wait_background_notifications, mark_unreachable
+from bot.jobs import job_check_overdue, on_deadline_timers, job_onboarding, job_pitching_alert, job_unreachable_summary, router as jobs_router
 
 async def main():
     # Настройка логгирования
@@ -18,26 +23,54 @@ async def main():
 
     # Инициализация бота и диспетчера
     bot = Bot(token=API_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    # Состояния диалогов хранятся в БД: переживают перезапуск и общие для всех экземпляров
+    fsm_storage = DbStorage(db)
+    dp = Dispatcher(storage=fsm_storage)
 
     # Подключение базы данных
     await db.connect()
+    fsm_storage.start()
+
+    # Очередь исходящих сообщений (лимиты Telegram)
+    sender.on_unreachable = mark_unreachable
+    sender.start(bot)
+    # Доставка уведомлений из outbox
+    outbox.start(bot)
 
     # Регистрация middleware
     dp.message.outer_middleware(AuthMiddleware())
     dp.callback_query.outer_middleware(AuthCallbackMiddleware())
+    dp.inline_query.outer_middleware(AuthInlineMiddleware())
 
     # Регистрация роутеров
     dp.include_router(main_router)
     dp.include_router(jobs_router)
 
     # Настройка планировщика задач
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(job_check_overdue, CronTrigger(minute=0), args=[bot]) # Раз в час
-    scheduler.add_job(job_deadline_alerts, CronTrigger(hour='10,18'), args=[bot]) # Утро и вечер
-    scheduler.add_job(job_onboarding, CronTrigger(hour=15), args=[bot])
-    scheduler.add_job(job_pitching_alert, CronTrigger(hour=9), args=[bot]) # Утром, раз в день
-    scheduler.start()
+    jobs = JobRunner(db)
+    # Сверка просрочек ежечасно (страховка на случай простоя таймеров дедлайнов);
+    # повторные напоминания по OVERDUE_REPEAT решаются внутри задачи
+    jobs.add_job(job_check_overdue, CronTrigger(minute=0), args=[bot], with_fire_time=True)
+    jobs.add_job(job_onboarding, CronTrigger(hour=15), args=[bot])
+    jobs.add_job(job_pitching_alert, CronTrigger(hour=9), args=[bot]) # Утром, раз в день
+    jobs.add_job(job_unreachable_summary, CronTrigger(hour=11), args=[bot])
+    await jobs.start()
+
+    # Напоминания о дедлайнах и просрочки срабатывают по таймерам, без опроса таблицы
+    deadlines = DeadlineTimers(db, on_deadline_timers)
+
+    # Планировщик и таймеры работают только на экземпляре-лидере,
+    # остальные экземпляры лишь обрабатывают апдейты
+    async def on_elected():
+        await jobs.on_elected()
+        await deadlines.start()
+
+    async def on_demoted():
+        jobs.on_demoted()
+        await deadlines.stop()
+
+    leader = LeaderElector(create_leader_lock(), on_elected=on_elected, on_demoted=on_demoted)
+    leader.start()
 
     # Запуск
     await bot.delete_webhook(drop_pending_updates=True)
@@ -46,6 +79,13 @@ async def main():
     try:
         await dp.start_polling(bot)
     finally:
+        await leader.stop()
+        jobs.shutdown()
+        await outbox.stop()
+        await wait_background_notifications()
+        await sender.stop()
+        # Обычно уже закрыто диспетчером при остановке; повторный вызов лишь дописывает изменения
+        await fsm_storage.close()
         await db.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import time
+import functools
+from collections import defaultdict
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин (значения в секундах).
+    Квантили оцениваются по верхней границе корзины.
+    """
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Последняя корзина — значения больше максимальной границы
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Добавляет наблюдение."""
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля q (0..1): верхняя граница корзины, в которую он попадает."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        """Сводка: количество, среднее, максимум и основные квантили."""
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+class DbMetrics:
+    """
+    Метрики работы с БД: ожидание соединения из пула и латентность методов.
+    """
+    def __init__(self):
+        self.acquire_wait = Histogram()
+        self.queries = defaultdict(Histogram)
+        self.errors = defaultdict(int)
+
+    def observe_query(self, name, seconds, error=False):
+        """Фиксирует время выполнения метода БД (и ошибку, если была)."""
+        self.queries[name].observe(seconds)
+        if error:
+            self.errors[name] += 1
+
+    def top_queries(self, limit=10):
+        """Методы БД, отсортированные по суммарному времени выполнения."""
+        ranked = sorted(self.queries.items(), key=lambda kv: kv[1].total, reverse=True)
+        return [(name, hist.snapshot(), self.errors.get(name, 0)) for name, hist in ranked[:limit]]
+
+def timed(func):
+    """
+    Декоратор для асинхронных методов БД: записывает латентность вызова в self.metrics.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        error = False
+        try:
+            return await func(self, *args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.observe_query(name, time.perf_counter() - started, error)
+    return wrapper
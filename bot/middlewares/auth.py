@@ -1,11 +1,17 @@
 from aiogram import BaseMiddleware
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineQuery
 from typing import Callable, Dict, Any, Awaitable
 from bot.database import db
 
+async def mark_reachable(user):
+    """Пользователь написал боту — снимаем отметку недоступности, если она была."""
+    if user and user.get('unreachable_since'):
+        await db.clear_user_unreachable(user['telegram_id'])
+
 class AuthMiddleware(BaseMiddleware):
     """
     Middleware для проверки регистрации пользователя в БД.
+    Найденная запись пользователя передается в хэндлеры как аргумент `user`.
     """
     async def __call__(
         self,
@@ -14,6 +20,8 @@ class AuthMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         if event.text == "/start": 
+            if event.from_user:
+                await mark_reachable(await db.get_user(event.from_user.id))
             return await handler(event, data)
         
         if event.from_user:
@@ -21,11 +29,14 @@ class AuthMiddleware(BaseMiddleware):
             if not user:
                 await event.answer("⛔️ <b>Доступ запрещен.</b>\nОбратитесь к администратору.", parse_mode="HTML")
                 return
+            await mark_reachable(user)
+            data["user"] = user
         return await handler(event, data)
 
 class AuthCallbackMiddleware(BaseMiddleware):
     """
     Middleware для проверки регистрации пользователя в БД (для колбэков).
+    Найденная запись пользователя передается в хэндлеры как аргумент `user`.
     """
     async def __call__(
         self,
@@ -38,4 +49,24 @@ class AuthCallbackMiddleware(BaseMiddleware):
             if not user:
                 await event.answer("⛔️ Доступ запрещен.", show_alert=True)
                 return
+            await mark_reachable(user)
+            data["user"] = user
+        return await handler(event, data)
+
+class AuthInlineMiddleware(BaseMiddleware):
+    """
+    Middleware для проверки регистрации пользователя в БД (для inline-запросов).
+    Незарегистрированные пользователи получают пустой ответ.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[InlineQuery, Dict[str, Any]], Awaitable[Any]],
+        event: InlineQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = await db.get_user(event.from_user.id)
+        if not user:
+            await event.answer([], cache_time=300, is_personal=True)
+            return
+        data["user"] = user
         return await handler(event, data)
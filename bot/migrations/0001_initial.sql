@@ -0,0 +1,51 @@
+-- Базовая схема (повторяет прежний init_db, безопасна для уже существующих БД)
+CREATE TABLE IF NOT EXISTS users (
+    telegram_id BIGINT PRIMARY KEY,
+    name TEXT,
+    username TEXT,
+    role TEXT
+);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS username TEXT;
+
+CREATE TABLE IF NOT EXISTS artists (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    manager_id BIGINT,
+    first_release_date TEXT,
+    flag_contract INTEGER DEFAULT 0,
+    flag_mm_profile INTEGER DEFAULT 0,
+    flag_mm_verify INTEGER DEFAULT 0,
+    flag_yt_note INTEGER DEFAULT 0,
+    flag_yt_link INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS releases (
+    id SERIAL PRIMARY KEY,
+    title TEXT,
+    artist_id INTEGER,
+    type TEXT,
+    release_date TEXT,
+    created_by BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id SERIAL PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    assigned_to BIGINT,
+    created_by BIGINT,
+    release_id INTEGER,
+    parent_task_id INTEGER,
+    deadline TEXT,
+    status TEXT DEFAULT 'pending',
+    requires_file INTEGER DEFAULT 0,
+    file_url TEXT,
+    comment TEXT
+);
+
+CREATE TABLE IF NOT EXISTS reports (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT,
+    report_date TEXT,
+    text TEXT
+);
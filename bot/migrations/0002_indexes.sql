@@ -0,0 +1,6 @@
+-- Индексы под основные предикаты запросов
+CREATE INDEX IF NOT EXISTS idx_tasks_assignee_status_deadline ON tasks (assigned_to, status, deadline);
+CREATE INDEX IF NOT EXISTS idx_tasks_release ON tasks (release_id);
+CREATE INDEX IF NOT EXISTS idx_releases_creator_date ON releases (created_by, release_date);
+CREATE INDEX IF NOT EXISTS idx_reports_user_id ON reports (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_artists_name ON artists (name);
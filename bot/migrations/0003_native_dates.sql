@@ -0,0 +1,26 @@
+-- Перевод текстовых дат (YYYY-MM-DD) в нативный тип DATE.
+-- Сначала проверяем, что все непустые значения разбираются как дата,
+-- иначе миграция откатывается с понятной ошибкой и данные не меняются.
+DO $$
+DECLARE
+    bad_count INTEGER;
+BEGIN
+    SELECT
+        (SELECT COUNT(*) FROM tasks WHERE btrim(deadline) <> '' AND deadline !~ '^\s*\d{4}-\d{1,2}-\d{1,2}\s*$') +
+        (SELECT COUNT(*) FROM releases WHERE btrim(release_date) <> '' AND release_date !~ '^\s*\d{4}-\d{1,2}-\d{1,2}\s*$') +
+        (SELECT COUNT(*) FROM artists WHERE btrim(first_release_date) <> '' AND first_release_date !~ '^\s*\d{4}-\d{1,2}-\d{1,2}\s*$') +
+        (SELECT COUNT(*) FROM reports WHERE btrim(report_date) <> '' AND report_date !~ '^\s*\d{4}-\d{1,2}-\d{1,2}\s*$')
+    INTO bad_count;
+    IF bad_count > 0 THEN
+        RAISE EXCEPTION 'Найдено % значений дат не в формате YYYY-MM-DD, исправьте их перед миграцией', bad_count;
+    END IF;
+END $$;
+
+-- Пустые строки становятся NULL; индексы по этим колонкам перестраиваются автоматически
+ALTER TABLE tasks ALTER COLUMN deadline TYPE DATE USING NULLIF(btrim(deadline), '')::date;
+ALTER TABLE releases ALTER COLUMN release_date TYPE DATE USING NULLIF(btrim(release_date), '')::date;
+ALTER TABLE artists ALTER COLUMN first_release_date TYPE DATE USING NULLIF(btrim(first_release_date), '')::date;
+ALTER TABLE reports ALTER COLUMN report_date TYPE DATE USING NULLIF(btrim(report_date), '')::date;
+
+CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks (deadline);
+CREATE INDEX IF NOT EXISTS idx_releases_release_date ON releases (release_date);
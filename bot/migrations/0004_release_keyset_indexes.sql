@@ -0,0 +1,7 @@
+-- Индексы под keyset-пагинацию релизов: (release_date DESC NULLS LAST, id DESC)
+CREATE INDEX IF NOT EXISTS idx_releases_date_id ON releases (release_date DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS idx_releases_creator_date_id ON releases (created_by, release_date DESC NULLS LAST, id DESC);
+
+-- Заменены индексами выше
+DROP INDEX IF EXISTS idx_releases_creator_date;
+DROP INDEX IF EXISTS idx_releases_release_date;
@@ -0,0 +1,5 @@
+-- Частичные индексы для sweep_overdue: открытые задачи по дедлайну и уже просроченные
+CREATE INDEX IF NOT EXISTS idx_tasks_open_deadline ON tasks (deadline)
+    WHERE status NOT IN ('done', 'rejected', 'overdue');
+CREATE INDEX IF NOT EXISTS idx_tasks_overdue ON tasks (id)
+    WHERE status = 'overdue';
@@ -0,0 +1,26 @@
+-- Очередь исходящих уведомлений (outbox): доставка переживает перезапуск бота,
+-- повторная постановка с тем же ключом идемпотентности игнорируется
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    chat_id BIGINT NOT NULL,
+    text TEXT NOT NULL,
+    reply_markup JSONB,
+    priority SMALLINT NOT NULL DEFAULT 1,
+    -- pending: ждет отправки, sending: взята воркером, delivered / failed: завершена
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    -- Для pending — когда можно отправлять, для sending — когда истекает захват воркером
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    delivered_at TIMESTAMPTZ
+);
+
+-- Выборка очередной пачки воркером
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (priority, next_attempt_at, id)
+    WHERE status IN ('pending', 'sending');
+
+-- Очистка старых завершенных записей
+CREATE INDEX IF NOT EXISTS idx_outbox_finished ON outbox (created_at)
+    WHERE status IN ('delivered', 'failed');
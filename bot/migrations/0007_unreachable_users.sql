@@ -0,0 +1,9 @@
+-- Пользователи, которым не удается доставить сообщения (бот заблокирован, чат не найден).
+-- Отправка им пропускается до unreachable_retry_at; отметка снимается, когда пользователь снова пишет боту
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_since TIMESTAMPTZ;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_retry_at TIMESTAMPTZ;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_reason TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_users_unreachable ON users (unreachable_since)
+    WHERE unreachable_since IS NOT NULL;
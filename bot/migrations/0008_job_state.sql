@@ -0,0 +1,24 @@
+-- Состояние плановых задач: расписание, последний запуск и защита от параллельных запусков
+CREATE TABLE IF NOT EXISTS job_state (
+    job_id TEXT PRIMARY KEY,
+    schedule TEXT NOT NULL,
+    last_run_at TIMESTAMPTZ,
+    last_status TEXT,
+    last_duration DOUBLE PRECISION,
+    -- Время начала текущего запуска (NULL — задача сейчас не выполняется)
+    running_since TIMESTAMPTZ
+);
+
+-- История запусков: длительность и результат
+CREATE TABLE IF NOT EXISTS job_runs (
+    id BIGSERIAL PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ,
+    duration DOUBLE PRECISION,
+    -- running | ok | error | skipped (предыдущий запуск еще не завершен)
+    status TEXT NOT NULL,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs (job_id, started_at DESC);
@@ -0,0 +1,17 @@
+-- Явный тип стандартной задачи релиза вместо поиска по префиксу заголовка
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS task_kind TEXT;
+
+UPDATE tasks SET task_kind = CASE
+        WHEN title LIKE '🎨 Обложка%' THEN 'cover'
+        WHEN title LIKE '📤 Дистрибуция%' THEN 'distribution'
+        WHEN title LIKE '📝 Питчинг%' THEN 'pitching'
+        WHEN title LIKE '📱 Сниппет%' THEN 'snippet'
+        WHEN title LIKE '📋 Треклист%' THEN 'tracklist'
+        WHEN title LIKE '📀 Мета-данные%' THEN 'metadata'
+        WHEN title LIKE '📢 Промо-план%' THEN 'promo'
+    END
+WHERE task_kind IS NULL AND release_id IS NOT NULL;
+
+-- Поиск задач релиза по типу (get_releases_at_risk)
+CREATE INDEX IF NOT EXISTS idx_tasks_release_kind ON tasks (release_id, task_kind)
+    WHERE task_kind IS NOT NULL;
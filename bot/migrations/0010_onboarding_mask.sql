@@ -0,0 +1,55 @@
+-- Флаги онбординга артиста одной битовой маской (биты — bot.onboarding.OnboardingFlag)
+ALTER TABLE artists ADD COLUMN IF NOT EXISTS onboarding_mask SMALLINT NOT NULL DEFAULT 0;
+
+UPDATE artists SET onboarding_mask =
+      (CASE WHEN COALESCE(flag_contract, 0) <> 0 THEN 1 ELSE 0 END)
+    | (CASE WHEN COALESCE(flag_mm_profile, 0) <> 0 THEN 2 ELSE 0 END)
+    | (CASE WHEN COALESCE(flag_mm_verify, 0) <> 0 THEN 4 ELSE 0 END)
+    | (CASE WHEN COALESCE(flag_yt_link, 0) <> 0 THEN 8 ELSE 0 END)
+    | (CASE WHEN COALESCE(flag_yt_note, 0) <> 0 THEN 16 ELSE 0 END);
+
+-- Колонки flag_* остаются, пока работают экземпляры предыдущего релиза (они читают и пишут только их).
+-- Триггер синхронизирует флаги и маску в обе стороны; колонки и триггер удаляются отдельной
+-- миграцией в следующем релизе, когда все экземпляры читают onboarding_mask.
+CREATE OR REPLACE FUNCTION artists_sync_onboarding_flags() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.onboarding_mask IS NOT DISTINCT FROM OLD.onboarding_mask THEN
+        -- Запись старого кода (или новая строка): маска из флагов
+        NEW.onboarding_mask := NEW.onboarding_mask
+            | (CASE WHEN COALESCE(NEW.flag_contract, 0) <> 0 THEN 1 ELSE 0 END)
+            | (CASE WHEN COALESCE(NEW.flag_mm_profile, 0) <> 0 THEN 2 ELSE 0 END)
+            | (CASE WHEN COALESCE(NEW.flag_mm_verify, 0) <> 0 THEN 4 ELSE 0 END)
+            | (CASE WHEN COALESCE(NEW.flag_yt_link, 0) <> 0 THEN 8 ELSE 0 END)
+            | (CASE WHEN COALESCE(NEW.flag_yt_note, 0) <> 0 THEN 16 ELSE 0 END);
+        IF TG_OP = 'UPDATE' THEN
+            -- Снятые старым кодом флаги снимают и биты
+            NEW.onboarding_mask := NEW.onboarding_mask
+                & ~(CASE WHEN COALESCE(NEW.flag_contract, 0) = 0 AND COALESCE(OLD.flag_contract, 0) <> 0 THEN 1 ELSE 0 END)
+                & ~(CASE WHEN COALESCE(NEW.flag_mm_profile, 0) = 0 AND COALESCE(OLD.flag_mm_profile, 0) <> 0 THEN 2 ELSE 0 END)
+                & ~(CASE WHEN COALESCE(NEW.flag_mm_verify, 0) = 0 AND COALESCE(OLD.flag_mm_verify, 0) <> 0 THEN 4 ELSE 0 END)
+                & ~(CASE WHEN COALESCE(NEW.flag_yt_link, 0) = 0 AND COALESCE(OLD.flag_yt_link, 0) <> 0 THEN 8 ELSE 0 END)
+                & ~(CASE WHEN COALESCE(NEW.flag_yt_note, 0) = 0 AND COALESCE(OLD.flag_yt_note, 0) <> 0 THEN 16 ELSE 0 END);
+        END IF;
+    END IF;
+    -- Флаги из маски (запись нового кода меняет только маску)
+    NEW.flag_contract := (NEW.onboarding_mask & 1 <> 0)::int;
+    NEW.flag_mm_profile := (NEW.onboarding_mask & 2 <> 0)::int;
+    NEW.flag_mm_verify := (NEW.onboarding_mask & 4 <> 0)::int;
+    NEW.flag_yt_link := (NEW.onboarding_mask & 8 <> 0)::int;
+    NEW.flag_yt_note := (NEW.onboarding_mask & 16 <> 0)::int;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_artists_sync_onboarding_flags ON artists;
+CREATE TRIGGER trg_artists_sync_onboarding_flags
+    BEFORE INSERT OR UPDATE ON artists
+    FOR EACH ROW EXECUTE FUNCTION artists_sync_onboarding_flags();
+
+-- Незавершенный онбординг (iter_onboarding_steps) и "кому еще нужен шаг X" (get_artists_missing_flag)
+CREATE INDEX IF NOT EXISTS idx_artists_onboarding_incomplete ON artists (id) WHERE onboarding_mask <> 31;
+CREATE INDEX IF NOT EXISTS idx_artists_need_contract ON artists (id) WHERE onboarding_mask & 1 = 0;
+CREATE INDEX IF NOT EXISTS idx_artists_need_mm_profile ON artists (id) WHERE onboarding_mask & 2 = 0;
+CREATE INDEX IF NOT EXISTS idx_artists_need_mm_verify ON artists (id) WHERE onboarding_mask & 4 = 0;
+CREATE INDEX IF NOT EXISTS idx_artists_need_yt_link ON artists (id) WHERE onboarding_mask & 8 = 0;
+CREATE INDEX IF NOT EXISTS idx_artists_need_yt_note ON artists (id) WHERE onboarding_mask & 16 = 0;
@@ -0,0 +1,5 @@
+-- Индексы под keyset-пагинацию доски активных задач: (deadline, id) по возрастанию
+CREATE INDEX IF NOT EXISTS idx_tasks_active_deadline_id ON tasks (deadline, id)
+    WHERE status NOT IN ('done', 'rejected');
+CREATE INDEX IF NOT EXISTS idx_tasks_active_assignee_deadline_id ON tasks (assigned_to, deadline, id)
+    WHERE status NOT IN ('done', 'rejected');
@@ -0,0 +1,19 @@
+-- Keyset-пагинация списка артистов по (name, id)
+CREATE INDEX IF NOT EXISTS idx_artists_name_id ON artists (name, id);
+DROP INDEX IF EXISTS idx_artists_name;
+
+-- Поиск артистов по подстроке имени: триграммный индекс, если расширение pg_trgm доступно.
+-- Без него поиск работает так же, но последовательным сканированием.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm недоступен (%), поиск артистов без триграммного индекса', SQLERRM;
+END $$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_artists_name_trgm ON artists USING gin (lower(name) gin_trgm_ops);
+    END IF;
+END $$;
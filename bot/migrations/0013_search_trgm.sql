@@ -0,0 +1,9 @@
+-- Триграммные индексы для inline-поиска по названиям релизов и задач
+-- (артисты — idx_artists_name_trgm из 0012). Создаются, только если доступно расширение pg_trgm.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_releases_title_trgm ON releases USING gin (lower(title) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON tasks USING gin (lower(title) gin_trgm_ops);
+    END IF;
+END $$;
@@ -0,0 +1,11 @@
+-- Состояния диалогов aiogram FSM (bot.services.fsm_storage): переживают перезапуск и общие для всех экземпляров
+CREATE TABLE IF NOT EXISTS fsm_state (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    -- После этого момента брошенный диалог считается истекшим и удаляется
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_fsm_state_expires ON fsm_state (expires_at);
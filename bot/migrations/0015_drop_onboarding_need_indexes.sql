@@ -0,0 +1,7 @@
+-- Частичные индексы "кому еще нужен шаг X" обслуживали только get_artists_missing_flag (удален).
+-- Выборка шагов онбординга использует idx_artists_onboarding_incomplete
+DROP INDEX IF EXISTS idx_artists_need_contract;
+DROP INDEX IF EXISTS idx_artists_need_mm_profile;
+DROP INDEX IF EXISTS idx_artists_need_mm_verify;
+DROP INDEX IF EXISTS idx_artists_need_yt_link;
+DROP INDEX IF EXISTS idx_artists_need_yt_note;
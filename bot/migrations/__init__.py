@@ -0,0 +1,90 @@
+"""
+Версионные миграции схемы БД.
+
+Каждая миграция — файл вида NNNN_описание.sql в этом пакете. Примененные
+версии записываются в таблицу schema_version, каждая миграция выполняется
+в отдельной транзакции. Параллельный запуск нескольких экземпляров бота
+сериализуется advisory-локом.
+"""
+import re
+import logging
+from collections import namedtuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent
+
+# Ключ advisory-лока, под которым применяются миграции
+MIGRATION_LOCK_KEY = 74100301
+
+Migration = namedtuple("Migration", ["version", "name", "path"])
+
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+def load_migrations():
+    """
+    Возвращает список миграций из каталога пакета, отсортированный по версии.
+    """
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = _FILE_RE.match(path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort(key=lambda m: m.version)
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Обнаружены миграции с одинаковым номером версии")
+    return migrations
+
+async def get_current_version(conn):
+    """
+    Возвращает номер последней примененной миграции (0, если миграций еще не было).
+    """
+    if not await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL"):
+        return 0
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+
+async def migrate(conn, target=None):
+    """
+    Применяет все непримененные миграции (до версии target включительно, если указана).
+    Если схема актуальна, выполняет только чтение schema_version без DDL.
+    :param conn: Соединение asyncpg.
+    :param target: Версия, до которой нужно обновиться (по умолчанию — последняя).
+    :return: Номер версии схемы после обновления.
+    """
+    migrations = load_migrations()
+    if target is not None:
+        migrations = [m for m in migrations if m.version <= target]
+    if not migrations:
+        return await get_current_version(conn)
+
+    current = await get_current_version(conn)
+    if current >= migrations[-1].version:
+        return current
+
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        # Пока мы ждали лок, другой экземпляр мог уже применить миграции
+        current = await get_current_version(conn)
+        for m in migrations:
+            if m.version <= current:
+                continue
+            logger.info(f"Применение миграции {m.version:04d}_{m.name}...")
+            async with conn.transaction():
+                await conn.execute(m.path.read_text(encoding="utf-8"))
+                await conn.execute("INSERT INTO schema_version (version, name) VALUES ($1, $2)", m.version, m.name)
+            current = m.version
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+    logger.info(f"Схема БД обновлена до версии {current}.")
+    return current
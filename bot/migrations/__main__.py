@@ -0,0 +1,47 @@
+"""
+CLI для миграций схемы БД.
+
+    python -m bot.migrations status
+    python -m bot.migrations upgrade [--target N]
+"""
+import argparse
+import asyncio
+
+import asyncpg
+
+from bot.config import DATABASE_URL, setup_logging
+from bot.migrations import load_migrations, get_current_version, migrate
+
+async def cmd_status(conn):
+    """Выводит список миграций и отмечает уже примененные."""
+    current = await get_current_version(conn)
+    print(f"Текущая версия схемы: {current}")
+    for m in load_migrations():
+        mark = "x" if m.version <= current else " "
+        print(f"[{mark}] {m.version:04d}_{m.name}")
+
+async def cmd_upgrade(conn, target):
+    """Применяет непримененные миграции."""
+    version = await migrate(conn, target)
+    print(f"Версия схемы: {version}")
+
+async def main():
+    parser = argparse.ArgumentParser(prog="python -m bot.migrations", description="Миграции схемы БД")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("status", help="Показать примененные и ожидающие миграции")
+    upgrade = sub.add_parser("upgrade", help="Применить миграции")
+    upgrade.add_argument("--target", type=int, default=None, help="Версия, до которой обновиться")
+    args = parser.parse_args()
+
+    setup_logging()
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if args.command == "status":
+            await cmd_status(conn)
+        else:
+            await cmd_upgrade(conn, getattr(args, "target", None))
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Шаги онбординга артиста. Состояние хранится битовой маской artists.onboarding_mask:
+установленный бит — шаг пройден. Шаги проходятся по порядку, следующий шаг —
+первый незакрытый бит.
+"""
+from enum import IntFlag
+
+class OnboardingFlag(IntFlag):
+    CONTRACT = 1
+    MM_PROFILE = 2
+    MM_VERIFY = 4
+    YT_LINK = 8
+    YT_NOTE = 16
+
+# Все шаги пройдены
+ONBOARDING_COMPLETE = OnboardingFlag.CONTRACT | OnboardingFlag.MM_PROFILE | OnboardingFlag.MM_VERIFY \
+    | OnboardingFlag.YT_LINK | OnboardingFlag.YT_NOTE
+
+CONTRACT = 'cont'
+MM_PROFILE = 'mmp'
+MM_VERIFY = 'mmv'
+YT_LINK = 'ytl'
+YT_NOTE = 'ytn'
+
+# Код шага (используется в callback_data "onb_<код>_<id>" и "tog_<код>_<id>") -> бит, в порядке прохождения
+STEP_FLAGS = {
+    CONTRACT: OnboardingFlag.CONTRACT,
+    MM_PROFILE: OnboardingFlag.MM_PROFILE,
+    MM_VERIFY: OnboardingFlag.MM_VERIFY,
+    YT_LINK: OnboardingFlag.YT_LINK,
+    YT_NOTE: OnboardingFlag.YT_NOTE,
+}
+
+# Вопросы менеджеру; {name} — имя артиста
+STEP_PROMPTS = {
+    CONTRACT: "📝 Контракт с <b>{name}</b> подписан?",
+    MM_PROFILE: "🎵 Профиль <b>Musixmatch</b> для {name} создан?",
+    MM_VERIFY: "✅ Профиль <b>Musixmatch</b> для {name} верифицирован?",
+    YT_LINK: "📺 Заявка на привязку канала <b>YouTube</b> для {name} подана?",
+    YT_NOTE: "🎼 Заявка на <b>YouTube Нотку</b> для {name} подана?",
+}
+
+# Названия шагов для карточки артиста и уведомлений
+FLAG_LABELS = {
+    OnboardingFlag.CONTRACT: "📝 Контракт",
+    OnboardingFlag.MM_PROFILE: "🎵 MM Профиль",
+    OnboardingFlag.MM_VERIFY: "✅ MM Верификация",
+    OnboardingFlag.YT_LINK: "📺 YouTube Линк",
+    OnboardingFlag.YT_NOTE: "🎼 YouTube Нота",
+}
+
+# Значки пройденных шагов для каждого значения маски (список артистов)
+STATUS_ICONS = tuple(
+    "".join(label.split()[0] for flag, label in FLAG_LABELS.items() if mask & flag)
+    for mask in range(ONBOARDING_COMPLETE + 1)
+)
+
+def status_icons(mask):
+    """Строка значков пройденных шагов, например "📝🎵"."""
+    return STATUS_ICONS[mask & ONBOARDING_COMPLETE]
@@ -0,0 +1,221 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+
+from bot.config import DEADLINE_ALERT_HOUR, DEADLINE_HORIZON_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Виды таймеров
+REMINDER = 'reminder'  # "< 24ч до дедлайна"
+OVERDUE = 'overdue'    # дедлайн прошел
+
+# Статусы, при которых таймеры задачи больше не нужны
+CLOSED_STATUSES = ('done', 'rejected', 'overdue')
+
+class DeadlineTimers:
+    """
+    Таймеры дедлайнов в памяти процесса вместо периодического опроса таблицы tasks.
+
+    Куча хранит моменты срабатывания (напоминание накануне дедлайна в alert_hour и
+    просрочка в полночь после дня дедлайна) для открытых задач с дедлайном не дальше
+    horizon_days дней. Задачи загружаются из БД частями по (deadline, id), горизонт
+    сдвигается каждую полночь. Создание и изменение задач приходят через
+    db.subscribe_task_changes, поэтому таблица целиком не перечитывается.
+    Устаревшие записи кучи не удаляются, а отбрасываются при срабатывании.
+
+    on_due(kind, task_ids) вызывается для всех задач, таймеры которых сработали одновременно.
+    Если on_due завершился ошибкой, таймеры возвращаются в кучу и срабатывают повторно
+    через RETRY_DELAY секунд.
+    """
+    # Максимальная пауза между проверками (сек) — страховка от перевода часов
+    MAX_SLEEP = 3600
+    # Пауза перед повтором после ошибки (сек)
+    RETRY_DELAY = 5
+
+    def __init__(self, database, on_due, alert_hour=DEADLINE_ALERT_HOUR,
+                 horizon_days=DEADLINE_HORIZON_DAYS, chunk_size=500):
+        self.db = database
+        self.on_due = on_due
+        self.alert_hour = alert_hour
+        self.horizon_days = horizon_days
+        self.chunk_size = chunk_size
+        self._reset()
+        self._task = None
+        self._unsubscribe = None
+        self._wakeup = asyncio.Event()
+
+    def _reset(self):
+        # (fire_at, seq, kind, task_id, deadline)
+        self._heap = []
+        self._seq = itertools.count()
+        # task_id -> дедлайн, для которого стоят таймеры
+        self._deadlines = {}
+        # Горизонт загрузки и (deadline, id) последней загруженной задачи
+        self._loaded_until = None
+        self._cursor = None
+        # ID задач, изменившихся с последней проверки
+        self._dirty = set()
+        self._resync = False
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Подписывается на изменения задач и запускает таймеры."""
+        if self.running:
+            return
+        self._reset()
+        self._unsubscribe = await self.db.subscribe_task_changes(self._on_changes)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает таймеры и отписывается от изменений задач."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._unsubscribe is not None:
+            await self._unsubscribe()
+            self._unsubscribe = None
+        self._reset()
+
+    def fire_times(self, deadline):
+        """Моменты напоминания и просрочки для дедлайна (локальное время)."""
+        reminder_at = datetime.datetime.combine(deadline - datetime.timedelta(days=1), datetime.time(self.alert_hour))
+        overdue_at = datetime.datetime.combine(deadline + datetime.timedelta(days=1), datetime.time())
+        return reminder_at, overdue_at
+
+    def pending(self):
+        """Количество отслеживаемых задач (для диагностики)."""
+        return len(self._deadlines)
+
+    def _on_changes(self, ids):
+        if ids is None:
+            self._resync = True
+        else:
+            self._dirty.update(ids)
+        self._wakeup.set()
+
+    def _track(self, task_id, deadline, now, late_reminder=False):
+        """
+        Ставит таймеры задачи. Прошедшее напоминание ставится только при late_reminder
+        (задача создана или дедлайн изменен после момента напоминания): при загрузке
+        после перезапуска или пересинхронизации оно уже было отправлено.
+        """
+        if self._deadlines.get(task_id) == deadline:
+            return
+        self._deadlines[task_id] = deadline
+        reminder_at, overdue_at = self.fire_times(deadline)
+        # Если дедлайн уже прошел, напоминать поздно — сразу сработает просрочка
+        if now < reminder_at or (late_reminder and now < overdue_at):
+            heapq.heappush(self._heap, (reminder_at, next(self._seq), REMINDER, task_id, deadline))
+        heapq.heappush(self._heap, (overdue_at, next(self._seq), OVERDUE, task_id, deadline))
+
+    async def _load(self, until, now):
+        """Догружает открытые задачи с дедлайном до until (продолжая с последнего курсора)."""
+        while True:
+            rows = await self.db.get_open_tasks_by_deadline(until, self._cursor, self.chunk_size)
+            for r in rows:
+                self._track(r['id'], r['deadline'], now)
+            if rows:
+                self._cursor = (rows[-1]['deadline'], rows[-1]['id'])
+            if len(rows) < self.chunk_size:
+                break
+        self._loaded_until = until
+
+    async def _refresh(self, ids, now):
+        """Перечитывает измененные задачи по ID и переставляет их таймеры."""
+        rows = {r['id']: r for r in await self.db.get_tasks_by_ids(ids)}
+        for tid in ids:
+            r = rows.get(tid)
+            if r is None or r['status'] in CLOSED_STATUSES or r['deadline'] is None or r['deadline'] > self._loaded_until:
+                # Задачи за горизонтом подгрузятся при его сдвиге
+                self._deadlines.pop(tid, None)
+            else:
+                self._track(tid, r['deadline'], now, late_reminder=True)
+
+    def _pop_due(self, now):
+        """Снимает с кучи сработавшие таймеры: {kind: [записи кучи]}."""
+        due = {REMINDER: [], OVERDUE: []}
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            _, _, kind, task_id, deadline = entry
+            if self._deadlines.get(task_id) != deadline:
+                continue
+            due[kind].append(entry)
+            if kind == OVERDUE:
+                del self._deadlines[task_id]
+        return due
+
+    def _restore(self, entries):
+        """Возвращает в кучу таймеры, которые не удалось обработать."""
+        for entry in entries:
+            _, _, kind, task_id, deadline = entry
+            if kind == OVERDUE:
+                self._deadlines.setdefault(task_id, deadline)
+            if self._deadlines.get(task_id) == deadline:
+                heapq.heappush(self._heap, entry)
+
+    async def _tick(self):
+        """Одна проверка таймеров. :return: True, если обработка сработавших таймеров не удалась."""
+        now = datetime.datetime.now()
+        if self._resync:
+            # Уведомления могли потеряться: переподписываемся и загружаем все заново
+            self._resync = False
+            if self._unsubscribe is not None:
+                await self._unsubscribe()
+            horizon = self._loaded_until
+            self._reset()
+            self._unsubscribe = await self.db.subscribe_task_changes(self._on_changes)
+            if horizon is not None:
+                await self._load(horizon, now)
+        if self._dirty and self._loaded_until is not None:
+            ids = list(self._dirty)
+            self._dirty.clear()
+            await self._refresh(ids, now)
+
+        horizon = now.date() + datetime.timedelta(days=self.horizon_days)
+        if self._loaded_until is None or horizon > self._loaded_until:
+            await self._load(horizon, now)
+
+        failed = False
+        for kind, entries in self._pop_due(now).items():
+            if not entries:
+                continue
+            try:
+                await self.on_due(kind, [task_id for _, _, _, task_id, _ in entries])
+            except Exception as e:
+                # Пересинхронизация не вернет таймеры, время которых прошло, поэтому возвращаем их сами
+                logger.error(f"Ошибка обработки таймеров дедлайнов ({kind}): {e}")
+                self._restore(entries)
+                failed = True
+        return failed
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                retry = await self._tick()
+            except Exception as e:
+                logger.error(f"Ошибка таймеров дедлайнов: {e}")
+                self._resync = True
+                retry = True
+            if retry:
+                await asyncio.sleep(self.RETRY_DELAY)
+                continue
+
+            now = datetime.datetime.now()
+            next_midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+            wake_at = min(self._heap[0][0], next_midnight) if self._heap else next_midnight
+            timeout = min(max((wake_at - now).total_seconds(), 0), self.MAX_SLEEP)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
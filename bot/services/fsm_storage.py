@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+from bot.config import FSM_STATE_TTL, FSM_CACHE_TTL, FSM_CACHE_SIZE, FSM_FLUSH_DELAY, FSM_SWEEP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    """Состояние диалога в кэше."""
+    __slots__ = ("state", "data", "data_json", "loaded_at", "version", "dirty")
+
+    def __init__(self, state, data, data_json, loaded_at):
+        self.state = state
+        self.data = data
+        self.data_json = data_json
+        self.loaded_at = loaded_at
+        # Номер изменения: запись считается сохраненной, только если после записи в БД он не изменился
+        self.version = 0
+        self.dirty = False
+
+class DbStorage(BaseStorage):
+    """
+    Хранилище aiogram FSM в БД (таблица fsm_state): диалоги переживают перезапуск
+    и доступны всем экземплярам бота.
+
+    Изменения копятся в кэше и записываются пачкой через flush_delay секунд, так что
+    set_state + update_data одного обработчика дают одну запись в БД. Сохраненные
+    записи по умолчанию всегда перечитываются из БД (cache_ttl=0), так как апдейты
+    одного пользователя могут попасть на разные экземпляры; cache_ttl > 0 допустим
+    только если все апдейты пользователя обрабатывает один экземпляр. Каждая запись
+    живет state_ttl секунд с последнего изменения; фоновая чистка удаляет истекшие
+    диалоги из БД и устаревшие записи из кэша.
+    """
+    # Пауза перед повторной записью, если БД недоступна (сек)
+    RETRY_DELAY = 5
+
+    def __init__(self, database, state_ttl=FSM_STATE_TTL, cache_ttl=FSM_CACHE_TTL, cache_size=FSM_CACHE_SIZE,
+                 flush_delay=FSM_FLUSH_DELAY, sweep_interval=FSM_SWEEP_INTERVAL):
+        self.db = database
+        self.state_ttl = state_ttl
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.flush_delay = flush_delay
+        self.sweep_interval = sweep_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._sweeper = None
+
+    def start(self):
+        """Запускает фоновую чистку истекших диалогов."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        """Останавливает чистку и записывает несохраненные изменения."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        await self.flush()
+
+    # --- BaseStorage ---
+    async def set_state(self, key, state=None):
+        entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, entry)
+
+    async def get_state(self, key):
+        return (await self._entry(key)).state
+
+    async def set_data(self, key, data):
+        data = dict(data)
+        # Сериализуем сразу: несериализуемые данные — ошибка обработчика, а не фоновой записи
+        data_json = json.dumps(data, ensure_ascii=False)
+        entry = await self._entry(key)
+        entry.data, entry.data_json = data, data_json
+        self._mark_dirty(key, entry)
+
+    async def get_data(self, key):
+        return (await self._entry(key)).data.copy()
+
+    # --- Кэш ---
+    async def _entry(self, key):
+        k = self.key_builder.build(key)
+        entry = self._cache.get(k)
+        if entry is not None and (entry.dirty or time.monotonic() - entry.loaded_at < self.cache_ttl):
+            self._cache.move_to_end(k)
+            return entry
+
+        row = await self.db.fsm_load(k)
+        entry = self._cache.get(k)
+        if entry is not None and entry.dirty:
+            # Пока читали из БД, диалог изменился в этом процессе — локальная версия новее
+            return entry
+        if row is None:
+            entry = _Entry(None, {}, "{}", time.monotonic())
+        else:
+            entry = _Entry(row['state'], json.loads(row['data']), row['data'], time.monotonic())
+        self._cache[k] = entry
+        self._evict()
+        return entry
+
+    def _evict(self):
+        """Вытесняет самые старые сохраненные записи сверх cache_size (несохраненные остаются)."""
+        excess = len(self._cache) - self.cache_size
+        if excess <= 0:
+            return
+        for k in [k for k, e in self._cache.items() if not e.dirty][:excess]:
+            del self._cache[k]
+
+    def _mark_dirty(self, key, entry):
+        k = self.key_builder.build(key)
+        entry.version += 1
+        entry.dirty = True
+        self._cache[k] = entry
+        self._cache.move_to_end(k)
+        self._dirty.add(k)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    # --- Запись в БД ---
+    async def _flush_later(self, delay=None):
+        await asyncio.sleep(self.flush_delay if delay is None else delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"FSM: не удалось сохранить состояния диалогов: {e}")
+            # Повторяем позже; изменения остаются в кэше
+            self._flush_task = asyncio.create_task(self._flush_later(self.RETRY_DELAY))
+            return
+        if self._dirty:
+            # Изменения, пришедшие во время записи: _mark_dirty не запускал для них новую запись
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        """Записывает все несохраненные изменения одной пачкой."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+            saved, removed, versions = [], [], {}
+            for k in keys:
+                entry = self._cache[k]
+                versions[k] = entry.version
+                if entry.state is None and not entry.data:
+                    # Диалог завершен (state.clear()) — запись не нужна
+                    removed.append(k)
+                else:
+                    saved.append((k, entry.state, entry.data_json))
+            try:
+                await self.db.fsm_save(saved, self.state_ttl)
+                await self.db.fsm_delete(removed)
+            except Exception:
+                self._dirty |= keys
+                raise
+            now = time.monotonic()
+            for k, version in versions.items():
+                entry = self._cache.get(k)
+                if entry is not None and entry.version == version:
+                    entry.dirty = False
+                    entry.loaded_at = now
+            self._evict()
+
+    # --- Чистка ---
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.db.fsm_purge_expired()
+                if removed:
+                    logger.info(f"FSM: удалено истекших диалогов: {removed}")
+            except Exception as e:
+                logger.warning(f"FSM: ошибка очистки истекших диалогов: {e}")
+            now = time.monotonic()
+            for k in [k for k, e in self._cache.items() if not e.dirty and now - e.loaded_at >= self.cache_ttl]:
+                del self._cache[k]
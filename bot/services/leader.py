@@ -0,0 +1,147 @@
+import asyncio
+import inspect
+import logging
+
+import asyncpg
+
+from bot.config import DATABASE_URL, DB_BACKEND, LEADER_RETRY_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-лока лидера (планировщик задач работает только у владельца лока)
+LEADER_LOCK_KEY = 74100302
+
+class LocalLeaderLock:
+    """
+    Лок для хранилища в памяти: данные не разделяются между процессами,
+    поэтому каждый процесс — лидер сам для себя.
+    """
+    async def try_acquire(self):
+        return True
+
+    async def check(self):
+        return True
+
+    async def release(self):
+        pass
+
+class PgAdvisoryLeaderLock:
+    """
+    Лидерство через сессионный advisory-лок PostgreSQL на отдельном соединении (не из пула).
+    Лок освобождается сервером, как только соединение лидера обрывается, поэтому
+    упавший экземпляр не блокирует остальных.
+    """
+    # Keepalive, чтобы сервер быстро замечал пропавшего по сети лидера и снимал лок
+    SERVER_SETTINGS = {
+        'application_name': 'bot-leader',
+        'tcp_keepalives_idle': '10',
+        'tcp_keepalives_interval': '5',
+        'tcp_keepalives_count': '3',
+    }
+
+    def __init__(self, dsn, key=LEADER_LOCK_KEY, timeout=5):
+        self.dsn = dsn
+        self.key = key
+        self.timeout = timeout
+        self.conn = None
+
+    async def try_acquire(self):
+        """Пытается захватить лок, не дожидаясь его освобождения."""
+        if self.conn is None or self.conn.is_closed():
+            self.conn = await asyncpg.connect(self.dsn, timeout=self.timeout, server_settings=self.SERVER_SETTINGS)
+        return await self.conn.fetchval("SELECT pg_try_advisory_lock($1)", self.key, timeout=self.timeout)
+
+    async def check(self):
+        """Проверяет, что соединение, держащее лок, живо."""
+        if self.conn is None or self.conn.is_closed():
+            return False
+        try:
+            await self.conn.fetchval("SELECT 1", timeout=self.timeout)
+            return True
+        except Exception:
+            return False
+
+    async def release(self):
+        """Закрывает соединение (сервер снимает лок вместе с сессией)."""
+        conn, self.conn = self.conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await asyncio.wait_for(conn.close(), self.timeout)
+            except Exception:
+                conn.terminate()
+
+def create_leader_lock(backend=DB_BACKEND, dsn=DATABASE_URL):
+    """Создает лок лидера для выбранного типа хранилища (см. bot.database.create_database)."""
+    if backend == 'postgres':
+        return PgAdvisoryLeaderLock(dsn)
+    if backend == 'memory':
+        return LocalLeaderLock()
+    raise ValueError(f"Неизвестный тип хранилища: {backend}")
+
+async def _call(callback):
+    result = callback()
+    if inspect.isawaitable(result):
+        await result
+
+class LeaderElector:
+    """
+    Выбор лидера среди экземпляров бота.
+
+    Каждые interval секунд экземпляр без лидерства пытается захватить лок, а лидер
+    проверяет, что лок все еще за ним. При получении лидерства вызывается on_elected,
+    при потере — on_demoted (например, запуск и пауза планировщика); обе функции
+    могут быть как обычными, так и async.
+    """
+    def __init__(self, lock, on_elected=None, on_demoted=None, interval=LEADER_RETRY_INTERVAL):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.interval = interval
+        self.is_leader = False
+        self._task = None
+
+    def start(self):
+        """Запускает выборы в фоне."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает выборы и отдает лидерство."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._demote()
+        await self.lock.release()
+
+    async def _elect(self):
+        self.is_leader = True
+        logger.info("Экземпляр стал лидером: плановые задачи запущены.")
+        if self.on_elected:
+            await _call(self.on_elected)
+
+    async def _demote(self):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        logger.warning("Экземпляр потерял лидерство: плановые задачи приостановлены.")
+        if self.on_demoted:
+            await _call(self.on_demoted)
+
+    async def _run(self):
+        while True:
+            try:
+                if self.is_leader:
+                    if not await self.lock.check():
+                        await self._demote()
+                        await self.lock.release()
+                elif await self.lock.try_acquire():
+                    await self._elect()
+            except Exception as e:
+                logger.warning(f"Ошибка выбора лидера: {e}")
+                await self._demote()
+                await self.lock.release()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+
+from bot.config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS, OUTBOX_RETENTION_DAYS
+)
+from bot.database import db
+from bot.services.sender import PRIORITY_SCHEDULED, is_permanent_error
+from bot.utils import send_notification
+
+logger = logging.getLogger(__name__)
+
+# Уведомление для постановки в outbox.
+# key — ключ идемпотентности: повторная постановка с тем же ключом игнорируется
+# (например, "overdue:2024-05-01-10:<uid>:0").
+OutboxMessage = namedtuple(
+    "OutboxMessage", ["key", "chat_id", "text", "reply_markup", "priority"],
+    defaults=(None, PRIORITY_SCHEDULED)
+)
+
+def dump_markup(markup):
+    """Сериализует клавиатуру в JSON для хранения в outbox."""
+    return markup.model_dump_json(exclude_none=True) if markup is not None else None
+
+def outbox_rows(messages):
+    """Строки для вставки в outbox (db.outbox_enqueue, build_outbox в db.sweep_overdue и т.п.)."""
+    return [(m.key, m.chat_id, m.text, dump_markup(m.reply_markup), m.priority) for m in messages]
+
+def load_markup(data):
+    """Восстанавливает клавиатуру из JSON."""
+    return InlineKeyboardMarkup.model_validate_json(data) if data else None
+
+class OutboxWorker:
+    """
+    Доставка уведомлений из таблицы outbox.
+
+    Продюсеры (jobs, обработчики) ставят уведомления в очередь через enqueue_many;
+    воркер забирает их пачками, отправляет через send_notification и помечает доставленными.
+    Временные ошибки повторяются с экспоненциальной задержкой, постоянные (бот заблокирован,
+    чат не найден, некорректное сообщение) сразу помечают запись 'failed'; текст ошибки
+    сохраняется в last_error. Если бот остановится
+    посреди отправки, захваченные записи вернутся в очередь по истечении lease_seconds
+    (доставка "хотя бы один раз").
+    """
+    # Как часто удалять старые завершенные записи (сек)
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, database, batch_size=OUTBOX_BATCH_SIZE, poll_interval=OUTBOX_POLL_INTERVAL,
+                 lease_seconds=OUTBOX_LEASE_SECONDS, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 retention_days=OUTBOX_RETENTION_DAYS):
+        self.db = database
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_days = retention_days
+        self.bot = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._last_purge = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, bot: Bot):
+        """Запускает воркер доставки."""
+        self.bot = bot
+        self._stopping = False
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=10):
+        """Останавливает воркер, дав текущей пачке завершиться (не дольше timeout секунд)."""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox: пачка не отправлена до остановки, записи вернутся в очередь после истечения захвата")
+
+    async def enqueue_many(self, messages):
+        """
+        Ставит уведомления в очередь одной вставкой.
+        :param messages: Итерируемое OutboxMessage.
+        :return: Количество новых записей (дубликаты по ключу не считаются).
+        """
+        inserted = await self.db.outbox_enqueue(outbox_rows(messages))
+        if inserted:
+            self._wakeup.set()
+        return inserted
+
+    def wake(self):
+        """Будит воркер после постановки записей в outbox в обход enqueue_many (в транзакции БД)."""
+        self._wakeup.set()
+
+    async def enqueue(self, message):
+        """Ставит одно уведомление в очередь. :return: True, если запись добавлена."""
+        return await self.enqueue_many([message]) > 0
+
+    def retry_delay(self, attempts):
+        """Задержка перед следующей попыткой (сек) или None, если попытки исчерпаны."""
+        if attempts >= self.max_attempts:
+            return None
+        return min(30 * 2 ** (attempts - 1), 3600)
+
+    async def process_batch(self):
+        """
+        Отправляет одну пачку уведомлений.
+        :return: Количество обработанных записей.
+        """
+        rows = await self.db.outbox_claim(self.batch_size, self.lease_seconds)
+        if not rows:
+            return 0
+        # Ошибка отдельной отправки (в том числе исключение) не должна прерывать всю пачку
+        errors = await asyncio.gather(*[
+            send_notification(self.bot, r['chat_id'], r['text'], load_markup(r['reply_markup']), r['priority'])
+            for r in rows
+        ], return_exceptions=True)
+        delivered = [r['id'] for r, error in zip(rows, errors) if error is None]
+        failed = [
+            (r['id'], None if is_permanent_error(error) else self.retry_delay(r['attempts']), repr(error))
+            for r, error in zip(rows, errors) if error is not None
+        ]
+        await self.db.outbox_mark_delivered(delivered)
+        await self.db.outbox_mark_failed(failed)
+        if failed:
+            logger.warning(f"Outbox: не доставлено {len(failed)} из {len(rows)}")
+        return len(rows)
+
+    async def _purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        removed = await self.db.outbox_purge(self.retention_days)
+        if removed:
+            logger.info(f"Outbox: удалено завершенных записей: {removed}")
+
+    async def _run(self):
+        while not self._stopping:
+            # Сбрасываем до выборки, чтобы не пропустить постановку во время отправки пачки
+            self._wakeup.clear()
+            try:
+                processed = await self.process_batch()
+                await self._purge()
+            except Exception as e:
+                logger.error(f"Outbox: ошибка обработки очереди: {e}")
+                processed = 0
+            if processed < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+# Глобальный воркер outbox (запускается в bot.main)
+outbox = OutboxWorker(db)
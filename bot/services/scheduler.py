@@ -0,0 +1,104 @@
+import datetime
+import logging
+import time
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from bot.config import JOB_MISFIRE_GRACE, JOB_RUN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+class JobRunner:
+    """
+    Плановые задачи с состоянием в БД.
+
+    Каждый запуск записывается в job_runs (длительность, результат), а время последнего
+    запуска — в job_state. При получении лидерства пропущенные запуски (бот был выключен
+    или лидер упал) выполняются один раз, если они не старше misfire_grace секунд.
+    Одна задача не выполняется параллельно: max_instances=1 внутри процесса и отметка
+    running_since в БД между экземплярами.
+
+    Задачам, добавленным с with_fire_time=True, передается fire_time — время запуска
+    по расписанию (локальное, без часового пояса); у догоняющего запуска это время
+    пропущенного запуска, а не текущее.
+    """
+    def __init__(self, database, misfire_grace=JOB_MISFIRE_GRACE, run_timeout=JOB_RUN_TIMEOUT):
+        self.db = database
+        self.misfire_grace = misfire_grace
+        self.run_timeout = run_timeout
+        self.scheduler = AsyncIOScheduler()
+        # job_id -> (func, trigger, args, with_fire_time)
+        self.jobs = {}
+
+    def add_job(self, func, trigger, args=(), with_fire_time=False):
+        """Добавляет плановую задачу (ID — имя функции)."""
+        job_id = func.__name__
+        self.jobs[job_id] = (func, trigger, tuple(args), with_fire_time)
+        self.scheduler.add_job(self.run, trigger, args=[job_id], id=job_id, max_instances=1, coalesce=True)
+
+    async def start(self):
+        """Сохраняет расписание в БД и запускает планировщик на паузе (до получения лидерства)."""
+        for job_id, (_, trigger, _, _) in self.jobs.items():
+            await self.db.job_register(job_id, str(trigger))
+        self.scheduler.start(paused=True)
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+
+    async def on_elected(self):
+        """Экземпляр стал лидером: возобновляет расписание и догоняет пропущенные запуски."""
+        self.scheduler.resume()
+        await self.catch_up()
+
+    def on_demoted(self):
+        self.scheduler.pause()
+
+    async def run(self, job_id, fire_time=None):
+        """
+        Выполняет задачу с записью результата; пропускает запуск, если предыдущий еще идет.
+        :param fire_time: Время пропущенного запуска (для догоняющего запуска), иначе — текущее.
+        """
+        func, _, args, with_fire_time = self.jobs[job_id]
+        kwargs = {}
+        if with_fire_time:
+            kwargs['fire_time'] = fire_time.astimezone().replace(tzinfo=None) if fire_time else datetime.datetime.now()
+        run_id = await self.db.job_try_start(job_id, self.run_timeout)
+        if run_id is None:
+            logger.warning(f"Задача {job_id} пропущена: предыдущий запуск еще выполняется.")
+            return
+        started = time.perf_counter()
+        try:
+            await func(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Задача {job_id} завершилась ошибкой")
+            await self.db.job_finish(run_id, 'error', str(e))
+        else:
+            await self.db.job_finish(run_id, 'ok')
+            logger.info(f"Задача {job_id} выполнена за {time.perf_counter() - started:.2f} с.")
+
+    def missed_run(self, trigger, last_run_at, now):
+        """
+        Последний запуск по расписанию между last_run_at и now, если он не старше misfire_grace;
+        иначе None.
+        """
+        if last_run_at is None:
+            return None
+        missed = None
+        fire_time = trigger.get_next_fire_time(None, last_run_at + datetime.timedelta(seconds=1))
+        while fire_time is not None and fire_time <= now:
+            missed = fire_time
+            fire_time = trigger.get_next_fire_time(fire_time, fire_time + datetime.timedelta(seconds=1))
+        if missed is None or (now - missed).total_seconds() > self.misfire_grace:
+            return None
+        return missed
+
+    async def catch_up(self):
+        """Запускает один раз задачи, пропустившие запуск по расписанию."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        states = {s['job_id']: s for s in await self.db.get_job_states()}
+        for job_id, (_, trigger, _, _) in self.jobs.items():
+            state = states.get(job_id)
+            missed = self.missed_run(trigger, state['last_run_at'] if state else None, now)
+            if missed:
+                logger.info(f"Задача {job_id} пропустила запуск {missed:%Y-%m-%d %H:%M}, выполняем сейчас.")
+                self.scheduler.add_job(self.run, args=[job_id, missed], id=f"{job_id}:catch_up", replace_existing=True)
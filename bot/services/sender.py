@@ -0,0 +1,293 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest,
+    TelegramNetworkError, TelegramServerError
+)
+
+from bot.config import (
+    SEND_GLOBAL_RATE, SEND_PER_CHAT_RATE, SEND_PER_CHAT_BURST,
+    SEND_MAX_RETRIES, SEND_CONCURRENCY
+)
+
+logger = logging.getLogger(__name__)
+
+# Полосы приоритета: меньше — важнее
+PRIORITY_INTERACTIVE = 0  # уведомления, вызванные действиями пользователей
+PRIORITY_SCHEDULED = 1    # плановые рассылки (jobs)
+
+class ChatUnreachable(Exception):
+    """Чат отмечен недоступным (см. is_unreachable_error), отправка отложена до истечения паузы."""
+
+class SenderStopped(Exception):
+    """Очередь отправки остановлена раньше, чем сообщение было доставлено."""
+
+def is_unreachable_error(error):
+    """Ошибка означает, что чат недоступен: бот заблокирован, аккаунт удален или пользователь не нажимал /start."""
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    return isinstance(error, TelegramBadRequest) and "chat not found" in str(error).lower()
+
+def is_permanent_error(error):
+    """Повторная отправка того же сообщения не поможет (чат недоступен или сообщение некорректно)."""
+    return isinstance(error, (TelegramForbiddenError, TelegramBadRequest, ChatUnreachable))
+
+class TokenBucket:
+    """
+    Токен-бакет: rate токенов в секунду, не больше capacity накопленных.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # До этого момента отправка запрещена (ответ Telegram retry_after)
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Через сколько секунд будет доступен токен (0 — доступен сейчас)."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, now, seconds):
+        """Запрещает отправку на seconds секунд и обнуляет накопленные токены."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+    def is_idle(self, now):
+        """Бакет полон и не заблокирован — его можно удалить без потери состояния."""
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+class _Outgoing:
+    """Сообщение в очереди отправки."""
+    __slots__ = ("chat_id", "text", "kwargs", "priority", "future", "attempts")
+
+    def __init__(self, chat_id, text, kwargs, priority, future):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+
+class MessageSender:
+    """
+    Очередь исходящих сообщений с учетом лимитов Telegram.
+
+    Глобальный токен-бакет ограничивает общую скорость отправки (~30 сообщений/с),
+    бакеты на каждый чат — скорость в один чат (~1 сообщение/с). Ответ 429
+    (TelegramRetryAfter) блокирует на указанное время чат и всю отправку (лимит
+    Telegram действует на бота целиком), после чего сообщение отправляется повторно. Сообщения с меньшим приоритетом (PRIORITY_INTERACTIVE)
+    уходят раньше плановых рассылок.
+    """
+    # Как часто удалять бакеты неактивных чатов (сек)
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, global_rate=SEND_GLOBAL_RATE, per_chat_rate=SEND_PER_CHAT_RATE,
+                 per_chat_burst=SEND_PER_CHAT_BURST, max_retries=SEND_MAX_RETRIES, concurrency=SEND_CONCURRENCY):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.bot = None
+        # async-функция (chat_id, reason), вызывается, когда чат недоступен (см. is_unreachable_error)
+        self.on_unreachable = None
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+        self._seq = itertools.count()
+        # Готовые к отправке: (priority, seq, item)
+        self._ready = []
+        # Ожидающие своего чата или повтора: (ready_at, priority, seq, item)
+        self._delayed = []
+        self._slots = asyncio.Semaphore(concurrency)
+        self._inflight = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._last_prune = time.monotonic()
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, bot: Bot):
+        """Запускает обработку очереди."""
+        self.bot = bot
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=10):
+        """
+        Останавливает очередь, дождавшись отправки накопленных сообщений (не дольше timeout секунд).
+        Неотправленные сообщения завершаются ошибкой SenderStopped.
+        """
+        if not self.running:
+            return
+        deadline = time.monotonic() + timeout
+        while (self._ready or self._delayed or self._inflight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        inflight = list(self._inflight)
+        for t in inflight:
+            t.cancel()
+        # Отмененные отправки завершают свои future в _deliver
+        await asyncio.gather(*inflight, return_exceptions=True)
+        pending = [item for *_, item in self._ready] + [item for *_, item in self._delayed]
+        for item in pending:
+            self._finish(item, SenderStopped())
+        if pending:
+            logger.warning(f"Очередь отправки остановлена, не отправлено сообщений: {len(pending)}")
+        self._ready.clear()
+        self._delayed.clear()
+
+    def submit(self, chat_id, text, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """
+        Ставит сообщение в очередь.
+        :param kwargs: Дополнительные параметры bot.send_message (reply_markup, parse_mode, ...).
+        :return: asyncio.Future с результатом None (доставлено) или исключением, из-за которого
+                 сообщение не доставлено (исключение не выбрасывается, а возвращается как значение).
+        """
+        future = asyncio.get_running_loop().create_future()
+        item = _Outgoing(chat_id, text, kwargs, priority, future)
+        heapq.heappush(self._ready, (priority, next(self._seq), item))
+        self._wakeup.set()
+        return future
+
+    async def send(self, chat_id, text, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Ставит сообщение в очередь и ждет результата доставки (True/False)."""
+        return await self.submit(chat_id, text, priority, **kwargs) is None
+
+    def stats(self):
+        """Размеры очередей (для диагностики)."""
+        return {"ready": len(self._ready), "delayed": len(self._delayed), "inflight": len(self._inflight), "chats": len(self._chats)}
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    def _delay(self, item, ready_at):
+        heapq.heappush(self._delayed, (ready_at, item.priority, next(self._seq), item))
+        self._wakeup.set()
+
+    def _finish(self, item, error=None):
+        if not item.future.done():
+            item.future.set_result(error)
+
+    def _prune(self, now):
+        """Удаляет бакеты чатов, которые давно не использовались."""
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        for chat_id in [cid for cid, b in self._chats.items() if b.is_idle(now)]:
+            del self._chats[chat_id]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, priority, seq, item = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (priority, seq, item))
+
+            if not self._ready:
+                self._prune(now)
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            priority, seq, item = self._ready[0]
+            chat_wait = self._chat_bucket(item.chat_id).wait_time(now)
+            if chat_wait > 0:
+                # Чат исчерпал лимит — откладываем, не задерживая сообщения в другие чаты
+                heapq.heappop(self._ready)
+                heapq.heappush(self._delayed, (now + chat_wait, priority, seq, item))
+                continue
+
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                # Пока ждем глобальный токен, в очередь может прийти более приоритетное сообщение
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), global_wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._ready)
+            await self._slots.acquire()
+            self._chat_bucket(item.chat_id).consume()
+            self._global.consume()
+            task = asyncio.create_task(self._deliver(item))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, item):
+        try:
+            await self.bot.send_message(item.chat_id, item.text, **item.kwargs)
+            self._finish(item)
+        except TelegramRetryAfter as e:
+            item.attempts += 1
+            if item.attempts > self.max_retries:
+                logger.warning(f"Failed to notify {item.chat_id}: flood control, retries exhausted")
+                self._finish(item, e)
+            else:
+                now = time.monotonic()
+                self._chat_bucket(item.chat_id).block(now, e.retry_after)
+                self._global.block(now, e.retry_after)
+                self._delay(item, now + e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            item.attempts += 1
+            if item.attempts > self.max_retries:
+                logger.warning(f"Failed to notify {item.chat_id}: {e}")
+                self._finish(item, e)
+            else:
+                self._delay(item, time.monotonic() + min(2 ** item.attempts, 60))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Повтор не поможет: бот заблокирован, чат не найден или некорректное сообщение
+            logger.warning(f"Failed to notify {item.chat_id}: {e}")
+            # Отмечаем до завершения future, чтобы следующая отправка этому чату уже была пропущена
+            if self.on_unreachable and is_unreachable_error(e):
+                await self._report_unreachable(item.chat_id, e)
+            self._finish(item, e)
+        except Exception as e:
+            logger.warning(f"Failed to notify {item.chat_id}: {e}")
+            self._finish(item, e)
+        except asyncio.CancelledError:
+            # Очередь остановлена посреди отправки — ожидающие send() не должны зависнуть
+            self._finish(item, SenderStopped())
+            raise
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    async def _report_unreachable(self, chat_id, error):
+        try:
+            await self.on_unreachable(chat_id, str(error))
+        except Exception as e:
+            logger.warning(f"Failed to record unreachable chat {chat_id}: {e}")
+
+# Глобальная очередь отправки (запускается в bot.main)
+sender = MessageSender()
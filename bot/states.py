@@ -36,3 +36,7 @@ class FinishTask(StatesGroup):
 class SMMReportState(StatesGroup):
     """Состояния для SMM отчета."""
     text = State()
+
+class ArtistSearch(StatesGroup):
+    """Состояние поиска артиста по имени."""
+    query = State()
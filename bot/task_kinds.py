@@ -0,0 +1,40 @@
+"""
+Типы стандартных задач релиза (колонка tasks.task_kind).
+Ручные задачи создаются без типа (NULL).
+"""
+
+COVER = 'cover'
+DISTRIBUTION = 'distribution'
+PITCHING = 'pitching'
+SNIPPET = 'snippet'
+TRACKLIST = 'tracklist'
+METADATA = 'metadata'
+PROMO = 'promo'
+
+# Названия для заголовков задач и уведомлений
+TASK_KIND_LABELS = {
+    COVER: "🎨 Обложка",
+    DISTRIBUTION: "📤 Дистрибуция",
+    PITCHING: "📝 Питчинг",
+    SNIPPET: "📱 Сниппет",
+    TRACKLIST: "📋 Треклист",
+    METADATA: "📀 Мета-данные",
+    PROMO: "📢 Промо-план",
+}
+
+def parse_risk_rules(text):
+    """
+    Разбирает правила риска релиза вида "pitching:3,cover:7": тип задачи и за сколько дней
+    до релиза предупреждать, если задача этого типа не закрыта.
+    :return: Словарь {task_kind: days}
+    """
+    rules = {}
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        kind, _, days = part.partition(":")
+        kind = kind.strip()
+        if kind not in TASK_KIND_LABELS or not days.strip().isdigit():
+            raise ValueError(f"Неверное правило риска релиза: {part!r}")
+        rules[kind] = int(days)
+    return rules
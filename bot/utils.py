@@ -1,17 +1,225 @@
+import asyncio
+import datetime
+import html
 import logging
+import re
 from aiogram import Bot
 
+from bot.config import NOTIFY_FANOUT_CONCURRENCY
+from bot.database import db
+from bot.services.sender import sender, is_unreachable_error, ChatUnreachable, PRIORITY_INTERACTIVE
+
 logger = logging.getLogger(__name__)
 
-async def notify_user(bot: Bot, uid, text, reply_markup=None):
+# Максимальная длина текста сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Сколько сообщений подряд отправляет answer_long на один запрос
+MAX_MESSAGES_PER_ANSWER = 5
+TRUNCATED_NOTE = "\n\n<i>… показаны не все записи</i>"
+
+# Фоновые рассылки: храним ссылки, чтобы задачи не были собраны сборщиком мусора
+_background = set()
+
+async def mark_unreachable(uid, reason):
+    """Отмечает пользователя недоступным (бот заблокирован, чат не найден): отправка ему будет отложена."""
+    await db.mark_user_unreachable(uid, reason)
+
+async def send_notification(bot: Bot, uid, text, reply_markup=None, priority=PRIORITY_INTERACTIVE):
     """
     Отправляет уведомление пользователю.
+    Если запущена очередь отправки (bot.services.sender), сообщение проходит через нее
+    с учетом лимитов Telegram и повторами при 429; иначе отправляется напрямую.
+    Пользователям, отмеченным недоступными, сообщение не отправляется до истечения паузы.
     :param bot: экземпляр бота
     :param uid: Telegram ID пользователя
     :param text: Текст сообщения
     :param reply_markup: Клавиатура (опционально)
+    :param priority: PRIORITY_INTERACTIVE (ответ на действие) или PRIORITY_SCHEDULED (плановая рассылка)
+    :return: None, если сообщение доставлено, иначе исключение — причина недоставки
+             (ChatUnreachable для пользователей на паузе; см. sender.is_permanent_error)
+    """
+    user = await db.get_user(uid)
+    if db.is_user_unreachable(user):
+        return ChatUnreachable(f"chat {uid} is marked unreachable")
+
+    if sender.running:
+        error = await sender.submit(uid, text, priority, reply_markup=reply_markup, parse_mode="HTML")
+    else:
+        try: 
+            await bot.send_message(uid, text, reply_markup=reply_markup, parse_mode="HTML")
+            error = None
+        except Exception as e: 
+            logger.warning(f"Failed to notify {uid}: {e}")
+            if is_unreachable_error(e):
+                await mark_unreachable(uid, str(e))
+            error = e
+
+    # Пробная отправка после паузы прошла — пользователь снова доступен
+    if error is None and user and user.get('unreachable_since'):
+        await db.clear_user_unreachable(uid)
+    return error
+
+async def notify_user(bot: Bot, uid, text, reply_markup=None, priority=PRIORITY_INTERACTIVE):
+    """
+    Отправляет уведомление пользователю (см. send_notification).
+    :return: True, если сообщение доставлено
+    """
+    return await send_notification(bot, uid, text, reply_markup, priority) is None
+
+async def notify_many(bot: Bot, uids, text, reply_markup=None, priority=PRIORITY_INTERACTIVE,
+                      concurrency=NOTIFY_FANOUT_CONCURRENCY):
+    """
+    Отправляет одно уведомление нескольким получателям параллельно
+    (не более concurrency одновременных отправок).
+    :param uids: Telegram ID получателей (повторы отправляются один раз)
+    :return: Словарь {uid: True/False} — доставлено ли сообщение
+    """
+    recipients = list(dict.fromkeys(uids))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(uid):
+        async with semaphore:
+            return await notify_user(bot, uid, text, reply_markup, priority)
+
+    results = await asyncio.gather(*[send_one(uid) for uid in recipients])
+    return dict(zip(recipients, results))
+
+def notify_many_background(bot: Bot, uids, text, reply_markup=None, priority=PRIORITY_INTERACTIVE):
+    """
+    Запускает notify_many в фоне, не дожидаясь доставки (чтобы не задерживать ответ пользователю).
+    :return: asyncio.Task с результатом notify_many
+    """
+    task = asyncio.create_task(notify_many(bot, uids, text, reply_markup, priority))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+async def wait_background_notifications(timeout=10):
+    """Ждет завершения фоновых рассылок (при остановке бота), не дольше timeout секунд."""
+    if _background:
+        await asyncio.wait(list(_background), timeout=timeout)
+
+def tg_len(text):
+    """Длина текста так, как ее считает Telegram (в UTF-16 code units: эмодзи занимают 2)."""
+    return len(text.encode("utf-16-le")) // 2
+
+def escape_html(value):
+    """Экранирует пользовательский текст для сообщений с parse_mode="HTML" (None — пустая строка)."""
+    return html.escape(str(value)) if value is not None else ""
+
+# Тег (group 1 — "/" у закрывающего, group 2 — имя), HTML-сущность, текст или одиночный "<"/"&"
+_HTML_TOKEN = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^>]*>|&#?\w+;|[^<&]+|[<&]")
+
+def _fit(text, room):
+    """Наибольший префикс text длиной не больше room (по tg_len), по возможности до перевода строки."""
+    part = text[:max(room, 0)]
+    # Эмодзи занимают 2 единицы: отрезаем избыток (каждый символ — хотя бы одна единица)
+    excess = tg_len(part) - room
+    if excess > 0:
+        part = part[:-excess]
+    if len(part) < len(text):
+        newline = part.rfind("\n")
+        if newline >= room // 2:
+            part = part[:newline + 1]
+    return part
+
+def split_html(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Делит HTML-текст на части не длиннее limit, не разрывая теги и сущности (&amp; и т.п.).
+    Теги, открытые на границе части, закрываются в ее конце и открываются заново в следующей.
+    :return: Список частей.
+    """
+    chunks = []
+    current = ""
+    # Открытые теги: (имя, открывающий тег целиком)
+    stack = []
+
+    def closing():
+        return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+    def flush():
+        nonlocal current
+        chunks.append(current + closing())
+        current = "".join(tag for _, tag in stack)
+
+    for m in _HTML_TOKEN.finditer(text):
+        token = m.group(0)
+        if m.group(2):
+            if m.group(1):
+                if stack and stack[-1][0] == m.group(2):
+                    stack.pop()
+                current += token
+                continue
+            if tg_len(current) + tg_len(token) + tg_len(closing()) + len(m.group(2)) + 3 > limit and current:
+                flush()
+            current += token
+            stack.append((m.group(2), token))
+            continue
+        atomic = token.startswith("&") and len(token) > 1
+        while token:
+            room = limit - tg_len(current) - tg_len(closing())
+            part = (token if tg_len(token) <= room else "") if atomic else _fit(token, room)
+            if not part:
+                if current != "".join(tag for _, tag in stack):
+                    flush()
+                    continue
+                # Лимит меньше одного символа с открытыми тегами — берем хотя бы символ, чтобы не зациклиться
+                part = token if atomic else token[0]
+            current += part
+            token = token[len(part):]
+    if current or not chunks:
+        chunks.append(current + closing())
+    return chunks
+
+def split_message(header, lines, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Собирает сообщения из заголовка и строк, не превышая limit символов в каждом.
+    Строки не разрываются между сообщениями; каждое сообщение начинается с заголовка.
+    Строка, которая не помещается даже в отдельное сообщение, делится через split_html.
+    :param lines: Итерируемое строк (каждая — законченный HTML-фрагмент); читается по одной.
+    :return: Список текстов сообщений
+    """
+    chunks = []
+    current = header
+    for line in lines:
+        if tg_len(header) + 1 + tg_len(line) > limit:
+            if current != header:
+                chunks.append(current)
+            parts = split_html(line, limit - tg_len(header) - 1)
+            chunks.extend(f"{header}\n{part}" for part in parts[:-1])
+            current = f"{header}\n{parts[-1]}"
+            continue
+        if tg_len(current) + 1 + tg_len(line) > limit and current != header:
+            chunks.append(current)
+            current = header
+        current += "\n" + line
+    chunks.append(current)
+    return chunks
+
+async def answer_long(message, header, lines, max_messages=MAX_MESSAGES_PER_ANSWER, **kwargs):
+    """
+    Отвечает на сообщение списком строк, разбитым на сообщения по лимиту Telegram (см. split_message).
+    Отправляется не больше max_messages сообщений; если записей больше, последнее помечается.
+    :param kwargs: Параметры message.answer (parse_mode по умолчанию "HTML").
+    """
+    kwargs.setdefault("parse_mode", "HTML")
+    # Оставляем место под пометку об обрезке
+    texts = split_message(header, lines, TELEGRAM_MESSAGE_LIMIT - tg_len(TRUNCATED_NOTE))
+    if len(texts) > max_messages:
+        texts = texts[:max_messages]
+        texts[-1] += TRUNCATED_NOTE
+    for text in texts:
+        await message.answer(text, **kwargs)
+
+def parse_date(text):
+    """
+    Разбирает дату, введенную пользователем (YYYY-MM-DD, допускаются разделители '.' и '/').
+    :return: datetime.date или None, если формат неверный.
     """
-    try: 
-        await bot.send_message(uid, text, reply_markup=reply_markup, parse_mode="HTML")
-    except Exception as e: 
-        logger.warning(f"Failed to notify {uid}: {e}")
+    if not text:
+        return None
+    try:
+        clean = text.strip().replace(".", "-").replace("/", "-")
+        return datetime.datetime.strptime(clean, "%Y-%m-%d").date()
+    except ValueError:
+        return None